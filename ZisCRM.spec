@@ -10,6 +10,16 @@ a = Analysis(
     datas=[
         ('database.py', '.'),
         ('receipt_generator.py', '.'),
+        ('importer.py', '.'),
+        ('batch_receipts.py', '.'),
+        ('receipt_queue.py', '.'),
+        ('storage_backends.py', '.'),
+        ('replica_sync.py', '.'),
+        ('change_watcher.py', '.'),
+        ('attachment_store.py', '.'),
+        ('thumbnails.py', '.'),
+        ('storage_check.py', '.'),
+        ('document_export.py', '.'),
     ],
     hiddenimports=[
         'customtkinter',
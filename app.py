@@ -3,17 +3,50 @@ import customtkinter as ctk
 from tkinter import ttk, messagebox, filedialog
 import database as db
 import datetime
-import shutil
 import os
+import io
 import csv
 import json
-from openpyxl import Workbook, load_workbook
-from openpyxl.utils import get_column_letter
+import queue
+import multiprocessing
 from receipt_generator import ReceiptGenerator
+import importer
+import batch_receipts
+import receipt_queue
+import attachment_store
+import thumbnails
+import storage_check
+import document_export
+import storage_backends
+import replica_sync
+import change_watcher
 
 # Settings file path
 SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "app_settings.json")
 
+# How often the UI checks the background receipt queue for failed writes
+RECEIPT_QUEUE_POLL_MS = 2000
+ATTACHMENT_TRANSFER_POLL_MS = 100
+STORAGE_MIGRATION_POLL_MS = 200
+ATTACHMENT_PREVIEW_POLL_MS = 100
+DOCUMENT_EXPORT_POLL_MS = 100
+BATCH_RECEIPTS_POLL_MS = 100
+REPLICA_SYNC_POLL_MS = 2000
+CHANGE_WATCH_POLL_MS = 500
+
+# Views refreshed when these tables change in the database (change_watcher): refresh method,
+# the tables it shows and the tab it is on. Views on other tabs are refreshed once their tab is shown.
+WATCHED_VIEWS = {
+    "refresh_main_table": ({"transactions", "customers", "services"}, "🏠 Αρχική"),
+    "update_services_dropdown": ({"services"}, "🏠 Αρχική"),
+    "refresh_service_list": ({"services"}, "⚙️ Υπηρεσίες"),
+    "refresh_audit_log": ({"audit_log"}, "📋 Ιστορικό"),
+}
+
+# Largest preview shown in the transaction window, and the size of list thumbnails
+PREVIEW_PANE_SIZE = (300, 400)
+PREVIEW_ICON_SIZE = (32, 32)
+
 # Load user settings
 def load_settings():
     """Load application settings"""
@@ -255,8 +288,21 @@ class EditTransactionWindow(ctk.CTkToplevel):
         )
         add_attach_btn.pack(side="left")
 
+        # Preview pane: previews are rendered in the background and cached locally
+        self.preview_replies = queue.Queue()
+        self.preview_images = {}
+        self.preview_errors = {}
+        self.preview_requested = set()
+        self.preview_icons = {}
+        self.preview_selected = None
+
+        self.preview_frame = ctk.CTkFrame(main_frame)
+        self.preview_frame.pack(fill="x", pady=(0, 10))
+        self.set_preview(text="Επιλέξτε ένα αρχείο για προεπισκόπηση")
+
         # Load and display attachments
         self.load_attachments()
+        self.after(ATTACHMENT_PREVIEW_POLL_MS, self.poll_previews)
 
         # Receipt History Section
         receipts_label = ctk.CTkLabel(main_frame, text="🧾 Ιστορικό Αποδείξεων:", font=ctk.CTkFont(weight="bold"))
@@ -328,18 +374,29 @@ class EditTransactionWindow(ctk.CTkToplevel):
             placeholder.pack(pady=10)
         else:
             for attachment in attachments:
-                att_id, file_name, file_path, file_type, uploaded_at = attachment
+                att_id, file_name, file_path, file_type, uploaded_at, content_hash = attachment
 
                 file_frame = ctk.CTkFrame(self.attachments_list_frame, fg_color="transparent")
                 file_frame.pack(fill="x", pady=2)
 
-                # File info
+                # Thumbnail, replaced by the preview once it is rendered
+                icon_label = ctk.CTkLabel(file_frame, text="📄", width=PREVIEW_ICON_SIZE[0])
+                icon_label.pack(side="left", padx=(0, 5))
+                self.preview_icons[file_path] = icon_label
+
+                # File info (click to preview)
                 file_label = ctk.CTkLabel(
                     file_frame,
-                    text=f"📄 {file_name}",
-                    anchor="w"
+                    text=file_name,
+                    anchor="w",
+                    cursor="hand2"
                 )
                 file_label.pack(side="left", fill="x", expand=True)
+                for widget in (icon_label, file_label):
+                    widget.bind("<Button-1>", lambda e, p=file_path, n=file_name, h=content_hash: self.show_preview(p, n, h))
+
+                if thumbnails.can_preview(file_path):
+                    self.request_preview(file_path, content_hash)
 
                 # Open button
                 open_btn = ctk.CTkButton(
@@ -362,37 +419,104 @@ class EditTransactionWindow(ctk.CTkToplevel):
                 )
                 delete_btn.pack(side="right")
 
+    def request_preview(self, file_path, content_hash=None):
+        """Use the cached preview of a file, or have it rendered in the background"""
+        if file_path in self.preview_images or file_path in self.preview_requested:
+            self.preview_ready(file_path)
+            return
+        image = thumbnails.cached(content_hash) if content_hash else None
+        if image is not None:
+            self.preview_images[file_path] = image
+            self.preview_ready(file_path)
+        else:
+            self.preview_requested.add(file_path)
+            thumbnails.request(file_path, content_hash, self.preview_replies)
+
+    def poll_previews(self):
+        """Apply previews rendered by the background worker"""
+        if not self.winfo_exists():
+            return
+        while True:
+            try:
+                file_path, image, error = self.preview_replies.get_nowait()
+            except queue.Empty:
+                break
+            self.preview_requested.discard(file_path)
+            self.preview_images[file_path] = image
+            if error:
+                self.preview_errors[file_path] = error
+            self.preview_ready(file_path)
+        self.after(ATTACHMENT_PREVIEW_POLL_MS, self.poll_previews)
+
+    def preview_ready(self, file_path):
+        """Show a rendered preview as list thumbnail and, if selected, in the preview pane"""
+        if file_path in self.preview_requested:
+            return
+        image = self.preview_images.get(file_path)
+        if image is None:
+            if file_path == self.preview_selected:
+                error = self.preview_errors.get(file_path, "μη υποστηριζόμενο αρχείο")
+                self.set_preview(text=f"Δεν ήταν δυνατή η προεπισκόπηση: {error}")
+            return
+        icon = self.preview_icons.get(file_path)
+        if icon is not None and icon.winfo_exists():
+            icon.configure(image=self.scaled_image(image, PREVIEW_ICON_SIZE), text="")
+        if file_path == self.preview_selected:
+            self.set_preview(image=self.scaled_image(image, PREVIEW_PANE_SIZE))
+
+    def set_preview(self, image=None, text=""):
+        """Replace the content of the preview pane with an image or a message"""
+        for widget in self.preview_frame.winfo_children():
+            widget.destroy()
+        if image is not None:
+            ctk.CTkLabel(self.preview_frame, image=image, text="").pack(pady=10)
+        else:
+            ctk.CTkLabel(self.preview_frame, text=text, text_color="gray", height=80).pack(fill="x", padx=10, pady=10)
+
+    def scaled_image(self, image, box):
+        """CTkImage of a preview fitted into box, keeping its aspect ratio"""
+        scale = min(box[0] / image.width, box[1] / image.height, 1)
+        return ctk.CTkImage(light_image=image, dark_image=image,
+                            size=(max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+
+    def show_preview(self, file_path, file_name, content_hash=None):
+        """Select a file for the preview pane"""
+        self.preview_selected = file_path
+        if not thumbnails.can_preview(file_path):
+            text = "Δεν υπάρχει προεπισκόπηση για αυτό το είδος αρχείου"
+            if os.path.splitext(file_path)[1].lower() in thumbnails.PDF_TYPES:
+                text = "Η προεπισκόπηση PDF απαιτεί το PyMuPDF (pip install pymupdf)"
+            self.set_preview(text=f"{file_name}\n{text}")
+            return
+        if file_path not in self.preview_images:
+            self.set_preview(text=f"Φόρτωση προεπισκόπησης: {file_name}...")
+        self.request_preview(file_path, content_hash)
+
     def add_attachments(self):
         """Add new attachments to this transaction"""
         filepaths = filedialog.askopenfilenames(title="Επιλογή Αρχείων")
         if filepaths:
-            for filepath in filepaths:
-                # Copy file to attachments directory
-                filename = f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}_{os.path.basename(filepath)}"
-                final_path = os.path.join(db.ATTACHMENTS_DIR, filename)
-                shutil.copy(filepath, final_path)
-
-                # Get file type
-                file_ext = os.path.splitext(filepath)[1].lower()
-
-                # Add to database
-                db.add_attachment(self.transaction_id, final_path, os.path.basename(filepath), file_ext)
+            # Copied in the background; the list is refreshed when the transfer ends
+            AttachmentTransferWindow(self, self.transaction_id, filepaths, on_complete=self.attachments_transferred)
 
-            # Refresh display
+    def attachments_transferred(self, added, failed):
+        if self.winfo_exists():
             self.load_attachments()
-            messagebox.showinfo("Επιτυχία", f"Προστέθηκαν {len(filepaths)} αρχείο/α", parent=self)
 
     def open_attachment(self, file_path):
         """Open an attachment file"""
-        if os.path.exists(file_path):
-            os.startfile(file_path)  # Windows
-        else:
+        try:
+            # Files in object storage are downloaded first
+            os.startfile(storage_backends.local_path(file_path))  # Windows
+        except FileNotFoundError:
             messagebox.showerror("Σφάλμα", "Το αρχείο δεν βρέθηκε", parent=self)
+        except OSError as e:
+            messagebox.showerror("Σφάλμα", f"Το αρχείο δεν άνοιξε:\n{e}", parent=self)
 
     def delete_attachment(self, attachment_id):
         """Delete an attachment"""
         if messagebox.askyesno("Επιβεβαίωση", "Είστε σίγουροι ότι θέλετε να διαγράψετε αυτό το αρχείο;", parent=self):
-            db.delete_attachment(attachment_id)
+            attachment_store.remove_attachment(attachment_id)
             self.load_attachments()
             messagebox.showinfo("Επιτυχία", "Το αρχείο διαγράφηκε", parent=self)
 
@@ -426,13 +550,15 @@ class EditTransactionWindow(ctk.CTkToplevel):
                 except:
                     date_str = issued_at
 
-                # Receipt info
+                # Receipt info (click to preview)
                 receipt_label = ctk.CTkLabel(
                     receipt_frame,
                     text=f"🧾 {receipt_type} - {date_str}" + (f" (#{receipt_number})" if receipt_number else ""),
-                    anchor="w"
+                    anchor="w",
+                    cursor="hand2"
                 )
                 receipt_label.pack(side="left", fill="x", expand=True)
+                receipt_label.bind("<Button-1>", lambda e, p=file_path, n=receipt_type: self.show_preview(p, n))
 
                 # Open button
                 open_btn = ctk.CTkButton(
@@ -456,12 +582,116 @@ class EditTransactionWindow(ctk.CTkToplevel):
 
     def reprint_receipt(self, file_path):
         """Reprint an existing receipt"""
-        if os.path.exists(file_path):
+        try:
             # Just open the file - user can print from their PDF viewer
-            os.startfile(file_path)
-            messagebox.showinfo("Επανεκτύπωση", "Το αρχείο ανοίχτηκε. Μπορείτε να το εκτυπώσετε από το πρόγραμμα προβολής PDF.", parent=self)
-        else:
+            os.startfile(storage_backends.local_path(file_path))
+        except FileNotFoundError:
             messagebox.showerror("Σφάλμα", "Το αρχείο απόδειξης δεν βρέθηκε", parent=self)
+            return
+        except OSError as e:
+            messagebox.showerror("Σφάλμα", f"Το αρχείο απόδειξης δεν άνοιξε:\n{e}", parent=self)
+            return
+        messagebox.showinfo("Επανεκτύπωση", "Το αρχείο ανοίχτηκε. Μπορείτε να το εκτυπώσετε από το πρόγραμμα προβολής PDF.", parent=self)
+
+
+class AttachmentTransferWindow(ctk.CTkToplevel):
+    """Progress of attachment copies running on a worker thread, with cancel"""
+
+    def __init__(self, master, transaction_id, filepaths, on_complete=None):
+        super().__init__(master)
+        self.on_complete = on_complete
+        self.finished = False
+        self.results = {}
+
+        self.title(f"Μεταφορά Αρχείων - Συναλλαγή #{transaction_id}")
+        self.geometry("560x420")
+        self.transient(master)
+
+        title_label = ctk.CTkLabel(self, text="📎 Μεταφορά Συνημμένων", font=ctk.CTkFont(size=18, weight="bold"))
+        title_label.pack(pady=(15, 10))
+
+        files_frame = ctk.CTkScrollableFrame(self)
+        files_frame.pack(fill="both", expand=True, padx=15, pady=(0, 10))
+
+        self.rows = []
+        for filepath in filepaths:
+            row = ctk.CTkFrame(files_frame, fg_color="transparent")
+            row.pack(fill="x", pady=4)
+
+            name_label = ctk.CTkLabel(row, text=f"📄 {os.path.basename(filepath)}", anchor="w")
+            name_label.pack(fill="x")
+
+            progress_bar = ctk.CTkProgressBar(row)
+            progress_bar.pack(fill="x", pady=(2, 0))
+            progress_bar.set(0)
+
+            status_label = ctk.CTkLabel(row, text="Σε αναμονή", text_color="gray", anchor="w")
+            status_label.pack(fill="x")
+            self.rows.append((progress_bar, status_label))
+
+        self.summary_label = ctk.CTkLabel(self, text=f"0 / {len(filepaths)} αρχεία", text_color="gray")
+        self.summary_label.pack(pady=(0, 5))
+
+        self.action_btn = ctk.CTkButton(
+            self,
+            text="✖ Ακύρωση",
+            command=self.cancel,
+            fg_color="#dc2626",
+            hover_color="#991b1b",
+            height=35
+        )
+        self.action_btn.pack(fill="x", padx=15, pady=(0, 15))
+
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+        self.manager = attachment_store.TransferManager(transaction_id, filepaths).start()
+        self.after(ATTACHMENT_TRANSFER_POLL_MS, self.poll_transfer)
+
+    def cancel(self):
+        """Cancel the remaining copies, or close the window once the transfer has ended"""
+        if self.finished:
+            self.destroy()
+        elif messagebox.askyesno("Ακύρωση", "Ακύρωση της μεταφοράς των αρχείων που απομένουν;", parent=self):
+            self.manager.cancel()
+            self.action_btn.configure(state="disabled", text="Ακύρωση...")
+
+    def poll_transfer(self):
+        """Apply the progress events of the worker thread"""
+        try:
+            while True:
+                event = self.manager.events.get_nowait()
+                if event[0] == "state":
+                    _kind, index, text = event
+                    self.rows[index][1].configure(text=text)
+                elif event[0] == "progress":
+                    _kind, index, done, total = event
+                    self.rows[index][0].set(done / total if total else 1)
+                    self.rows[index][1].configure(
+                        text=f"{done / (1024 * 1024):.1f} / {total / (1024 * 1024):.1f} MB")
+                elif event[0] == "done":
+                    _kind, index, ok, message = event
+                    self.results[index] = ok
+                    self.rows[index][1].configure(text=("✅ " if ok else "❌ ") + message,
+                                                  text_color="#4ade80" if ok else "#f87171")
+                    self.summary_label.configure(text=f"{len(self.results)} / {len(self.rows)} αρχεία")
+                elif event[0] == "finished":
+                    self.transfer_finished()
+                    return
+        except queue.Empty:
+            pass
+        self.after(ATTACHMENT_TRANSFER_POLL_MS, self.poll_transfer)
+
+    def transfer_finished(self):
+        self.finished = True
+        added = sum(1 for ok in self.results.values() if ok)
+        failed = len(self.results) - added
+        self.summary_label.configure(text=f"Προστέθηκαν {added} αρχεία" + (f", ❌ {failed} αποτυχίες" if failed else ""))
+        button_theme = ctk.ThemeManager.theme["CTkButton"]
+        self.action_btn.configure(state="normal", text="✔ Κλείσιμο", fg_color=button_theme["fg_color"],
+                                  hover_color=button_theme["hover_color"])
+        if self.on_complete:
+            self.on_complete(added, failed)
+        if not failed:
+            self.after(1500, lambda: self.winfo_exists() and self.destroy())
 
 
 class CustomerProfileWindow(ctk.CTkToplevel):
@@ -666,7 +896,23 @@ class CustomerProfileWindow(ctk.CTkToplevel):
             command=self.generate_receipt,
             height=35
         )
-        receipt_btn.pack(side="left", padx=(5, 0))
+        receipt_btn.pack(side="left", padx=(5, 5))
+
+        statement_btn = ctk.CTkButton(
+            actions_frame,
+            text="📑 Κατάσταση Λογαριασμού",
+            command=lambda: StatementWindow(self, self.customer_name),
+            height=35
+        )
+        statement_btn.pack(side="left", padx=(5, 5))
+
+        export_btn = ctk.CTkButton(
+            actions_frame,
+            text="🗜️ Έγγραφα (ZIP)",
+            command=lambda: DocumentExportWindow(self, self.customer_name),
+            height=35
+        )
+        export_btn.pack(side="left", padx=(5, 0))
 
     def create_field(self, parent, label_text, value, attr_name, show=None):
         """Helper to create labeled entry fields"""
@@ -980,17 +1226,20 @@ class ReceiptOptionsWindow(ctk.CTkToplevel):
             messagebox.showwarning("Προσοχή", "Παρακαλώ εισάγετε το όνομα της εταιρείας.", parent=self)
             return
 
-        # Save settings if checkbox is checked
+        # Save settings if checkbox is checked (skipped while the share is unreachable)
         if self.save_settings_var.get():
-            db.update_company_settings(
-                company_name,
-                self.logo_path.get(),
-                self.signature_path.get(),
-                company_address,
-                company_phone,
-                company_email,
-                company_tax
-            )
+            try:
+                db.update_company_settings(
+                    company_name,
+                    self.logo_path.get(),
+                    self.signature_path.get(),
+                    company_address,
+                    company_phone,
+                    company_email,
+                    company_tax
+                )
+            except receipt_queue.SHARE_ERRORS:
+                pass
 
         # Ask where to save
         default_filename = f"Apoδειξη_{self.trans_id}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
@@ -1004,9 +1253,6 @@ class ReceiptOptionsWindow(ctk.CTkToplevel):
         if not output_path:
             return
 
-        # Get comments from textbox
-        receipt_comments = self.receipt_comments_textbox.get("1.0", "end-1c").strip()
-
         # Create receipt generator
         generator = ReceiptGenerator(
             company_name=company_name,
@@ -1023,11 +1269,13 @@ class ReceiptOptionsWindow(ctk.CTkToplevel):
 
         try:
             receipt_type_text = "Απόδειξη Πληρωμής" if self.receipt_type.get() == "payment" else "Απόδειξη Είσπραξης"
-            receipt_number = f"#{self.trans_id}"
+            receipt_number, provisional = receipt_queue.next_receipt_number(self.receipt_type.get(), self.trans_id)
 
+            # Render once into memory; both copies are written from this buffer
+            buffer = io.BytesIO()
             if self.receipt_type.get() == "payment":
                 generator.generate_payment_receipt(
-                    output_path,
+                    buffer,
                     receipt_number,
                     self.customer_name,
                     self.amount,
@@ -1038,7 +1286,7 @@ class ReceiptOptionsWindow(ctk.CTkToplevel):
                 )
             else:
                 generator.generate_collection_receipt(
-                    output_path,
+                    buffer,
                     receipt_number,
                     self.customer_name,
                     self.amount,
@@ -1048,21 +1296,20 @@ class ReceiptOptionsWindow(ctk.CTkToplevel):
                     custom_notes=custom_notes
                 )
 
-            # Save a copy to attachments directory for tracking
-            backup_filename = f"receipt_{self.trans_id}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-            backup_path = os.path.join(db.ATTACHMENTS_DIR, backup_filename)
-            shutil.copy(output_path, backup_path)
-
-            # Record the issued receipt in database
-            db.add_issued_receipt(
-                self.trans_id,
-                receipt_type_text,
-                backup_path,
-                receipt_number,
-                ""  # issued_by (could be added in future)
-            )
+            data = buffer.getvalue()
+            with open(output_path, 'wb') as f:
+                f.write(data)
 
-            messagebox.showinfo("Επιτυχία", f"Η απόδειξη δημιουργήθηκε επιτυχώς!\n\n{output_path}", parent=self)
+            # The copy in the attachments directory and the issued_receipts record are
+            # spooled locally and written in the background, also when the share is offline
+            store_filename = f"receipt_{self.trans_id}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+            receipt_queue.submit(self.trans_id, receipt_type_text, receipt_number, store_filename, data)
+
+            message = f"Η απόδειξη δημιουργήθηκε επιτυχώς!\n\n{output_path}"
+            if provisional:
+                message += (f"\n\nΟ κοινόχρηστος φάκελος δεν είναι διαθέσιμος: η απόδειξη πήρε τον αριθμό {receipt_number} "
+                            "και θα καταχωρηθεί μόλις επανέλθει η σύνδεση.")
+            messagebox.showinfo("Επιτυχία", message, parent=self)
 
             # Ask if user wants to open the file
             if messagebox.askyesno("Άνοιγμα Αρχείου", "Θέλετε να ανοίξετε την απόδειξη;", parent=self):
@@ -1074,6 +1321,483 @@ class ReceiptOptionsWindow(ctk.CTkToplevel):
             messagebox.showerror("Σφάλμα", f"Αποτυχία δημιουργίας απόδειξης:\n{str(e)}", parent=self)
 
 
+class BatchReceiptWindow(ctk.CTkToplevel):
+    """Batch receipt generation for many transactions"""
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.master_app = master
+        self.transactions = []
+        self.batch = None
+        self.batch_errors = []
+
+        self.title("Μαζική Έκδοση Αποδείξεων")
+        self.geometry("600x650")
+        self.transient(master)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ctk.CTkScrollableFrame(self)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+        title_label = ctk.CTkLabel(
+            main_frame,
+            text="🧾 Μαζική Έκδοση Αποδείξεων",
+            font=ctk.CTkFont(size=20, weight="bold")
+        )
+        title_label.pack(pady=(0, 20))
+
+        # Filters
+        filters_frame = ctk.CTkFrame(main_frame)
+        filters_frame.pack(fill="x", pady=(0, 15))
+
+        filters_label = ctk.CTkLabel(filters_frame, text="Επιλογή Συναλλαγών:", font=ctk.CTkFont(weight="bold", size=14))
+        filters_label.pack(pady=(15, 10), padx=15, anchor="w")
+
+        dates_frame = ctk.CTkFrame(filters_frame, fg_color="transparent")
+        dates_frame.pack(fill="x", padx=15, pady=(0, 10))
+
+        self.date_from_entry = ctk.CTkEntry(dates_frame, height=32, placeholder_text="Από (YYYY-MM-DD)")
+        self.date_from_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.date_from_entry.insert(0, datetime.date.today().replace(day=1).strftime('%Y-%m-%d'))
+
+        self.date_to_entry = ctk.CTkEntry(dates_frame, height=32, placeholder_text="Έως (YYYY-MM-DD)")
+        self.date_to_entry.pack(side="right", fill="x", expand=True, padx=(5, 0))
+        self.date_to_entry.insert(0, datetime.date.today().strftime('%Y-%m-%d'))
+
+        self.customer_entry = ctk.CTkEntry(filters_frame, height=32, placeholder_text="Πελάτης (προαιρετικό)")
+        self.customer_entry.pack(fill="x", padx=15, pady=(0, 10))
+
+        self.status_var = ctk.StringVar(value="Πληρώθηκε")
+        status_menu = ctk.CTkOptionMenu(
+            filters_frame,
+            variable=self.status_var,
+            values=["Όλα", "Εκκρεμεί", "Πληρώθηκε"]
+        )
+        status_menu.pack(fill="x", padx=15, pady=(0, 10))
+
+        find_btn = ctk.CTkButton(filters_frame, text="🔍 Αναζήτηση", command=self.find_transactions, height=35)
+        find_btn.pack(fill="x", padx=15, pady=(0, 10))
+
+        self.found_label = ctk.CTkLabel(filters_frame, text="", text_color="gray")
+        self.found_label.pack(padx=15, pady=(0, 15), anchor="w")
+
+        # Receipt Type
+        type_frame = ctk.CTkFrame(main_frame)
+        type_frame.pack(fill="x", pady=(0, 15))
+
+        type_label = ctk.CTkLabel(type_frame, text="Τύπος Απόδειξης:", font=ctk.CTkFont(weight="bold"))
+        type_label.pack(pady=(15, 5), padx=15, anchor="w")
+
+        self.receipt_type = ctk.StringVar(value="payment")
+        for value, text in batch_receipts.RECEIPT_TYPES.items():
+            radio = ctk.CTkRadioButton(type_frame, text=text, variable=self.receipt_type, value=value)
+            radio.pack(padx=20, pady=(5, 10), anchor="w")
+
+        # Progress
+        self.progress_bar = ctk.CTkProgressBar(main_frame)
+        self.progress_bar.pack(fill="x", pady=(0, 5))
+        self.progress_bar.set(0)
+
+        self.progress_label = ctk.CTkLabel(main_frame, text="", text_color="gray")
+        self.progress_label.pack(pady=(0, 10), anchor="w")
+
+        self.generate_btn = ctk.CTkButton(
+            main_frame,
+            text="📄 Έκδοση Αποδείξεων",
+            command=self.generate_receipts,
+            height=45,
+            font=ctk.CTkFont(size=15, weight="bold")
+        )
+        self.generate_btn.pack(fill="x", pady=(5, 0))
+
+    def find_transactions(self):
+        """Find the transactions that match the filters"""
+        date_from = self.date_from_entry.get().strip() or None
+        date_to = self.date_to_entry.get().strip() or None
+        try:
+            for value in (date_from, date_to):
+                if value:
+                    datetime.datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            messagebox.showerror("Σφάλμα", "Οι ημερομηνίες πρέπει να είναι της μορφής YYYY-MM-DD.", parent=self)
+            return False
+
+        self.transactions = batch_receipts.find_transactions(
+            date_from=date_from,
+            date_to=date_to,
+            status=self.status_var.get(),
+            customer_name=self.customer_entry.get().strip() or None
+        )
+        total = sum(t[5] or 0 for t in self.transactions)
+        self.found_label.configure(text=f"Βρέθηκαν {len(self.transactions)} συναλλαγές, σύνολο {total:.2f} €")
+        return True
+
+    def generate_receipts(self):
+        """Render all receipts in worker processes and record them"""
+        generator_kwargs = batch_receipts.company_settings_kwargs()
+        if not generator_kwargs:
+            messagebox.showwarning("Προσοχή",
+                                   "Δεν έχουν αποθηκευτεί στοιχεία εταιρείας.\n"
+                                   "Εκδώστε πρώτα μια απόδειξη με αποθήκευση των στοιχείων.", parent=self)
+            return
+
+        if not self.find_transactions():
+            return
+        if not self.transactions:
+            messagebox.showinfo("Πληροφορία", "Δεν βρέθηκαν συναλλαγές.", parent=self)
+            return
+
+        receipt_type = self.receipt_type.get()
+        if not messagebox.askyesno("Επιβεβαίωση",
+                                   f"Θα εκδοθούν {len(self.transactions)} αποδείξεις "
+                                   f"({batch_receipts.RECEIPT_TYPES[receipt_type]}).\n\nΣυνέχεια;", parent=self):
+            return
+
+        self.generate_btn.configure(state="disabled")
+        self.batch_done = 0
+        self.batch_errors = []
+        self.batch = batch_receipts.BatchRun(self.transactions, receipt_type, generator_kwargs).start()
+        self.after(BATCH_RECEIPTS_POLL_MS, self.poll_batch)
+
+    def poll_batch(self):
+        """Apply the batch run's events to the progress bar"""
+        if not self.winfo_exists() or self.batch is None:
+            return
+        total = len(self.transactions)
+        while True:
+            try:
+                event = self.batch.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "done":
+                _, trans_id, ok, message = event
+                self.batch_done += 1
+                if not ok:
+                    self.batch_errors.append(f"#{trans_id}: {message}")
+                self.progress_bar.set(self.batch_done / total)
+                self.progress_label.configure(text=f"{self.batch_done} / {total}")
+            elif event[0] == "finished":
+                _, result, error = event
+                cancelled = self.batch.cancelled.is_set()
+                self.batch = None
+                self.generate_btn.configure(state="normal")
+                if error:
+                    messagebox.showerror("Σφάλμα", f"Αποτυχία μαζικής έκδοσης:\n{error}", parent=self)
+                    return
+                issued, failed, elapsed = result
+                message = (f"Εκδόθηκαν {issued} αποδείξεις σε {elapsed:.1f} δευτ. "
+                           f"({issued / max(elapsed, 0.001):.1f} / δευτ.)")
+                if cancelled:
+                    message += f"\n\nΗ έκδοση διακόπηκε: {total - issued - failed} αποδείξεις δεν εκδόθηκαν."
+                if failed:
+                    message += f"\n\n❌ Αποτυχίες: {failed}\n" + "\n".join(self.batch_errors[:10])
+                messagebox.showinfo("Ολοκλήρωση", message, parent=self)
+                self.destroy()
+                return
+        self.after(BATCH_RECEIPTS_POLL_MS, self.poll_batch)
+
+    def close(self):
+        """Stop a running batch (rendered receipts are still recorded), else close"""
+        if self.batch is not None:
+            if messagebox.askyesno("Ακύρωση", "Διακοπή της έκδοσης;\n\n"
+                                   "Οι αποδείξεις που έχουν ήδη εκδοθεί θα καταχωρηθούν.", parent=self):
+                self.batch.cancel()
+                self.progress_label.configure(text="Διακοπή...")
+            return
+        self.destroy()
+
+
+class StatementWindow(ctk.CTkToplevel):
+    """Single-PDF statement or multi-receipt document for one customer"""
+
+    def __init__(self, master, customer_name):
+        super().__init__(master)
+        self.customer_name = customer_name
+
+        self.title(f"Κατάσταση Λογαριασμού - {customer_name}")
+        self.geometry("500x560")
+        self.transient(master)
+        self.grab_set()
+
+        main_frame = ctk.CTkScrollableFrame(self)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+        title_label = ctk.CTkLabel(
+            main_frame,
+            text="📑 Κατάσταση Λογαριασμού",
+            font=ctk.CTkFont(size=20, weight="bold")
+        )
+        title_label.pack(pady=(0, 20))
+
+        # Period
+        period_frame = ctk.CTkFrame(main_frame)
+        period_frame.pack(fill="x", pady=(0, 15))
+
+        period_label = ctk.CTkLabel(period_frame, text="Περίοδος:", font=ctk.CTkFont(weight="bold"))
+        period_label.pack(pady=(15, 5), padx=15, anchor="w")
+
+        dates_frame = ctk.CTkFrame(period_frame, fg_color="transparent")
+        dates_frame.pack(fill="x", padx=15, pady=(0, 10))
+
+        self.date_from_entry = ctk.CTkEntry(dates_frame, height=32, placeholder_text="Από (YYYY-MM-DD)")
+        self.date_from_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.date_from_entry.insert(0, datetime.date.today().replace(month=1, day=1).strftime('%Y-%m-%d'))
+
+        self.date_to_entry = ctk.CTkEntry(dates_frame, height=32, placeholder_text="Έως (YYYY-MM-DD)")
+        self.date_to_entry.pack(side="right", fill="x", expand=True, padx=(5, 0))
+        self.date_to_entry.insert(0, datetime.date.today().strftime('%Y-%m-%d'))
+
+        self.status_var = ctk.StringVar(value="Όλα")
+        status_menu = ctk.CTkOptionMenu(
+            period_frame,
+            variable=self.status_var,
+            values=["Όλα", "Εκκρεμεί", "Πληρώθηκε"]
+        )
+        status_menu.pack(fill="x", padx=15, pady=(0, 15))
+
+        # Document type
+        mode_frame = ctk.CTkFrame(main_frame)
+        mode_frame.pack(fill="x", pady=(0, 15))
+
+        mode_label = ctk.CTkLabel(mode_frame, text="Μορφή Εγγράφου:", font=ctk.CTkFont(weight="bold"))
+        mode_label.pack(pady=(15, 5), padx=15, anchor="w")
+
+        self.mode_var = ctk.StringVar(value="table")
+        modes = [
+            ("table", "Πίνακας με τρέχοντα σύνολα"),
+            ("payment", "Μία Απόδειξη Πληρωμής ανά σελίδα"),
+            ("collection", "Μία Απόδειξη Είσπραξης ανά σελίδα"),
+        ]
+        for value, text in modes:
+            radio = ctk.CTkRadioButton(mode_frame, text=text, variable=self.mode_var, value=value)
+            radio.pack(padx=20, pady=(5, 10), anchor="w")
+
+        generate_btn = ctk.CTkButton(
+            main_frame,
+            text="📄 Δημιουργία PDF",
+            command=self.generate_statement,
+            height=45,
+            font=ctk.CTkFont(size=15, weight="bold")
+        )
+        generate_btn.pack(fill="x", pady=(5, 0))
+
+    def generate_statement(self):
+        """Stream the customer's transactions into one PDF"""
+        date_from = self.date_from_entry.get().strip() or None
+        date_to = self.date_to_entry.get().strip() or None
+        try:
+            for value in (date_from, date_to):
+                if value:
+                    datetime.datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            messagebox.showerror("Σφάλμα", "Οι ημερομηνίες πρέπει να είναι της μορφής YYYY-MM-DD.", parent=self)
+            return
+
+        default_filename = f"Katastasi_{self.customer_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        output_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf")],
+            initialfile=default_filename,
+            title="Αποθήκευση Κατάστασης",
+            parent=self
+        )
+        if not output_path:
+            return
+
+        generator = ReceiptGenerator(**(batch_receipts.company_settings_kwargs() or {}))
+        mode = self.mode_var.get()
+        period = " - ".join(format_date(d) for d in (date_from, date_to) if d)
+
+        try:
+            transactions = db.iter_customer_transactions(self.customer_name, date_from, date_to, self.status_var.get())
+            if mode == "table":
+                count, total = generator.generate_statement(output_path, self.customer_name, transactions, period=period)
+            else:
+                count, total = generator.generate_statement(output_path, self.customer_name, transactions,
+                                                            mode="receipts", receipt_type=mode)
+        except Exception as e:
+            messagebox.showerror("Σφάλμα", f"Αποτυχία δημιουργίας κατάστασης:\n{str(e)}", parent=self)
+            return
+
+        if not count:
+            os.remove(output_path)
+            messagebox.showinfo("Πληροφορία", "Δεν βρέθηκαν συναλλαγές για την περίοδο.", parent=self)
+            return
+
+        if messagebox.askyesno("Επιτυχία",
+                               f"Δημιουργήθηκε PDF με {count} συναλλαγές, σύνολο {total:.2f} €.\n\n"
+                               f"{output_path}\n\nΘέλετε να ανοίξετε το αρχείο;", parent=self):
+            os.startfile(output_path)
+        self.destroy()
+
+class DocumentExportWindow(ctk.CTkToplevel):
+    """Export all attachments and receipts of a customer and/or period into one ZIP"""
+
+    def __init__(self, master, customer_name=None):
+        super().__init__(master)
+        self.exporter = None
+
+        self.title("Εξαγωγή Εγγράφων" + (f" - {customer_name}" if customer_name else ""))
+        self.geometry("520x520")
+        self.transient(master)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+        title_label = ctk.CTkLabel(
+            main_frame,
+            text="🗜️ Εξαγωγή Εγγράφων σε ZIP",
+            font=ctk.CTkFont(size=20, weight="bold")
+        )
+        title_label.pack(pady=(0, 20))
+
+        filters_frame = ctk.CTkFrame(main_frame)
+        filters_frame.pack(fill="x", pady=(0, 15))
+
+        customer_label = ctk.CTkLabel(filters_frame, text="Πελάτης (κενό για όλους):", font=ctk.CTkFont(weight="bold"))
+        customer_label.pack(pady=(15, 5), padx=15, anchor="w")
+
+        self.customer_entry = ctk.CTkEntry(filters_frame, height=32, placeholder_text="Όνομα πελάτη")
+        self.customer_entry.pack(fill="x", padx=15, pady=(0, 10))
+        if customer_name:
+            self.customer_entry.insert(0, customer_name)
+
+        period_label = ctk.CTkLabel(filters_frame, text="Περίοδος:", font=ctk.CTkFont(weight="bold"))
+        period_label.pack(pady=(5, 5), padx=15, anchor="w")
+
+        dates_frame = ctk.CTkFrame(filters_frame, fg_color="transparent")
+        dates_frame.pack(fill="x", padx=15, pady=(0, 15))
+
+        self.date_from_entry = ctk.CTkEntry(dates_frame, height=32, placeholder_text="Από (YYYY-MM-DD)")
+        self.date_from_entry.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.date_from_entry.insert(0, datetime.date.today().replace(month=1, day=1).strftime('%Y-%m-%d'))
+
+        self.date_to_entry = ctk.CTkEntry(dates_frame, height=32, placeholder_text="Έως (YYYY-MM-DD)")
+        self.date_to_entry.pack(side="right", fill="x", expand=True, padx=(5, 0))
+        self.date_to_entry.insert(0, datetime.date.today().strftime('%Y-%m-%d'))
+
+        info_label = ctk.CTkLabel(
+            main_frame,
+            text=f"Το αρχείο {document_export.MANIFEST_NAME} μέσα στο ZIP αντιστοιχίζει κάθε έγγραφο στη συναλλαγή του.",
+            text_color="gray",
+            wraplength=460,
+            justify="left"
+        )
+        info_label.pack(fill="x", pady=(0, 10))
+
+        self.status_label = ctk.CTkLabel(main_frame, text="", anchor="w")
+        self.status_label.pack(fill="x", pady=(0, 5))
+
+        self.progress_bar = ctk.CTkProgressBar(main_frame)
+        self.progress_bar.pack(fill="x", pady=(0, 15))
+        self.progress_bar.set(0)
+
+        buttons_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        buttons_frame.pack(fill="x")
+
+        self.export_btn = ctk.CTkButton(
+            buttons_frame,
+            text="🗜️ Εξαγωγή",
+            command=self.start_export,
+            height=45,
+            font=ctk.CTkFont(size=15, weight="bold")
+        )
+        self.export_btn.pack(side="left", fill="x", expand=True, padx=(0, 5))
+
+        self.cancel_btn = ctk.CTkButton(
+            buttons_frame,
+            text="✖ Ακύρωση",
+            command=self.close,
+            height=45,
+            fg_color="gray",
+            font=ctk.CTkFont(size=15)
+        )
+        self.cancel_btn.pack(side="right", fill="x", expand=True, padx=(5, 0))
+
+    def start_export(self):
+        customer_name = self.customer_entry.get().strip() or None
+        date_from = self.date_from_entry.get().strip() or None
+        date_to = self.date_to_entry.get().strip() or None
+        try:
+            for value in (date_from, date_to):
+                if value:
+                    datetime.datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            messagebox.showerror("Σφάλμα", "Οι ημερομηνίες πρέπει να είναι της μορφής YYYY-MM-DD.", parent=self)
+            return
+        if not (customer_name or date_from or date_to):
+            if not messagebox.askyesno("Επιβεβαίωση", "Χωρίς πελάτη και περίοδο θα εξαχθούν όλα τα έγγραφα. Συνέχεια;", parent=self):
+                return
+
+        parts = [document_export.safe_name(customer_name) if customer_name else "Eggrafa"]
+        parts += [d for d in (date_from, date_to) if d]
+        output_path = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            filetypes=[("ZIP files", "*.zip")],
+            initialfile="_".join(parts) + ".zip",
+            title="Αποθήκευση Εγγράφων",
+            parent=self
+        )
+        if not output_path:
+            return
+
+        self.export_btn.configure(state="disabled")
+        self.status_label.configure(text="Αναζήτηση εγγράφων...")
+        self.exporter = document_export.DocumentExporter(output_path, customer_name, date_from, date_to).start()
+        self.after(DOCUMENT_EXPORT_POLL_MS, self.poll_export)
+
+    def poll_export(self):
+        """Apply the exporter's events to the progress bar"""
+        if not self.winfo_exists() or self.exporter is None:
+            return
+        while True:
+            try:
+                event = self.exporter.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "file":
+                _, index, total, name = event
+                self.progress_bar.set(index / total if total else 0)
+                self.status_label.configure(
+                    text=f"{index + 1}/{total} ({self.exporter.written / (1024 * 1024):.1f} MB): {name}")
+            elif event[0] == "finished":
+                _, result, error = event
+                output_path = self.exporter.output_path
+                self.exporter = None
+                self.export_btn.configure(state="normal")
+                self.progress_bar.set(1 if result else 0)
+                if error:
+                    self.status_label.configure(text=error)
+                    if error != "Ακυρώθηκε":
+                        messagebox.showerror("Σφάλμα", f"Αποτυχία εξαγωγής:\n{error}", parent=self)
+                    return
+                exported, missing, size = result
+                if not exported and not missing:
+                    os.remove(output_path)
+                    self.status_label.configure(text="")
+                    messagebox.showinfo("Πληροφορία", "Δεν βρέθηκαν έγγραφα για τα κριτήρια.", parent=self)
+                    return
+                message = f"Εξήχθησαν {exported} έγγραφα ({size / (1024 * 1024):.1f} MB)."
+                if missing:
+                    message += f"\n{missing} αρχεία δεν βρέθηκαν (σημειώνονται στο {document_export.MANIFEST_NAME})."
+                self.status_label.configure(text=message.split("\n")[0])
+                if messagebox.askyesno("Επιτυχία", f"{message}\n\n{output_path}\n\nΘέλετε να ανοίξετε το αρχείο;", parent=self):
+                    os.startfile(output_path)
+                self.destroy()
+                return
+        self.after(DOCUMENT_EXPORT_POLL_MS, self.poll_export)
+
+    def close(self):
+        """Cancel a running export (its partial archive is removed) and close"""
+        if self.exporter is not None:
+            if not messagebox.askyesno("Ακύρωση", "Διακοπή της εξαγωγής;", parent=self):
+                return
+            self.exporter.cancel()
+        self.destroy()
+
 # ========== MAIN APPLICATION ==========
 
 class App(ctk.CTk):
@@ -1083,6 +1807,15 @@ class App(ctk.CTk):
         self.title("Σύστημα Διαχείρισης Έργων v8.0 - Modern Edition")
         self.geometry("1400x800")
 
+        # Local-first mode: work on a local replica, synchronized with the share in the background
+        if replica_sync.LOCAL_FIRST:
+            try:
+                replica_sync.start()
+            except Exception as e:
+                messagebox.showwarning("Προσοχή",
+                                       f"Δεν ήταν δυνατή η δημιουργία του τοπικού αντιγράφου της βάσης:\n{e}\n\n"
+                                       "Η εφαρμογή θα λειτουργήσει απευθείας με τη βάση του δικτύου.")
+
         # Initialize database
         db.connect_db()
 
@@ -1115,8 +1848,29 @@ class App(ctk.CTk):
         )
         self.theme_button.pack(side="right")
 
+        # Receipts waiting to be written to the share (hidden when none)
+        self.receipt_queue_button = ctk.CTkButton(
+            header_frame,
+            text="",
+            command=receipt_queue.retry_now,
+            fg_color="#b45309",
+            hover_color="#92400e",
+            height=32
+        )
+
+        # Local changes not yet synchronized, or conflicts to review (hidden when none)
+        self.replica_sync_button = ctk.CTkButton(
+            header_frame,
+            text="",
+            command=self.replica_sync_clicked,
+            fg_color="#b45309",
+            hover_color="#92400e",
+            height=32
+        )
+
         # Create tab view
-        self.tab_view = ctk.CTkTabview(self)
+        self.stale_views = set()
+        self.tab_view = ctk.CTkTabview(self, command=self.refresh_stale_views)
         self.tab_view.pack(expand=True, fill="both", padx=15, pady=15)
 
         # Create tabs
@@ -1125,6 +1879,7 @@ class App(ctk.CTk):
         self.services_tab = self.tab_view.add("⚙️ Υπηρεσίες")
         self.import_tab = self.tab_view.add("📤 Εισαγωγή")
         self.log_tab = self.tab_view.add("📋 Ιστορικό")
+        self.storage_tab = self.tab_view.add("🗄️ Αποθήκευση")
 
         # Build tabs
         self.create_main_tab()
@@ -1132,10 +1887,22 @@ class App(ctk.CTk):
         self.create_services_tab()
         self.create_import_tab()
         self.create_log_tab()
+        self.create_storage_tab()
 
         # Set default tab
         self.tab_view.set("🏠 Αρχική")
 
+        # Send receipts spooled in a previous session and watch the queue
+        receipt_queue.start()
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.after(RECEIPT_QUEUE_POLL_MS, self.check_receipt_queue)
+        if replica_sync.running():
+            self.after(REPLICA_SYNC_POLL_MS, self.check_replica_sync)
+
+        # Refresh the lists when other PCs change the database
+        self.change_watcher = change_watcher.ChangeWatcher().start()
+        self.after(CHANGE_WATCH_POLL_MS, self.check_changes)
+
     # ========== MAIN TAB (Home) ==========
 
     def create_main_tab(self):
@@ -1356,6 +2123,24 @@ class App(ctk.CTk):
         )
         delete_btn.pack(side="left", padx=(5, 0))
 
+        batch_receipts_btn = ctk.CTkButton(
+            action_frame,
+            text="🧾 Μαζικές Αποδείξεις",
+            command=lambda: BatchReceiptWindow(self),
+            height=35,
+            width=160
+        )
+        batch_receipts_btn.pack(side="right")
+
+        export_documents_btn = ctk.CTkButton(
+            action_frame,
+            text="🗜️ Εξαγωγή Εγγράφων",
+            command=lambda: DocumentExportWindow(self),
+            height=35,
+            width=160
+        )
+        export_documents_btn.pack(side="right", padx=(0, 10))
+
         # Refresh table
         self.refresh_main_table()
 
@@ -1518,18 +2303,9 @@ class App(ctk.CTk):
             cost_pre_vat_float, cost_final_float, status, ""
         )
 
-        # Handle multiple attachments
+        # Handle multiple attachments (copied in the background)
         if self.selected_files:
-            for original_path in self.selected_files:
-                filename = f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}_{os.path.basename(original_path)}"
-                final_path = os.path.join(db.ATTACHMENTS_DIR, filename)
-                shutil.copy(original_path, final_path)
-
-                # Get file type
-                file_ext = os.path.splitext(original_path)[1].lower()
-
-                # Add to attachments table
-                db.add_attachment(transaction_id, final_path, os.path.basename(original_path), file_ext)
+            AttachmentTransferWindow(self, transaction_id, self.selected_files)
 
         # Log the action
         db.add_audit_log(
@@ -1555,6 +2331,10 @@ class App(ctk.CTk):
         if filter_choice is None:
             filter_choice = self.filter_var.get()
 
+        # Keep the selection and scroll position across the reload
+        selected_ids = {self.tree.item(item)['values'][0] for item in self.tree.selection()}
+        scroll_position = self.tree.yview()[0]
+
         # Clear existing items
         for item in self.tree.get_children():
             self.tree.delete(item)
@@ -1562,11 +2342,18 @@ class App(ctk.CTk):
         # Get records
         records = db.get_all_transactions(filter_choice)
 
+        reselect = []
         for record in records:
             trans_id, customer, service, notes, date, amount, status = record
             tag = 'paid' if status == 'Πληρώθηκε' else 'unpaid'
             formatted_date = format_date(date)
-            self.tree.insert("", "end", values=(trans_id, customer, service, notes, formatted_date, f"{amount:.2f} €", status), tags=(tag,))
+            item = self.tree.insert("", "end", values=(trans_id, customer, service, notes, formatted_date, f"{amount:.2f} €", status), tags=(tag,))
+            if trans_id in selected_ids:
+                reselect.append(item)
+
+        if reselect:
+            self.tree.selection_set(reselect)
+        self.tree.yview_moveto(scroll_position)
 
     def on_tree_double_click(self, event):
         """Handle double-click on transaction"""
@@ -1871,7 +2658,9 @@ class App(ctk.CTk):
 
         self.service_menu.configure(values=service_names)
 
-        if service_names[0] != "-":
+        if self.service_var.get() in service_names:
+            pass  # keep the user's choice
+        elif service_names[0] != "-":
             self.service_var.set(service_names[0])
         else:
             self.service_var.set("Προσθέστε υπηρεσίες")
@@ -1881,7 +2670,7 @@ class App(ctk.CTk):
     def create_import_tab(self):
         """Create the batch import tab"""
         self.import_tab.grid_columnconfigure(0, weight=1)
-        self.import_tab.grid_rowconfigure(2, weight=1)
+        self.import_tab.grid_rowconfigure(3, weight=1)
 
         # Info Frame
         info_frame = ctk.CTkFrame(self.import_tab)
@@ -1928,165 +2717,470 @@ class App(ctk.CTk):
         )
         import_btn.pack(fill="x", padx=20, pady=(0, 15))
 
+        customers_label = ctk.CTkLabel(
+            info_frame,
+            text="Στοιχεία Πελατών (email, τηλέφωνο, ΑΦΜ, διεύθυνση, εργασία)",
+            font=ctk.CTkFont(size=14, weight="bold")
+        )
+        customers_label.pack(pady=(10, 5), padx=20, anchor="w")
+
+        customers_btn_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
+        customers_btn_frame.pack(fill="x", padx=20, pady=(0, 15))
+
+        customer_template_btn = ctk.CTkButton(
+            customers_btn_frame,
+            text="⬇️ Πρότυπο Πελατών",
+            command=self.download_customer_template,
+            height=40,
+            font=ctk.CTkFont(size=14)
+        )
+        customer_template_btn.pack(side="left", fill="x", expand=True, padx=(0, 5))
+
+        customer_import_btn = ctk.CTkButton(
+            customers_btn_frame,
+            text="👥 Εισαγωγή Πελατών",
+            command=self.import_customers_from_excel,
+            height=40,
+            font=ctk.CTkFont(size=14),
+            fg_color="#059669",
+            hover_color="#047857"
+        )
+        customer_import_btn.pack(side="right", fill="x", expand=True, padx=(5, 0))
+
+        attachments_import_label = ctk.CTkLabel(
+            info_frame,
+            text="Συνημμένα από φάκελο (όνομα αρχείου \"<ID συναλλαγής>_...\" ή manifest CSV)",
+            font=ctk.CTkFont(size=14, weight="bold")
+        )
+        attachments_import_label.pack(pady=(10, 5), padx=20, anchor="w")
+
+        attachments_import_btn = ctk.CTkButton(
+            info_frame,
+            text="📎 Εισαγωγή Συνημμένων από Φάκελο",
+            command=self.import_attachments_from_folder,
+            height=40,
+            font=ctk.CTkFont(size=14)
+        )
+        attachments_import_btn.pack(fill="x", padx=20, pady=(0, 15))
+
+        # Incomplete Jobs Frame
+        jobs_frame = ctk.CTkFrame(self.import_tab)
+        jobs_frame.grid(row=1, column=0, padx=20, pady=(0, 10), sticky="ew")
+
+        jobs_title = ctk.CTkLabel(
+            jobs_frame,
+            text="⏸️ Ημιτελείς Εισαγωγές",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        jobs_title.pack(pady=(15, 5), padx=20, anchor="w")
+
+        self.import_jobs_list_frame = ctk.CTkScrollableFrame(jobs_frame, height=80)
+        self.import_jobs_list_frame.pack(fill="x", padx=20, pady=(0, 15))
+        self.refresh_import_jobs()
+
         # Log Frame
         log_title_frame = ctk.CTkFrame(self.import_tab)
-        log_title_frame.grid(row=1, column=0, padx=20, pady=(0, 10), sticky="ew")
+        log_title_frame.grid(row=2, column=0, padx=20, pady=(0, 10), sticky="ew")
 
         log_title = ctk.CTkLabel(
             log_title_frame,
             text="📋 Αποτελέσματα Εισαγωγής",
             font=ctk.CTkFont(size=18, weight="bold")
         )
-        log_title.pack(pady=15, padx=20, anchor="w")
+        log_title.pack(side="left", pady=15, padx=20)
+
+        open_log_btn = ctk.CTkButton(
+            log_title_frame,
+            text="📂 Πλήρες Log",
+            command=self.open_import_log,
+            height=32,
+            width=120
+        )
+        open_log_btn.pack(side="right", pady=15, padx=(5, 20))
+
+        filter_log_btn = ctk.CTkButton(
+            log_title_frame,
+            text="🔍 Φίλτρο",
+            command=self.filter_import_log,
+            height=32,
+            width=100
+        )
+        filter_log_btn.pack(side="right", pady=15, padx=5)
+
+        self.import_log_errors_only_var = ctk.IntVar(value=0)
+        errors_only_check = ctk.CTkCheckBox(
+            log_title_frame,
+            text="Μόνο σφάλματα",
+            variable=self.import_log_errors_only_var
+        )
+        errors_only_check.pack(side="right", pady=15, padx=5)
+
+        self.import_log_filter_entry = ctk.CTkEntry(log_title_frame, height=32, width=200, placeholder_text="Αναζήτηση στο log...")
+        self.import_log_filter_entry.pack(side="right", pady=15, padx=5)
+        self.import_log_filter_entry.bind("<Return>", lambda e: self.filter_import_log())
+
+        self.current_import_log_path = None
 
         # Log Textbox
         self.import_log_textbox = ctk.CTkTextbox(self.import_tab, wrap="word")
-        self.import_log_textbox.grid(row=2, column=0, padx=20, pady=(0, 20), sticky="nsew")
+        self.import_log_textbox.grid(row=3, column=0, padx=20, pady=(0, 20), sticky="nsew")
         self.import_log_textbox.insert("end", "Εδώ θα εμφανιστούν τα αποτελέσματα της διαδικασίας εισαγωγής...")
         self.import_log_textbox.configure(state="disabled")
 
     def download_template(self):
         """Download Excel template for batch import"""
+        self.save_import_template("Προτυπο_Εισαγωγης.xlsx", importer.TRANSACTION_TEMPLATE_HEADERS)
+
+    def download_customer_template(self):
+        """Download Excel template for customer master-data import"""
+        self.save_import_template("Προτυπο_Πελατων.xlsx", importer.CUSTOMER_TEMPLATE_HEADERS)
+
+    def save_import_template(self, initial_file, headers):
+        """Ask for a location and save an import template"""
         filepath = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
             filetypes=[("Excel files", "*.xlsx")],
-            initialfile="Προτυπο_Εισαγωγης.xlsx",
+            initialfile=initial_file,
             title="Αποθήκευση Προτύπου"
         )
         if not filepath:
             return
 
         try:
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Data"
-
-            headers = [
-                'Ονοματεπώνυμο Πελάτη', 'Υπηρεσία', 'Ημερομηνία (YYYY-MM-DD)',
-                'Τελικό Κόστος (με ΦΠΑ)', 'Κατάσταση', 'Σχόλια'
-            ]
-            ws.append(headers)
-
-            # Autofit columns
-            for col_idx, header in enumerate(headers, 1):
-                column_letter = get_column_letter(col_idx)
-                ws.column_dimensions[column_letter].width = len(header) + 5
-
-            wb.save(filepath)
+            importer.write_template(filepath, headers)
             messagebox.showinfo("Επιτυχία", f"Το πρότυπο αποθηκεύτηκε επιτυχώς:\n{filepath}")
 
         except Exception as e:
             messagebox.showerror("Σφάλμα", f"Απέτυχε η δημιουργία του προτύπου:\n{e}")
 
+    def import_customers_from_excel(self):
+        """Import or update customer details from Excel file"""
+        filepath = filedialog.askopenfilename(
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Επιλογή Αρχείου Excel"
+        )
+        if not filepath:
+            return
+
+        if not messagebox.askyesno("Επιβεβαίωση",
+                                   "Οι υπάρχοντες πελάτες θα ενημερωθούν με τα στοιχεία του αρχείου "
+                                   "(τα κενά κελιά δεν αλλάζουν τα αποθηκευμένα στοιχεία).\n\nΣυνέχεια;"):
+            return
+
+        self.current_import_log_path = importer.import_log_path(
+            f"customers_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+        with importer.ImportLog(self.current_import_log_path) as log:
+            log.note(f"--- {datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | {filepath} | πελάτες ---")
+            try:
+                created, updated, unchanged, failed = importer.run_customer_import(filepath, on_row=log.write)
+
+                summary = f"""
+╔══════════════════════════════════════════╗
+║      ΕΙΣΑΓΩΓΗ ΠΕΛΑΤΩΝ                    ║
+╠══════════════════════════════════════════╣
+║  ➕ Νέοι:            {created:5d}               ║
+║  ✏️ Ενημερώσεις:     {updated:5d}               ║
+║  ➖ Χωρίς αλλαγές:   {unchanged:5d}               ║
+║  ❌ Αποτυχίες:       {failed:5d}               ║
+╚══════════════════════════════════════════╝
+"""
+                log.note(f"Νέοι: {created}, Ενημερώσεις: {updated}, Χωρίς αλλαγές: {unchanged}, Αποτυχίες: {failed}")
+                self.show_import_log(summary, log)
+
+                messagebox.showinfo("Ολοκλήρωση",
+                                  f"Η εισαγωγή πελατών ολοκληρώθηκε!\n\n➕ Νέοι: {created}\n✏️ Ενημερώσεις: {updated}\n"
+                                  f"➖ Χωρίς αλλαγές: {unchanged}\n❌ Αποτυχίες: {failed}")
+
+            except Exception as e:
+                log.note(f"ΚΡΙΣΙΜΟ ΣΦΑΛΜΑ: {str(e)}")
+                self.show_import_log(f"❌ ΚΡΙΣΙΜΟ ΣΦΑΛΜΑ:\n{str(e)}\n\nΚαμία αλλαγή δεν αποθηκεύτηκε.\n", log)
+
     def import_from_excel(self):
         """Import transactions from Excel file"""
         filepath = filedialog.askopenfilename(
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")],
             title="Επιλογή Αρχείου Excel"
         )
         if not filepath:
             return
 
+        try:
+            file_hash = importer.hash_file(filepath)
+        except Exception as e:
+            messagebox.showerror("Σφάλμα", f"Αδυναμία ανάγνωσης του αρχείου:\n{e}")
+            return
+
+        # Offer to resume an unfinished import of the same file
+        job = db.get_incomplete_import_job_by_hash(file_hash)
+        if job and messagebox.askyesno(
+                "Ημιτελής Εισαγωγή",
+                f"Βρέθηκε ημιτελής εισαγωγή αυτού του αρχείου (έως τη γραμμή {job[4]}).\n\n"
+                "Θέλετε να συνεχίσετε από το τελευταίο σημείο;"):
+            self.run_import_job(job[0], filepath, job[4] + 1)
+            return
+
         if not messagebox.askyesno("Επιβεβαίωση",
                                    "Είστε σίγουροι ότι θέλετε να ξεκινήσετε την εισαγωγή δεδομένων;"):
             return
 
+        job_id = db.create_import_job(filepath, file_hash)
+        self.run_import_job(job_id, filepath, 2)
+
+    def import_attachments_from_folder(self):
+        """Attach all files of a folder to their transactions in one batch"""
+        folder = filedialog.askdirectory(title="Επιλογή Φακέλου Αρχείων")
+        if not folder:
+            return
+
+        use_manifest = messagebox.askyesnocancel(
+            "Αντιστοίχιση Αρχείων",
+            "Θέλετε να χρησιμοποιήσετε manifest CSV (στήλες transaction_id, file);\n\n"
+            "Όχι: αντιστοίχιση από το όνομα αρχείου (π.χ. \"125_τιμολόγιο.pdf\" → συναλλαγή #125)."
+        )
+        if use_manifest is None:
+            return
+
+        try:
+            if use_manifest:
+                manifest_path = filedialog.askopenfilename(
+                    initialdir=folder,
+                    filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+                    title="Επιλογή Manifest CSV"
+                )
+                if not manifest_path:
+                    return
+                mapping, skipped = importer.map_folder_by_manifest(manifest_path)
+            else:
+                mapping, skipped = importer.map_folder_by_name(folder)
+        except Exception as e:
+            messagebox.showerror("Σφάλμα", f"Αδυναμία ανάγνωσης:\n{e}")
+            return
+
+        if not mapping:
+            messagebox.showwarning("Προσοχή", "Δεν βρέθηκαν αρχεία για αντιστοίχιση.")
+            return
+
+        if not messagebox.askyesno("Επιβεβαίωση",
+                                   f"Θα προστεθούν {len(mapping)} αρχεία ({len(skipped)} χωρίς αντιστοίχιση).\n\nΣυνέχεια;"):
+            return
+
+        self.current_import_log_path = importer.import_log_path(
+            f"attachments_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+        with importer.ImportLog(self.current_import_log_path) as log:
+            log.note(f"--- {datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | {folder} | συνημμένα ---")
+            for item in skipped:
+                log.write_item(item, False, "Χωρίς αντιστοίχιση")
+
+            def on_file(path, ok, message):
+                log.write_item(os.path.basename(path), ok, message)
+                self.update_idletasks()
+
+            try:
+                copied, failed, total_bytes, elapsed = importer.ingest_attachments(mapping, on_file=on_file)
+
+                megabytes = total_bytes / (1024 * 1024)
+                elapsed = max(elapsed, 0.001)
+                summary = f"""
+╔══════════════════════════════════════════╗
+║      ΕΙΣΑΓΩΓΗ ΣΥΝΗΜΜΕΝΩΝ                 ║
+╠══════════════════════════════════════════╣
+║  ✅ Αρχεία:      {copied:6d}                   ║
+║  ❌ Αποτυχίες:   {failed:6d}                   ║
+║  ➖ Χωρίς αντιστ.: {len(skipped):5d}                  ║
+╚══════════════════════════════════════════╝
+
+{megabytes:.1f} MB σε {elapsed:.1f} δευτ. — {copied / elapsed:.1f} αρχεία/δευτ., {megabytes / elapsed:.2f} MB/δευτ.
+"""
+                log.note(f"Αρχεία: {copied}, Αποτυχίες: {failed}, {megabytes:.1f} MB σε {elapsed:.1f}s")
+                self.show_import_log(summary, log)
+
+                messagebox.showinfo("Ολοκλήρωση",
+                                  f"Προστέθηκαν {copied} αρχεία.\n❌ Αποτυχίες: {failed}\n\n"
+                                  f"{copied / elapsed:.1f} αρχεία/δευτ., {megabytes / elapsed:.2f} MB/δευτ.")
+
+            except Exception as e:
+                log.note(f"ΚΡΙΣΙΜΟ ΣΦΑΛΜΑ: {str(e)}")
+                self.show_import_log(f"❌ ΚΡΙΣΙΜΟ ΣΦΑΛΜΑ:\n{str(e)}\n\nΚαμία εγγραφή δεν αποθηκεύτηκε.\n", log)
+
+    def resume_import_job(self, job_id):
+        """Resume an unfinished import job from its last checkpoint"""
+        job = db.get_import_job(job_id)
+        if not job:
+            return
+        _id, file_name, filepath, file_hash, last_row, _s, _f, _status, _started, _updated = job
+
+        # The original file may have moved; ask for it and make sure it is the same file
+        if not os.path.exists(filepath):
+            messagebox.showwarning("Προσοχή", f"Το αρχείο δεν βρέθηκε:\n{filepath}\n\nΕπιλέξτε το ξανά.")
+            filepath = filedialog.askopenfilename(
+                filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"), ("All files", "*.*")],
+                initialfile=file_name,
+                title="Επιλογή Αρχείου Excel"
+            )
+            if not filepath:
+                return
+
+        try:
+            if importer.hash_file(filepath) != file_hash:
+                messagebox.showerror("Σφάλμα", "Το αρχείο έχει αλλάξει από την αρχική εισαγωγή.\nΗ συνέχιση δεν είναι δυνατή.")
+                return
+        except Exception as e:
+            messagebox.showerror("Σφάλμα", f"Αδυναμία ανάγνωσης του αρχείου:\n{e}")
+            return
+
+        self.run_import_job(job_id, filepath, last_row + 1)
+
+    def abandon_import_job(self, job_id):
+        """Remove an unfinished import job from the list"""
+        if messagebox.askyesno("Επιβεβαίωση",
+                               "Η εισαγωγή θα σταματήσει οριστικά. Οι γραμμές που έχουν ήδη εισαχθεί παραμένουν.\n\nΣυνέχεια;"):
+            db.set_import_job_status(job_id, "abandoned")
+            self.refresh_import_jobs()
+
+    def refresh_import_jobs(self):
+        """Refresh the list of unfinished import jobs"""
+        for widget in self.import_jobs_list_frame.winfo_children():
+            widget.destroy()
+
+        jobs = db.get_incomplete_import_jobs()
+        if not jobs:
+            placeholder = ctk.CTkLabel(
+                self.import_jobs_list_frame,
+                text="Δεν υπάρχουν ημιτελείς εισαγωγές",
+                text_color="gray"
+            )
+            placeholder.pack(pady=5)
+            return
+
+        for job in jobs:
+            job_id, file_name, _path, _hash, last_row, success, fail, _status, _started, updated_at = job
+
+            job_frame = ctk.CTkFrame(self.import_jobs_list_frame, fg_color="transparent")
+            job_frame.pack(fill="x", pady=2)
+
+            job_label = ctk.CTkLabel(
+                job_frame,
+                text=f"📄 {file_name} - έως γραμμή {last_row} (✅ {success} / ❌ {fail}) - {updated_at}",
+                anchor="w"
+            )
+            job_label.pack(side="left", fill="x", expand=True)
+
+            abandon_btn = ctk.CTkButton(
+                job_frame,
+                text="✖",
+                width=30,
+                height=25,
+                command=lambda jid=job_id: self.abandon_import_job(jid),
+                fg_color="#8B0000"
+            )
+            abandon_btn.pack(side="right")
+
+            resume_btn = ctk.CTkButton(
+                job_frame,
+                text="▶️ Συνέχεια",
+                width=100,
+                height=25,
+                command=lambda jid=job_id: self.resume_import_job(jid)
+            )
+            resume_btn.pack(side="right", padx=(5, 5))
+
+    def run_import_job(self, job_id, filepath, start_row):
+        """Run (or resume) an import job and show the results"""
         self.import_log_textbox.configure(state="normal")
         self.import_log_textbox.delete("1.0", "end")
+        self.import_log_textbox.configure(state="disabled")
 
-        log = []
-        success_count = 0
-        fail_count = 0
+        self.current_import_log_path = importer.import_log_path(job_id)
 
-        try:
-            wb = load_workbook(filepath, data_only=True)
-            ws = wb.active
+        with importer.ImportLog(self.current_import_log_path) as log:
+            log.note(f"--- {datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | {filepath} | από γραμμή {start_row} ---")
 
-            # Create service lookup dictionary
-            available_services = {name.lower(): sid for sid, name in db.get_services()}
+            def on_chunk(last_row):
+                # Keep the on-disk log in step with the checkpoint and the window responsive
+                log.flush()
+                self.update_idletasks()
 
-            # Process rows
-            for row_idx, row in enumerate(ws.iter_rows(min_row=2), start=2):
-                try:
-                    customer_name = str(row[0].value).strip() if row[0].value else None
-                    service_name = str(row[1].value).strip() if row[1].value else None
-                    date_val = row[2].value
-                    final_cost = row[3].value
-                    status = str(row[4].value).strip() if row[4].value else None
-                    notes = str(row[5].value).strip() if row[5].value else ""
-
-                    # Validation
-                    if not all([customer_name, service_name, date_val, final_cost, status]):
-                        raise ValueError("Λείπουν υποχρεωτικά δεδομένα")
-
-                    # Validate service
-                    service_id = available_services.get(service_name.lower())
-                    if not service_id:
-                        raise ValueError(f"Η υπηρεσία '{service_name}' δεν υπάρχει")
-
-                    # Validate date
-                    if isinstance(date_val, datetime.datetime):
-                        transaction_date = date_val.strftime('%Y-%m-%d')
-                    else:
-                        transaction_date = str(date_val)
-                        datetime.datetime.strptime(transaction_date, '%Y-%m-%d')
-
-                    # Validate cost
-                    cost_final_float = float(final_cost)
-                    cost_pre_vat_float = cost_final_float / 1.24
-
-                    # Validate status
-                    valid_statuses = ["Εκκρεμεί", "Πληρώθηκε"]
-                    if status not in valid_statuses:
-                        raise ValueError(f"Κατάσταση '{status}' μη έγκυρη")
-
-                    # Get or create customer
-                    customer_id = db.get_customer_by_name(customer_name)
-                    if not customer_id:
-                        db.add_customer(customer_name)
-                        customer_id = db.get_customer_by_name(customer_name)
-
-                    # Add transaction
-                    db.add_transaction(
-                        customer_id, service_id, notes, transaction_date,
-                        cost_pre_vat_float, cost_final_float, status
-                    )
-
-                    success_count += 1
-                    log.append(f"✅ ΓΡΑΜΜΗ {row_idx}: Επιτυχία - {customer_name}")
-
-                except Exception as e:
-                    fail_count += 1
-                    log.append(f"❌ ΓΡΑΜΜΗ {row_idx}: Σφάλμα - {str(e)}")
-
-            # Summary
-            summary = f"""
+            try:
+                importer.run_transaction_import(filepath, job_id, start_row, on_row=log.write, on_chunk=on_chunk)
+
+                # Totals include rows committed by earlier (interrupted) runs of the same job
+                job = db.get_import_job(job_id)
+                success_count, fail_count = job[5], job[6]
+
+                # Summary
+                summary = f"""
 ╔══════════════════════════════════════════╗
 ║      ΑΠΟΤΕΛΕΣΜΑΤΑ ΕΙΣΑΓΩΓΗΣ             ║
 ╠══════════════════════════════════════════╣
 ║  ✅ Επιτυχίες:  {success_count:4d}                     ║
 ║  ❌ Αποτυχίες:  {fail_count:4d}                     ║
 ╚══════════════════════════════════════════╝
-
-ΛΕΠΤΟΜΕΡΕΙΕΣ:
-{"=" * 50}
 """
-            self.import_log_textbox.insert("1.0", summary + "\n".join(log))
+                log.note(f"Επιτυχίες: {success_count}, Αποτυχίες: {fail_count}")
+                self.show_import_log(summary, log)
+
+                # Log the import
+                db.add_audit_log(
+                    "IMPORT", "transactions", 0,
+                    f"Μαζική εισαγωγή: {success_count} επιτυχίες, {fail_count} αποτυχίες",
+                    "", ""
+                )
 
-            # Log the import
-            db.add_audit_log(
-                "IMPORT", "transactions", 0,
-                f"Μαζική εισαγωγή: {success_count} επιτυχίες, {fail_count} αποτυχίες",
-                "", ""
-            )
+                self.refresh_main_table()
+                messagebox.showinfo("Ολοκλήρωση",
+                                  f"Η εισαγωγή ολοκληρώθηκε!\n\n✅ Επιτυχίες: {success_count}\n❌ Αποτυχίες: {fail_count}")
 
-            self.refresh_main_table()
-            messagebox.showinfo("Ολοκλήρωση",
-                              f"Η εισαγωγή ολοκληρώθηκε!\n\n✅ Επιτυχίες: {success_count}\n❌ Αποτυχίες: {fail_count}")
+            except Exception as e:
+                log.note(f"ΚΡΙΣΙΜΟ ΣΦΑΛΜΑ: {str(e)}")
+                self.show_import_log(f"❌ ΚΡΙΣΙΜΟ ΣΦΑΛΜΑ:\n{str(e)}\n\n"
+                                     "Η εισαγωγή μπορεί να συνεχιστεί από το τελευταίο σημείο αποθήκευσης.\n", log)
 
-        except Exception as e:
-            self.import_log_textbox.insert("1.0", f"❌ ΚΡΙΣΙΜΟ ΣΦΑΛΜΑ:\n{str(e)}")
+        self.refresh_import_jobs()
+
+    def show_import_log(self, header, log):
+        """Show the summary, the collected errors and the last lines of an import log"""
+        text = header
+        text += f"\nΣΦΑΛΜΑΤΑ ({log.error_count}):\n{'=' * 50}\n"
+        text += "\n".join(log.errors) if log.errors else "Κανένα σφάλμα"
+        if log.error_count > len(log.errors):
+            text += f"\n... και άλλα {log.error_count - len(log.errors)} στο πλήρες log"
+        text += f"\n\nΤΕΛΕΥΤΑΙΕΣ ΓΡΑΜΜΕΣ:\n{'=' * 50}\n" + "\n".join(log.tail)
+        text += f"\n\nΠλήρες log: {log.path}"
 
+        self.import_log_textbox.configure(state="normal")
+        self.import_log_textbox.delete("1.0", "end")
+        self.import_log_textbox.insert("1.0", text)
+        self.import_log_textbox.configure(state="disabled")
+
+    def open_import_log(self):
+        """Open the full log of the last import in the default program"""
+        if self.current_import_log_path and os.path.exists(self.current_import_log_path):
+            os.startfile(self.current_import_log_path)  # Windows
+        else:
+            messagebox.showwarning("Προσοχή", "Δεν υπάρχει αρχείο log εισαγωγής.")
+
+    def filter_import_log(self):
+        """Show the lines of the full import log that match the filter"""
+        if not self.current_import_log_path or not os.path.exists(self.current_import_log_path):
+            messagebox.showwarning("Προσοχή", "Δεν υπάρχει αρχείο log εισαγωγής.")
+            return
+
+        lines, total = importer.filter_log(
+            self.current_import_log_path,
+            self.import_log_filter_entry.get(),
+            errors_only=bool(self.import_log_errors_only_var.get())
+        )
+
+        text = f"Βρέθηκαν {total} γραμμές"
+        if total > len(lines):
+            text += f" (εμφανίζονται οι πρώτες {len(lines)})"
+        text += f":\n{'=' * 50}\n" + "\n".join(lines)
+
+        self.import_log_textbox.configure(state="normal")
+        self.import_log_textbox.delete("1.0", "end")
+        self.import_log_textbox.insert("1.0", text)
         self.import_log_textbox.configure(state="disabled")
 
     # ========== LOG TAB ==========
@@ -2194,6 +3288,498 @@ class App(ctk.CTk):
             tag = action.lower()
             self.log_tree.insert("", "end", values=(log_id, action, table, description, timestamp), tags=(tag,))
 
+    # ========== STORAGE TAB ==========
+
+    def create_storage_tab(self):
+        """Create the attachment storage tab (move old files into the dated folders)"""
+        self.storage_tab.grid_columnconfigure(0, weight=1)
+        self.storage_tab.grid_rowconfigure(2, weight=1)
+        self.storage_migrator = None
+        self.storage_checker = None
+        self.storage_verifier = None
+        self.storage_report_path = None
+
+        info_frame = ctk.CTkFrame(self.storage_tab)
+        info_frame.grid(row=0, column=0, padx=20, pady=20, sticky="ew")
+
+        title_label = ctk.CTkLabel(
+            info_frame,
+            text="🗄️ Οργάνωση Αρχείων",
+            font=ctk.CTkFont(size=22, weight="bold")
+        )
+        title_label.pack(pady=(15, 10), padx=20, anchor="w")
+
+        description_label = ctk.CTkLabel(
+            info_frame,
+            text="Τα συνημμένα και οι αποδείξεις παλαιότερων εκδόσεων βρίσκονται όλα σε έναν φάκελο.\n"
+                 "Η μεταφορά τα οργανώνει σε υποφακέλους ανά έτος και μήνα. Μπορεί να διακοπεί\n"
+                 "και να συνεχιστεί αργότερα από το σημείο που σταμάτησε.",
+            justify="left"
+        )
+        description_label.pack(pady=(0, 10), padx=20, anchor="w")
+
+        self.storage_status_label = ctk.CTkLabel(info_frame, text="", font=ctk.CTkFont(size=14, weight="bold"))
+        self.storage_status_label.pack(pady=(0, 10), padx=20, anchor="w")
+
+        self.storage_progress = ctk.CTkProgressBar(info_frame)
+        self.storage_progress.pack(fill="x", padx=20, pady=(0, 10))
+        self.storage_progress.set(0)
+
+        buttons_frame = ctk.CTkFrame(info_frame, fg_color="transparent")
+        buttons_frame.pack(fill="x", padx=20, pady=(0, 15))
+
+        self.storage_start_btn = ctk.CTkButton(
+            buttons_frame,
+            text="▶️ Έναρξη Μεταφοράς",
+            command=self.start_storage_migration,
+            height=40,
+            font=ctk.CTkFont(size=14),
+            fg_color="#059669",
+            hover_color="#047857"
+        )
+        self.storage_start_btn.pack(side="left", fill="x", expand=True, padx=(0, 5))
+
+        self.storage_stop_btn = ctk.CTkButton(
+            buttons_frame,
+            text="⏸️ Διακοπή",
+            command=self.stop_storage_migration,
+            height=40,
+            font=ctk.CTkFont(size=14),
+            state="disabled"
+        )
+        self.storage_stop_btn.pack(side="right", fill="x", expand=True, padx=(5, 0))
+
+        # Reconciliation with the database and orphan clean-up
+        check_frame = ctk.CTkFrame(self.storage_tab)
+        check_frame.grid(row=1, column=0, padx=20, pady=(0, 10), sticky="ew")
+
+        check_title = ctk.CTkLabel(
+            check_frame,
+            text="🔍 Έλεγχος & Καθαρισμός Αρχείων",
+            font=ctk.CTkFont(size=16, weight="bold")
+        )
+        check_title.pack(pady=(15, 5), padx=20, anchor="w")
+
+        check_description = ctk.CTkLabel(
+            check_frame,
+            text="Βρίσκει εγγραφές χωρίς αρχείο και αρχεία χωρίς εγγραφή (π.χ. από διαγραμμένες συναλλαγές).\n"
+                 f"Ορφανά αρχεία νεότερα από {storage_check.ORPHAN_MIN_AGE // 3600} ώρες δεν διαγράφονται ποτέ.",
+            justify="left"
+        )
+        check_description.pack(pady=(0, 10), padx=20, anchor="w")
+
+        check_buttons_frame = ctk.CTkFrame(check_frame, fg_color="transparent")
+        check_buttons_frame.pack(fill="x", padx=20, pady=(0, 15))
+
+        self.storage_dry_run_var = ctk.IntVar(value=1)
+        dry_run_check = ctk.CTkCheckBox(
+            check_buttons_frame,
+            text="Δοκιμαστικά (μόνο αναφορά, χωρίς διαγραφή)",
+            variable=self.storage_dry_run_var
+        )
+        dry_run_check.pack(side="left", padx=(0, 10))
+
+        self.storage_report_btn = ctk.CTkButton(
+            check_buttons_frame,
+            text="📂 Αναφορά",
+            command=self.open_storage_report,
+            height=40,
+            width=120,
+            state="disabled"
+        )
+        self.storage_report_btn.pack(side="right", padx=(5, 0))
+
+        self.storage_check_stop_btn = ctk.CTkButton(
+            check_buttons_frame,
+            text="⏸️ Διακοπή",
+            command=self.stop_storage_check,
+            height=40,
+            width=120,
+            state="disabled"
+        )
+        self.storage_check_stop_btn.pack(side="right", padx=(5, 0))
+
+        self.storage_check_btn = ctk.CTkButton(
+            check_buttons_frame,
+            text="🔍 Έλεγχος",
+            command=self.start_storage_check,
+            height=40,
+            width=140,
+            font=ctk.CTkFont(size=14)
+        )
+        self.storage_check_btn.pack(side="right", padx=(5, 0))
+
+        verify_buttons_frame = ctk.CTkFrame(check_frame, fg_color="transparent")
+        verify_buttons_frame.pack(fill="x", padx=20, pady=(0, 15))
+
+        self.storage_deep_verify_var = ctk.IntVar(value=0)
+        deep_verify_check = ctk.CTkCheckBox(
+            verify_buttons_frame,
+            text="Πλήρης επαλήθευση (ανάγνωση όλων των αρχείων)",
+            variable=self.storage_deep_verify_var
+        )
+        deep_verify_check.pack(side="left", padx=(0, 10))
+
+        self.storage_verify_stop_btn = ctk.CTkButton(
+            verify_buttons_frame,
+            text="⏸️ Διακοπή",
+            command=self.stop_storage_verify,
+            height=40,
+            width=120,
+            state="disabled"
+        )
+        self.storage_verify_stop_btn.pack(side="right", padx=(5, 0))
+
+        self.storage_verify_btn = ctk.CTkButton(
+            verify_buttons_frame,
+            text="✔️ Επαλήθευση",
+            command=self.start_storage_verify,
+            height=40,
+            width=140,
+            font=ctk.CTkFont(size=14)
+        )
+        self.storage_verify_btn.pack(side="right", padx=(5, 0))
+
+        self.storage_log_textbox = ctk.CTkTextbox(self.storage_tab, wrap="word")
+        self.storage_log_textbox.grid(row=2, column=0, padx=20, pady=(0, 20), sticky="nsew")
+        self.storage_log_textbox.configure(state="disabled")
+
+        self.refresh_storage_status()
+
+    def refresh_storage_status(self):
+        """Show how many files are still in the flat folder"""
+        try:
+            remaining = {table: db.count_flat_files(table) for table in db.FILE_TABLES}
+        except Exception as e:
+            self.storage_status_label.configure(text=f"Δεν ήταν δυνατή η ανάγνωση: {e}")
+            return
+        self.storage_remaining = sum(remaining.values())
+        if self.storage_remaining:
+            self.storage_status_label.configure(
+                text=f"Προς μεταφορά: {remaining['attachments']} συνημμένα, {remaining['issued_receipts']} αποδείξεις")
+        else:
+            self.storage_status_label.configure(text="✅ Όλα τα αρχεία είναι οργανωμένα")
+        if self.storage_busy() is None:
+            self.storage_start_btn.configure(state="normal" if self.storage_remaining else "disabled")
+            resumable = any((db.get_storage_migration(table) or (0, 0, 0, None))[3] == 'incomplete'
+                            for table in db.FILE_TABLES)
+            self.storage_start_btn.configure(text="▶️ Συνέχεια Μεταφοράς" if resumable else "▶️ Έναρξη Μεταφοράς")
+
+    def storage_busy(self):
+        """Message naming the storage job that is running, or None"""
+        if self.storage_migrator is not None:
+            return "Περιμένετε να ολοκληρωθεί η μεταφορά αρχείων."
+        if self.storage_checker is not None:
+            return "Περιμένετε να ολοκληρωθεί ο έλεγχος αρχείων."
+        if self.storage_verifier is not None:
+            return "Περιμένετε να ολοκληρωθεί η επαλήθευση αρχείων."
+        return None
+
+    def storage_log(self, message):
+        self.storage_log_textbox.configure(state="normal")
+        self.storage_log_textbox.insert("end", message + "\n")
+        self.storage_log_textbox.see("end")
+        self.storage_log_textbox.configure(state="disabled")
+
+    def start_storage_migration(self):
+        """Start (or continue) moving files into the dated folders"""
+        if self.storage_busy():
+            messagebox.showwarning("Προσοχή", self.storage_busy())
+            return
+        self.storage_totals = {}
+        self.storage_progress.set(0)
+        self.storage_start_btn.configure(state="disabled")
+        self.storage_stop_btn.configure(state="normal")
+        self.storage_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] Έναρξη μεταφοράς")
+        self.storage_migrator = attachment_store.ShardMigrator().start()
+        self.after(STORAGE_MIGRATION_POLL_MS, self.poll_storage_migration)
+
+    def stop_storage_migration(self):
+        if self.storage_migrator is not None:
+            self.storage_migrator.stop()
+            self.storage_stop_btn.configure(state="disabled")
+            self.storage_log("Διακοπή μετά την τρέχουσα ομάδα αρχείων...")
+
+    def poll_storage_migration(self):
+        """Apply the migrator's events to the progress bar and log"""
+        if not self.winfo_exists() or self.storage_migrator is None:
+            return
+        labels = {"attachments": "Συνημμένα", "issued_receipts": "Αποδείξεις"}
+        while True:
+            try:
+                event = self.storage_migrator.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == "table":
+                _, table, remaining, already_done = event
+                self.storage_totals = {"remaining": remaining, "start": already_done}
+                self.storage_progress.set(0)
+                self.storage_log(f"{labels[table]}: {remaining} αρχεία προς μεταφορά")
+            elif kind == "progress":
+                _, table, moved, failed = event
+                totals = self.storage_totals
+                # moved/failed include earlier runs; remaining was counted at the start of this one
+                if totals.get("remaining"):
+                    done = moved + failed - totals["start"]
+                    self.storage_progress.set(min(1.0, done / totals["remaining"]))
+                self.storage_status_label.configure(
+                    text=f"{labels[table]}: μεταφέρθηκαν {moved}, αποτυχίες {failed}")
+            elif kind == "error":
+                _, table, row_id, message = event
+                prefix = f"{labels[table]} #{row_id}: " if table else ""
+                self.storage_log(f"❌ {prefix}{message}")
+            elif kind == "finished":
+                stopped = event[1]
+                self.storage_migrator = None
+                self.storage_stop_btn.configure(state="disabled")
+                self.storage_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] " +
+                                 ("Η μεταφορά διακόπηκε· μπορεί να συνεχιστεί αργότερα." if stopped else "Η μεταφορά ολοκληρώθηκε."))
+                self.refresh_storage_status()
+                if not stopped:
+                    self.storage_progress.set(1)
+                return
+        self.after(STORAGE_MIGRATION_POLL_MS, self.poll_storage_migration)
+
+    def start_storage_check(self):
+        """Reconcile the files on the share with the database, optionally deleting orphans"""
+        if self.storage_busy():
+            messagebox.showwarning("Προσοχή", self.storage_busy())
+            return
+        dry_run = bool(self.storage_dry_run_var.get())
+        if not dry_run and not messagebox.askyesno(
+                "Επιβεβαίωση Διαγραφής",
+                "Τα αρχεία που δεν αντιστοιχούν σε καμία εγγραφή θα διαγραφούν οριστικά από τον κοινόχρηστο φάκελο.\n\n"
+                "Συνιστάται να εκτελέσετε πρώτα δοκιμαστικό έλεγχο. Συνέχεια;"):
+            return
+        self.storage_check_btn.configure(state="disabled")
+        self.storage_start_btn.configure(state="disabled")
+        self.storage_check_stop_btn.configure(state="normal")
+        self.storage_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] Έναρξη ελέγχου"
+                         + (" (δοκιμαστικά)" if dry_run else " με διαγραφή ορφανών αρχείων"))
+        self.storage_checker = storage_check.Reconciler(dry_run=dry_run).start()
+        self.after(STORAGE_MIGRATION_POLL_MS, self.poll_storage_check)
+
+    def stop_storage_check(self):
+        if self.storage_checker is not None:
+            self.storage_checker.stop()
+            self.storage_check_stop_btn.configure(state="disabled")
+            self.storage_log("Διακοπή ελέγχου...")
+
+    def poll_storage_check(self):
+        """Apply the reconciler's events to the log"""
+        if not self.winfo_exists() or self.storage_checker is None:
+            return
+        labels = {"attachments": "Συνημμένο", "issued_receipts": "Απόδειξη", "transactions": "Συναλλαγή"}
+        while True:
+            try:
+                event = self.storage_checker.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == "phase":
+                self.storage_status_label.configure(text=event[1])
+            elif kind == "scanned":
+                self.storage_status_label.configure(text=f"Σάρωση αρχείων: {event[1]}")
+            elif kind == "missing":
+                _, table, row_id, path = event
+                self.storage_log(f"⚠️ {labels.get(table, table)} #{row_id}: λείπει το αρχείο {path}")
+            elif kind == "deleted":
+                _, files, size = event
+                self.storage_status_label.configure(text=f"Διαγράφηκαν {files} αρχεία ({size / (1024 * 1024):.1f} MB)")
+            elif kind == "error":
+                _, path, message = event
+                self.storage_log(f"❌ {path + ': ' if path else ''}{message}")
+            elif kind == "finished":
+                _, summary, stopped = event
+                self.storage_checker = None
+                self.storage_check_btn.configure(state="normal")
+                self.storage_check_stop_btn.configure(state="disabled")
+                if summary["report"]:
+                    self.storage_report_path = summary["report"]
+                    self.storage_report_btn.configure(state="normal")
+                self.storage_log(
+                    f"[{datetime.datetime.now().strftime('%H:%M:%S')}] "
+                    + ("Ο έλεγχος διακόπηκε. " if stopped else "Ο έλεγχος ολοκληρώθηκε. ")
+                    + f"Αρχεία: {summary['files']}, χωρίς αρχείο: {summary['missing']}, "
+                    f"ορφανά: {summary['orphans']} ({summary['orphan_bytes'] / (1024 * 1024):.1f} MB), "
+                    f"πρόσφατα (δεν διαγράφονται): {summary['recent']}, διαγράφηκαν: {summary['deleted']}")
+                self.refresh_storage_status()
+                return
+        self.after(STORAGE_MIGRATION_POLL_MS, self.poll_storage_check)
+
+    def start_storage_verify(self):
+        """Check the attachments against their recorded size, date and content hash"""
+        if self.storage_busy():
+            messagebox.showwarning("Προσοχή", self.storage_busy())
+            return
+        deep = bool(self.storage_deep_verify_var.get())
+        self.storage_verify_btn.configure(state="disabled")
+        self.storage_verify_stop_btn.configure(state="normal")
+        self.storage_progress.set(0)
+        self.storage_log(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] Έναρξη επαλήθευσης"
+                         + (" (πλήρης)" if deep else ""))
+        self.storage_verifier = storage_check.Verifier(deep=deep).start()
+        self.after(STORAGE_MIGRATION_POLL_MS, self.poll_storage_verify)
+
+    def stop_storage_verify(self):
+        if self.storage_verifier is not None:
+            self.storage_verifier.stop()
+            self.storage_verify_stop_btn.configure(state="disabled")
+            self.storage_log("Διακοπή επαλήθευσης...")
+
+    def poll_storage_verify(self):
+        """Apply the verifier's events to the progress bar and log"""
+        if not self.winfo_exists() or self.storage_verifier is None:
+            return
+        kinds = {"missing": "λείπει", "size": "διαφορετικό μέγεθος", "changed": "άλλαξε το περιεχόμενο", "error": "σφάλμα"}
+        while True:
+            try:
+                event = self.storage_verifier.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "checked":
+                _, checked, total = event
+                if total:
+                    self.storage_progress.set(min(1.0, checked / total))
+                self.storage_status_label.configure(text=f"Επαλήθευση: {checked} από {total}")
+            elif event[0] == "problem":
+                _, row_id, path, kind, detail = event
+                prefix = f"Συνημμένο #{row_id}: " if row_id else ""
+                self.storage_log(f"❌ {prefix}{kinds[kind]} {path or ''} {detail}".rstrip())
+            elif event[0] == "finished":
+                _, summary, stopped = event
+                self.storage_verifier = None
+                self.storage_verify_btn.configure(state="normal")
+                self.storage_verify_stop_btn.configure(state="disabled")
+                if summary["report"]:
+                    self.storage_report_path = summary["report"]
+                    self.storage_report_btn.configure(state="normal")
+                self.storage_log(
+                    f"[{datetime.datetime.now().strftime('%H:%M:%S')}] "
+                    + ("Η επαλήθευση διακόπηκε. " if stopped else "Η επαλήθευση ολοκληρώθηκε. ")
+                    + f"Ελέγχθηκαν: {summary['checked']}, εντάξει: {summary['ok']}, λείπουν: {summary['missing']}, "
+                    f"διαφορετικό μέγεθος: {summary['size']}, άλλαξαν: {summary['changed']}, σφάλματα: {summary['errors']}. "
+                    f"Διαβάστηκαν {summary['hashed']} αρχεία ({summary['hashed_bytes'] / (1024 * 1024):.1f} MB), "
+                    f"καταγράφηκαν στοιχεία για {summary['recorded']}.")
+                self.refresh_storage_status()
+                return
+        self.after(STORAGE_MIGRATION_POLL_MS, self.poll_storage_verify)
+
+    def open_storage_report(self):
+        """Open the CSV report of the last storage check"""
+        if self.storage_report_path and os.path.exists(self.storage_report_path):
+            os.startfile(self.storage_report_path)  # Windows
+        else:
+            messagebox.showwarning("Προσοχή", "Δεν υπάρχει αναφορά ελέγχου.")
+
+    # ========== BACKGROUND RECEIPT WRITES ==========
+
+    def check_receipt_queue(self):
+        """Update the pending receipts indicator and report receipts that could not be recorded"""
+        pending = receipt_queue.pending()
+        if pending:
+            text = f"⏳ {pending} αποδείξεις σε αναμονή"
+            if receipt_queue.share_error():
+                text += " (εκτός σύνδεσης)"
+            self.receipt_queue_button.configure(text=text)
+            if not self.receipt_queue_button.winfo_ismapped():
+                self.receipt_queue_button.pack(side="right", padx=(0, 10))
+        elif self.receipt_queue_button.winfo_ismapped():
+            self.receipt_queue_button.pack_forget()
+
+        failures = receipt_queue.take_failures()
+        if failures:
+            details = "\n".join(f"{name}: {error}" for name, error in failures[:10])
+            messagebox.showerror("Σφάλμα",
+                                 f"Αποτυχία καταχώρησης {len(failures)} αποδείξεων:\n\n{details}\n\n"
+                                 f"Τα αρχεία παραμένουν στο φάκελο {receipt_queue.SPOOL_DIR}.\n"
+                                 "Τα αρχεία που αποθηκεύσατε τοπικά δεν επηρεάζονται.")
+        self.after(RECEIPT_QUEUE_POLL_MS, self.check_receipt_queue)
+
+    # ========== LOCAL REPLICA SYNC ==========
+
+    def check_replica_sync(self):
+        """Update the synchronization indicator of local-first mode"""
+        try:
+            pending = replica_sync.pending()
+            conflicts = replica_sync.unreported_conflicts()
+        except Exception:
+            pending = conflicts = 0
+        if conflicts:
+            text = f"⚠️ {conflicts} συγκρούσεις συγχρονισμού"
+        elif pending and replica_sync.error():
+            text = f"⏳ {pending} αλλαγές τοπικά (εκτός σύνδεσης)"
+        elif pending:
+            text = f"🔄 {pending} αλλαγές προς συγχρονισμό"
+        else:
+            text = ""
+        if text:
+            self.replica_sync_button.configure(text=text)
+            if not self.replica_sync_button.winfo_ismapped():
+                self.replica_sync_button.pack(side="right", padx=(0, 10))
+        elif self.replica_sync_button.winfo_ismapped():
+            self.replica_sync_button.pack_forget()
+        self.after(REPLICA_SYNC_POLL_MS, self.check_replica_sync)
+
+    def replica_sync_clicked(self):
+        """Show the conflicts report, or synchronize at once"""
+        if not replica_sync.unreported_conflicts():
+            replica_sync.sync_now()
+            return
+        path = storage_check.report_path("sync_conflicts")
+        try:
+            replica_sync.write_conflicts_report(path)
+        except OSError as e:
+            messagebox.showerror("Σφάλμα", f"Δεν ήταν δυνατή η δημιουργία της αναφοράς:\n{e}")
+            return
+        messagebox.showinfo("Συγκρούσεις συγχρονισμού",
+                            "Ορισμένες αλλαγές αυτού του υπολογιστή έγιναν ταυτόχρονα και σε άλλον υπολογιστή.\n"
+                            "Ισχύει η εκδοχή της βάσης του δικτύου. Οι τοπικές τιμές φαίνονται στην αναφορά.")
+        os.startfile(path)  # Windows
+
+    # ========== CHANGES FROM OTHER PCS ==========
+
+    def check_changes(self):
+        """Mark the views showing tables changed in the database and refresh the visible ones"""
+        try:
+            while True:
+                event = self.change_watcher.events.get_nowait()
+                if event[0] == "changed":
+                    self.stale_views.update(view for view, (tables, _tab) in WATCHED_VIEWS.items()
+                                            if tables & event[1])
+        except queue.Empty:
+            pass
+        self.refresh_stale_views()
+        self.after(CHANGE_WATCH_POLL_MS, self.check_changes)
+
+    def refresh_stale_views(self):
+        """Refresh the changed views on the current tab (also called when the tab changes)"""
+        current_tab = self.tab_view.get()
+        for view in [view for view in self.stale_views if WATCHED_VIEWS[view][1] == current_tab]:
+            self.stale_views.discard(view)
+            getattr(self, view)()
+
+    def on_closing(self):
+        """Give queued receipts a moment to reach the share before closing"""
+        self.change_watcher.stop()
+        if self.storage_migrator is not None:
+            # Its position is saved after every batch; the next run continues from there
+            self.storage_migrator.stop()
+        if self.storage_checker is not None:
+            self.storage_checker.stop()
+        if self.storage_verifier is not None:
+            self.storage_verifier.stop()
+        if receipt_queue.pending() and not receipt_queue.wait(timeout=5):
+            messagebox.showinfo("Πληροφορία",
+                                f"{receipt_queue.pending()} αποδείξεις δεν έχουν ακόμα καταχωρηθεί στον κοινόχρηστο φάκελο.\n\n"
+                                "Έχουν αποθηκευτεί τοπικά και θα καταχωρηθούν στην επόμενη εκκίνηση.")
+        if replica_sync.running() and replica_sync.pending() and not replica_sync.wait(timeout=5):
+            messagebox.showinfo("Πληροφορία",
+                                f"{replica_sync.pending()} αλλαγές δεν έχουν ακόμα σταλεί στη βάση του δικτύου.\n\n"
+                                "Έχουν αποθηκευτεί τοπικά και θα σταλούν στην επόμενη εκκίνηση.")
+        self.destroy()
+
     # ========== THEME TOGGLE ==========
 
     def toggle_theme(self):
@@ -2215,5 +3801,7 @@ class App(ctk.CTk):
 # ========== RUN APPLICATION ==========
 
 if __name__ == "__main__":
+    # Required for the receipt worker processes in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
     app = App()
     app.mainloop()
@@ -0,0 +1,268 @@
+# attachment_store.py
+"""
+Attachment store. Files are kept by a storage backend (storage_backends: the
+shared folder by default, or S3-compatible object storage) under these keys:
+  blobs/<first two hex digits>/<sha256><ext>  attachments, once per content; every
+                                              attachments row records the hash of its
+                                              blob, which is removed with its last row
+  receipts/<YYYY>/<MM>/<name>.pdf             issued receipts
+  files/<YYYY>/<MM>/<name>                    attachments from before the blob store
+Files from older versions directly in ATTACHMENTS_DIR are moved into the
+dated folders by ShardMigrator.
+"""
+import os
+import queue
+import hashlib
+import datetime
+import threading
+import database as db
+import storage_backends
+from storage_backends import TransferCancelled
+
+BLOBS_FOLDER = "blobs"
+RECEIPTS_FOLDER = "receipts"
+FILES_FOLDER = "files"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Rows moved per database commit (and per saved checkpoint) by ShardMigrator
+MIGRATION_BATCH_SIZE = 200
+
+# A blob being released is renamed to this while its references are counted again
+RELEASING_SUFFIX = ".releasing"
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Returns the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def blob_key(content_hash, ext=""):
+    """Storage key of the blob with this content hash and file extension"""
+    return f"{BLOBS_FOLDER}/{content_hash[:2]}/{content_hash}{ext.lower()}"
+
+def dated_key(folder, file_name, when=None):
+    """<folder>/<YYYY>/<MM>/<file_name> for the given date (default: now)"""
+    when = when or datetime.datetime.now()
+    return f"{folder}/{when.year:04d}/{when.month:02d}/{file_name}"
+
+def dated_path(folder, file_name, when=None):
+    """Dated path inside ATTACHMENTS_DIR, for files of the shared folder"""
+    return storage_backends.FileSystemBackend().location(dated_key(folder, file_name, when))
+
+def receipt_location(file_name, when=None):
+    """Location put_receipt stores a receipt at"""
+    return storage_backends.get_backend().location(dated_key(RECEIPTS_FOLDER, file_name, when))
+
+def put_receipt(file_name, data, when=None):
+    """Stores a rendered receipt (PDF bytes); returns its location"""
+    return storage_backends.get_backend().put_bytes(dated_key(RECEIPTS_FOLDER, file_name, when), data)
+
+def store_file(source, content_hash=None, on_progress=None, cancelled=None):
+    """
+    Puts a file into the store. If a blob with the same content already exists
+    only the hash is computed and nothing is copied over the network.
+    on_progress and cancelled are passed to the backend's put.
+    Returns (content_hash, location, size, mtime, copied); mtime is that of the blob.
+    """
+    backend = storage_backends.get_backend()
+    content_hash = content_hash or hash_file(source)
+    size = os.path.getsize(source)
+    key = blob_key(content_hash, os.path.splitext(source)[1])
+    stored = backend.stat(backend.location(key))
+    if stored is not None and stored.size == size:
+        return content_hash, backend.location(key), size, stored.mtime, False
+    location = backend.put(key, source, content_hash, on_progress, cancelled)
+    return content_hash, location, size, backend.stat(location).mtime, True
+
+def ensure_stored(source, content_hash, location):
+    """
+    Called once the attachment rows of a blob are committed. store_file may have found
+    the blob just before another PC released it (the last other reference was deleted);
+    then it is stored again. release_blob counts the references once more after moving
+    the blob aside, so a row committed before this check always keeps its blob.
+    Returns True if the blob had to be stored again.
+    """
+    if storage_backends.stat(location) is not None:
+        return False
+    _content_hash, location, size, mtime, _copied = store_file(source, content_hash)
+    db.update_blob_metadata(location, size, mtime)
+    return True
+
+def add_file(transaction_id, source, on_progress=None, cancelled=None):
+    """
+    Stores a file and attaches it to a transaction; on_progress and cancelled are
+    passed to store_file. Returns (attachment_id, copied).
+    """
+    content_hash, location, size, mtime, copied = store_file(source, on_progress=on_progress, cancelled=cancelled)
+    attachment_id = db.add_attachment(transaction_id, location, os.path.basename(source),
+                                      os.path.splitext(source)[1].lower(), content_hash, size, mtime)
+    try:
+        ensure_stored(source, content_hash, location)
+    except Exception:
+        # The row would point at a missing file
+        try:
+            db.delete_attachment(attachment_id)
+        except Exception:
+            pass  # reported as missing by storage_check
+        raise
+    return attachment_id, copied
+
+def release_blob(location, content_hash):
+    """
+    Removes a blob once no attachment refers to its hash; returns True if it was removed.
+    The blob is moved aside first and the references counted again: a row added in the
+    meantime (by another PC) brings it back, and one added later finds it missing in
+    ensure_stored and stores it again.
+    """
+    if not content_hash or db.count_attachment_references(content_hash):
+        return False
+    releasing = location + RELEASING_SUFFIX
+    try:
+        storage_backends.move(location, releasing)
+    except FileNotFoundError:
+        return False
+    if db.count_attachment_references(content_hash):
+        storage_backends.move(releasing, location)
+        return False
+    storage_backends.delete(releasing)
+    return True
+
+def remove_attachment(attachment_id):
+    """Deletes an attachment row and its blob if this was the last reference"""
+    details = db.delete_attachment(attachment_id)
+    if details:
+        file_path, content_hash = details
+        release_blob(file_path, content_hash)
+
+class TransferManager:
+    """
+    Copies files into the store one after another on a worker thread and attaches
+    each one to a transaction once its copy is verified. The UI reads progress from
+    `events` (polled, never called from the worker):
+      ("state", index, text)
+      ("progress", index, done_bytes, total_bytes)
+      ("done", index, ok, message)
+      ("finished",)
+    """
+
+    def __init__(self, transaction_id, sources):
+        self.transaction_id = transaction_id
+        self.sources = list(sources)
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="attachment-transfer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Stops the current copy and skips the remaining files"""
+        self.cancelled.set()
+
+    def _run(self):
+        for index, source in enumerate(self.sources):
+            if self.cancelled.is_set():
+                self.events.put(("done", index, False, "Ακυρώθηκε"))
+                continue
+            try:
+                self.events.put(("state", index, "Έλεγχος περιεχομένου..."))
+                _attachment_id, copied = add_file(
+                    self.transaction_id, source,
+                    on_progress=lambda done, total, i=index: self.events.put(("progress", i, done, total)),
+                    cancelled=self.cancelled)
+                if not copied:
+                    self.events.put(("progress", index, 1, 1))
+                self.events.put(("done", index, True, "Ολοκληρώθηκε" if copied else "Υπάρχει ήδη (χωρίς αντιγραφή)"))
+            except TransferCancelled:
+                self.events.put(("done", index, False, "Ακυρώθηκε"))
+            except Exception as e:
+                self.events.put(("done", index, False, str(e)))
+        self.events.put(("finished",))
+
+
+def _parse_timestamp(value):
+    """datetime of an SQLite CURRENT_TIMESTAMP value, or None"""
+    try:
+        return datetime.datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+class ShardMigrator:
+    """
+    Moves files that older versions wrote directly into ATTACHMENTS_DIR into the
+    dated folders (attachments to files/, receipts to receipts/) and rewrites their
+    file_path in batches of MIGRATION_BATCH_SIZE rows. The position is saved after
+    every batch in storage_migrations, so a stopped or interrupted run continues
+    where it left off. A move is a rename on the same share; if a run stops between
+    a rename and its database update, the next run finds the file at its new place.
+    Events for the UI:
+      ("table", table, remaining, already_done)   already_done: moved + failed by earlier runs
+      ("progress", table, moved, failed)
+      ("error", table, row_id, message)
+      ("finished", stopped)
+    """
+
+    def __init__(self):
+        self.events = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="storage-migration", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops after the current batch"""
+        self.stopped.set()
+
+    def _run(self):
+        try:
+            for table in db.FILE_TABLES:
+                if self.stopped.is_set():
+                    break
+                self._migrate(table)
+        except Exception as e:
+            self.events.put(("error", None, None, str(e)))
+        self.events.put(("finished", self.stopped.is_set()))
+
+    def _migrate(self, table):
+        folder = RECEIPTS_FOLDER if table == "issued_receipts" else FILES_FOLDER
+        state = db.get_storage_migration(table)
+        if state and state[3] != 'complete':
+            last_id, moved, failed = state[:3]
+        else:
+            last_id, moved, failed = 0, 0, 0
+        self.events.put(("table", table, db.count_flat_files(table), moved + failed))
+
+        while not self.stopped.is_set():
+            batch = db.get_flat_files_batch(table, last_id, MIGRATION_BATCH_SIZE)
+            if not batch:
+                db.save_storage_migration(table, last_id, moved, failed, 'complete')
+                break
+
+            updates = []
+            for row_id, file_path, dated in batch:
+                target = dated_path(folder, os.path.basename(file_path), _parse_timestamp(dated))
+                try:
+                    if os.path.exists(file_path):
+                        if os.path.exists(target):
+                            raise FileExistsError(f"Υπάρχει ήδη: {target}")
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(file_path, target)
+                    elif not os.path.exists(target):
+                        raise FileNotFoundError(f"Το αρχείο δεν βρέθηκε: {file_path}")
+                except OSError as e:
+                    failed += 1
+                    self.events.put(("error", table, row_id, str(e)))
+                    continue
+                updates.append((target, row_id))
+
+            if updates:
+                db.update_file_paths(table, updates)
+            moved += len(updates)
+            last_id = batch[-1][0]
+            db.save_storage_migration(table, last_id, moved, failed)
+            self.events.put(("progress", table, moved, failed))
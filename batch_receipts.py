@@ -0,0 +1,160 @@
+# batch_receipts.py
+"""
+Batch receipt generation for many transactions using a pool of worker processes
+"""
+import io
+import os
+import time
+import queue
+import datetime
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import database as db
+import attachment_store
+import storage_backends
+from receipt_generator import ReceiptGenerator
+
+RECEIPT_TYPES = {
+    "payment": "Απόδειξη Πληρωμής",
+    "collection": "Απόδειξη Είσπραξης",
+}
+
+# Leave one core for the UI
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# One generator per worker process, created by the pool initializer
+_generator = None
+
+def company_settings_kwargs():
+    """Returns ReceiptGenerator keyword arguments from the saved company settings, or None"""
+    settings = db.get_company_settings()
+    if not settings or not settings[0]:
+        return None
+    company_name, logo_path, signature_path, address, phone, email, tax_id = settings
+    return {
+        "company_name": company_name,
+        "company_address": address or "",
+        "company_phone": phone or "",
+        "company_email": email or "",
+        "company_tax_id": tax_id or "",
+        "logo_path": logo_path or None,
+        "signature_path": signature_path or None,
+    }
+
+def _init_worker(generator_kwargs):
+    global _generator
+    _generator = ReceiptGenerator(**generator_kwargs)
+
+def _render(job):
+    """Renders one receipt inside a worker process and puts it into the store"""
+    trans_id, receipt_type, receipt_number, customer_name, amount, service, date, notes, file_name = job
+    buffer = io.BytesIO()
+    if receipt_type == "payment":
+        _generator.generate_payment_receipt(buffer, receipt_number, customer_name, amount, service,
+                                            payment_date=date, notes=notes or "")
+    else:
+        _generator.generate_collection_receipt(buffer, receipt_number, customer_name, amount, service,
+                                               collection_date=date, notes=notes or "")
+    return trans_id, attachment_store.put_receipt(file_name, buffer.getvalue())
+
+def find_transactions(date_from=None, date_to=None, status=None, customer_name=None):
+    """Selects the transactions of a batch run (same filters as the advanced search)"""
+    return db.advanced_search_transactions(customer_name=customer_name, date_from=date_from,
+                                           date_to=date_to, status=status)
+
+def run_batch(transactions, receipt_type, generator_kwargs, workers=DEFAULT_WORKERS, on_done=None, cancelled=None):
+    """
+    Renders one receipt per transaction in parallel worker processes, each of which
+    puts its receipts into the store, and records all issued_receipts rows in one commit.
+
+    transactions: rows as returned by find_transactions
+    on_done(trans_id, ok, message) is called in the calling thread as receipts finish.
+    cancelled: optional threading.Event; once set, receipts not yet started are skipped
+    (their reserved numbers stay unused) and those already rendered are still recorded.
+    If the rows cannot be recorded the stored receipts are deleted and the error is raised.
+    Returns (issued, failed, elapsed_seconds).
+    """
+    started = time.perf_counter()
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+
+    # Numbers follow the transaction dates; the whole range is reserved in one statement
+    transactions = sorted(transactions, key=lambda t: (t[4] or "", t[0]))
+    numbers = db.allocate_receipt_numbers(receipt_type, count=len(transactions)) if transactions else []
+
+    jobs = []
+    for (trans_id, customer_name, service, notes, date, amount, _status), receipt_number in zip(transactions, numbers):
+        jobs.append((trans_id, receipt_type, receipt_number, customer_name, amount or 0.0,
+                     service, date, notes, f"receipt_{trans_id}_{timestamp}.pdf"))
+
+    rows = []
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(generator_kwargs,)) as pool:
+        futures = {pool.submit(_render, job): job for job in jobs}
+        for future in as_completed(futures):
+            if cancelled is not None and cancelled.is_set():
+                for pending in futures:
+                    pending.cancel()
+            if future.cancelled():
+                continue
+            job = futures[future]
+            try:
+                trans_id, location = future.result()
+            except Exception as e:
+                failed += 1
+                if on_done:
+                    on_done(job[0], False, str(e))
+                continue
+            rows.append((trans_id, RECEIPT_TYPES[receipt_type], location, job[2], ""))
+            if on_done:
+                on_done(trans_id, True, job[8])
+
+    if rows:
+        try:
+            db.add_issued_receipts_bulk(rows)
+        except Exception as e:
+            # The rows are inserted in one commit and the audit log is written after it:
+            # the first row tells whether the receipts were recorded
+            try:
+                recorded = db.find_issued_receipt(rows[0][0], rows[0][2]) is not None
+            except Exception:
+                raise e  # not known; stored copies are left for the orphan check of storage_check
+            if not recorded:
+                for _trans_id, _receipt_type, location, _number, _issued_by in rows:
+                    try:
+                        storage_backends.delete(location)
+                    except OSError:
+                        pass  # left for the orphan check of storage_check
+                raise RuntimeError(f"Καμία από τις {len(rows)} αποδείξεις δεν καταχωρήθηκε: {e}") from e
+
+    return len(rows), failed, time.perf_counter() - started
+
+class BatchRun:
+    """
+    Runs run_batch on a worker thread so the window stays responsive. Events for the UI:
+      ("done", trans_id, ok, message)
+      ("finished", (issued, failed, elapsed) or None, error or None)
+    """
+
+    def __init__(self, transactions, receipt_type, generator_kwargs, workers=DEFAULT_WORKERS):
+        self.args = (transactions, receipt_type, generator_kwargs, workers)
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="batch-receipts", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Skips the receipts not yet started; the rendered ones are still recorded"""
+        self.cancelled.set()
+
+    def _run(self):
+        try:
+            result = run_batch(*self.args, on_done=lambda *done: self.events.put(("done",) + done),
+                               cancelled=self.cancelled)
+        except Exception as e:
+            self.events.put(("finished", None, str(e)))
+        else:
+            self.events.put(("finished", result, None))
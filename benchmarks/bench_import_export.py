@@ -0,0 +1,158 @@
+# benchmarks/bench_import_export.py
+"""
+Import/export throughput benchmark with synthetic workbooks.
+
+Generates Excel/CSV files with realistic Greek data and measures rows/sec and
+peak Python memory for the import tab logic (importer.run_transaction_import)
+and for an Excel/CSV export of all transactions, against:
+  - local:      a SQLite file on the local disk
+  - slow-share: the same file with added latency on every connect and commit,
+                standing in for company_data.db on the SMB share
+
+Usage:
+    python benchmarks/bench_import_export.py
+    python benchmarks/bench_import_export.py --sizes 1000 10000 --formats csv --latency-ms 20
+"""
+import os
+import sys
+import csv
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook
+import database as db
+import importer
+import synthetic_data
+
+class SlowConnection(sqlite3.Connection):
+    """sqlite3 connection that pays a fixed network round trip on every commit"""
+    latency = 0.0
+
+    def commit(self):
+        time.sleep(self.latency)
+        super().commit()
+
+@contextmanager
+def slow_share(latency):
+    """Adds `latency` seconds to every sqlite3.connect() and commit() made through database.py"""
+    original_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        time.sleep(latency)
+        kwargs.setdefault("factory", SlowConnection)
+        return original_connect(*args, **kwargs)
+
+    SlowConnection.latency = latency
+    sqlite3.connect = connect
+    try:
+        yield
+    finally:
+        sqlite3.connect = original_connect
+
+@contextmanager
+def database_at(folder):
+    """Points database.py at a fresh database inside folder"""
+    saved = (db.SHARED_PATH, db.DB_FILE, db.ATTACHMENTS_DIR)
+    db.SHARED_PATH = folder
+    db.DB_FILE = os.path.join(folder, "company_data.db")
+    db.ATTACHMENTS_DIR = os.path.join(folder, "attachments")
+    try:
+        yield
+    finally:
+        db.SHARED_PATH, db.DB_FILE, db.ATTACHMENTS_DIR = saved
+
+@contextmanager
+def measure(results, label, rows):
+    """Records elapsed seconds and peak traced memory of the block"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append((label, rows, elapsed, rows / elapsed if elapsed else 0.0, peak / (1024 * 1024)))
+        print(f"  {label:<40} {rows:>8} rows {elapsed:>8.2f} s {rows / max(elapsed, 1e-9):>10.0f} rows/s "
+              f"{peak / (1024 * 1024):>8.1f} MB peak", flush=True)
+
+def export_transactions(path):
+    """Export-equivalent: writes get_all_transactions() into a write-only workbook or a CSV file"""
+    records = db.get_all_transactions()
+    headers = ["ID", "Πελάτης", "Υπηρεσία", "Σχόλια", "Ημερομηνία", "Ποσό", "Κατάσταση"]
+    if path.endswith(".csv"):
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(headers)
+            writer.writerows(records)
+    else:
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Συναλλαγές")
+        ws.append(headers)
+        for record in records:
+            ws.append(list(record))
+        wb.save(path)
+    return len(records)
+
+def run(sizes, formats, latency_ms, keep):
+    workdir = tempfile.mkdtemp(prefix="ziscrm_bench_")
+    results = []
+    try:
+        for size in sizes:
+            for fmt in formats:
+                source = os.path.join(workdir, f"import_{size}.{fmt}")
+                print(f"\n=== {size} rows, {fmt} ===", flush=True)
+                with measure(results, f"generate {fmt}", size):
+                    if fmt == "csv":
+                        synthetic_data.write_csv(source, size)
+                    else:
+                        synthetic_data.write_xlsx(source, size)
+
+                targets = [("local", 0.0), ("slow-share", latency_ms / 1000.0)]
+                for target, latency in targets:
+                    folder = os.path.join(workdir, f"{target}_{size}_{fmt}")
+                    os.makedirs(folder)
+                    with database_at(folder):
+                        for service in synthetic_data.SERVICES:
+                            db.add_service(service)
+
+                        context = slow_share(latency) if latency else nullcontext()
+                        with context:
+                            job_id = db.create_import_job(source, importer.hash_file(source))
+                            with measure(results, f"import {fmt} -> {target}", size):
+                                success, failed = importer.run_transaction_import(source, job_id)
+                            if failed:
+                                print(f"  !! {failed} rows failed validation")
+
+                            for export_fmt in ("xlsx", "csv"):
+                                target_file = os.path.join(folder, f"export.{export_fmt}")
+                                with measure(results, f"export {export_fmt} <- {target}", success):
+                                    export_transactions(target_file)
+    finally:
+        if keep:
+            print(f"\nFiles kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--formats", nargs="+", choices=["xlsx", "csv"], default=["xlsx", "csv"])
+    parser.add_argument("--latency-ms", type=float, default=10.0,
+                        help="added latency per connect/commit for the slow-share target (default 10)")
+    parser.add_argument("--keep", action="store_true", help="keep generated files and databases")
+    args = parser.parse_args()
+
+    print(f"Chunk size: {importer.IMPORT_CHUNK_SIZE} rows, slow-share latency: {args.latency_ms} ms")
+    run(args.sizes, args.formats, args.latency_ms, args.keep)
+
+if __name__ == "__main__":
+    main()
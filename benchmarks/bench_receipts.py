@@ -0,0 +1,175 @@
+# benchmarks/bench_receipts.py
+"""
+Receipt rendering benchmark with text-content checks.
+
+Renders payment and collection receipts with varying note lengths, logos,
+fonts and template mode, and reports ms per receipt, bytes per file and page
+count. When pypdf is installed, the text of every generated PDF is extracted
+and checked against the expected receipt fields (title, number, amount,
+customer, the last word of the notes); the script exits with status 1 if any
+check fails, so it can be run before and after a change to the rendering path.
+
+Usage:
+    python benchmarks/bench_receipts.py
+    python benchmarks/bench_receipts.py --repeat 20 --keep
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+import receipt_generator
+from receipt_generator import ReceiptGenerator, RECEIPT_LAYOUTS
+import synthetic_data
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Number of note words per case; the last word is a marker checked in the output
+NOTE_LENGTHS = [0, 40, 400, 3000]
+NOTES_MARKER = "NOTES-END"
+COMMENTS_MARKER = "COMMENTS-END"
+
+COMPANY = {
+    "company_name": "Τεχνικό Γραφείο Παπαδόπουλος",
+    "company_address": "Ερμού 25, Αθήνα",
+    "company_phone": "210 1234567",
+    "company_email": "info@example.gr",
+    "company_tax_id": "123456789",
+}
+
+def make_images(folder):
+    """Creates logo/signature test images: none, small PNG, large photo-like JPEG, transparent PNG"""
+    images = {"none": None}
+
+    small = Image.new("RGB", (300, 200), (30, 64, 175))
+    images["small-png"] = os.path.join(folder, "logo_small.png")
+    small.save(images["small-png"])
+
+    # Noise does not compress well, like a scanned or photographed logo
+    large = Image.merge("RGB", [Image.effect_noise((4000, 3000), 60 + 20 * i) for i in range(3)])
+    images["large-jpeg"] = os.path.join(folder, "logo_large.jpg")
+    large.save(images["large-jpeg"], quality=95)
+
+    transparent = Image.new("RGBA", (1600, 800), (0, 0, 0, 0))
+    transparent.paste((20, 20, 120, 255), (100, 300, 1500, 500))
+    images["alpha-png"] = os.path.join(folder, "signature.png")
+    transparent.save(images["alpha-png"])
+    return images
+
+def make_notes(words, seed=1):
+    """Synthetic Greek notes of the given word count, ending with NOTES_MARKER"""
+    if not words:
+        return ""
+    rng = random.Random(seed)
+    vocabulary = " ".join(n for n in synthetic_data.NOTES if n).split() + synthetic_data.SERVICES
+    return " ".join(rng.choice(vocabulary) for _ in range(words - 1)) + " " + NOTES_MARKER
+
+def use_fonts(generator, fonts):
+    """Switches a generator to another FontSet"""
+    generator.fonts = fonts
+    generator.font_family = fonts.family
+    generator.greek_font = fonts.regular
+    generator.greek_font_bold = fonts.bold
+
+def render(generator, receipt_type, path, number, notes):
+    """Renders one receipt with fixed customer/amount data"""
+    kwargs = dict(notes=notes, custom_notes=f"Παραλαβή από το γραφείο. {COMMENTS_MARKER}")
+    if receipt_type == "payment":
+        generator.generate_payment_receipt(path, number, "Βλάχου Μαρία", 1234.5,
+                                           "Δήλωση Φορολογίας Εισοδήματος", payment_date="2026-03-15", **kwargs)
+    else:
+        generator.generate_collection_receipt(path, number, "Βλάχου Μαρία", 1234.5,
+                                              "Δήλωση Φορολογίας Εισοδήματος", collection_date="2026-03-15", **kwargs)
+
+def check_text(path, receipt_type, number, notes, greek):
+    """Returns a list of problems found in the extracted text of a receipt"""
+    reader = PdfReader(path)
+    text = " ".join(" ".join((page.extract_text() or "").split()) for page in reader.pages)
+    expected = [RECEIPT_LAYOUTS[receipt_type]["title"], f"Receipt No: {number}", "1234.50 EUR",
+                "Date: 15/03/26", COMMENTS_MARKER]
+    if notes:
+        expected += ["Transaction Notes:", NOTES_MARKER]
+    if greek:
+        # Greek only extracts correctly with an embedded Greek-capable font
+        expected += ["Βλάχου Μαρία", COMPANY["company_name"]]
+    return [f"missing '{item}'" for item in expected if item not in text]
+
+def run(repeat, keep):
+    workdir = tempfile.mkdtemp(prefix="ziscrm_receipts_")
+    images = make_images(workdir)
+    font_sets = {"default": receipt_generator.get_fonts(), "fallback": receipt_generator.FALLBACK_FONTS}
+    if font_sets["default"] == font_sets["fallback"]:
+        del font_sets["fallback"]
+
+    cases = []
+    for receipt_type in RECEIPT_LAYOUTS:
+        for words in NOTE_LENGTHS:
+            cases.append((receipt_type, words, "small-png", "default", True))
+    for image in images:
+        cases.append(("payment", 40, image, "default", True))
+        cases.append(("payment", 40, image, "default", False))
+    for fonts in font_sets:
+        cases.append(("collection", 400, "alpha-png", fonts, True))
+
+    failures = 0
+    if PdfReader is None:
+        print("pypdf is not installed: text checks are skipped (pip install pypdf)")
+    print(f"Font family: {receipt_generator.get_font_family()}, {repeat} renders per case\n")
+    print(f"{'type':<11}{'notes':>6}  {'logo/signature':<15}{'fonts':<10}{'template':<9}"
+          f"{'ms/receipt':>11}{'bytes':>10}{'pages':>6}  check")
+    try:
+        for index, (receipt_type, words, image, fonts, template) in enumerate(cases):
+            generator = ReceiptGenerator(**COMPANY, logo_path=images[image], signature_path=images[image],
+                                         use_template=template)
+            use_fonts(generator, font_sets[fonts])
+            notes = make_notes(words, seed=index)
+            number = f"#{1000 + index}"
+            path = os.path.join(workdir, f"case_{index:02d}_{receipt_type}.pdf")
+
+            # First render warms the image and word-width caches, as in a running app
+            render(generator, receipt_type, path, number, notes)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                render(generator, receipt_type, path, number, notes)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            status = "skipped"
+            pages = "-"
+            if PdfReader is not None:
+                pages = len(PdfReader(path).pages)
+                problems = check_text(path, receipt_type, number, notes, greek=font_sets[fonts] != receipt_generator.FALLBACK_FONTS)
+                status = "ok" if not problems else "FAIL: " + ", ".join(problems)
+                failures += bool(problems)
+            print(f"{receipt_type:<11}{words:>6}  {image:<15}{fonts:<10}{'yes' if template else 'no':<9}"
+                  f"{statistics.median(timings):>11.1f}{os.path.getsize(path):>10}{pages:>6}  {status}", flush=True)
+    finally:
+        if keep:
+            print(f"\nFiles kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="timed renders per case (default 10)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated PDFs")
+    args = parser.parse_args()
+
+    failures = run(max(1, args.repeat), args.keep)
+    if failures:
+        print(f"\n{failures} case(s) failed the text checks")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_storage.py
+"""
+Storage backend round-trip benchmark.
+
+Stores synthetic files of several sizes through a backend (put, stat, stream,
+get, delete), checks that every file reads back with the same size and hash,
+and reports MB/s per operation. Without options the filesystem backend is used
+on a temporary folder; with --s3-endpoint the S3 backend is used against an
+S3-compatible server, e.g. a local stand-in:
+
+    pip install "moto[server]" boto3
+    python -m moto.server -p 9000
+    python benchmarks/bench_storage.py --s3-endpoint http://127.0.0.1:9000
+
+moto accepts any credentials; set AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY for a
+real server. Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/bench_storage.py
+    python benchmarks/bench_storage.py --sizes 1 16 64 --repeat 3
+"""
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage_backends
+
+def make_file(folder, size_mb):
+    path = os.path.join(folder, f"sample_{size_mb}mb.bin")
+    block = os.urandom(1024 * 1024)
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(block)
+            digest.update(block)
+    return path, digest.hexdigest()
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def rate(size_mb, seconds):
+    return f"{size_mb / seconds:8.1f}" if seconds > 0 else "       -"
+
+def run(backend, folder, sizes, repeat):
+    failures = 0
+    print(f"{'MB':>5} {'put MB/s':>9} {'stream MB/s':>12} {'get MB/s':>9} {'stat ms':>8}")
+    for size_mb in sizes:
+        source, expected = make_file(folder, size_mb)
+        for run_index in range(repeat):
+            key = f"bench/{run_index}/{os.path.basename(source)}"
+            location, put_seconds = timed(backend.put, key, source, expected)
+            stat, stat_seconds = timed(backend.stat, location)
+            if stat is None or stat.size != size_mb * 1024 * 1024:
+                print(f"  FAIL stat {location}: {stat}")
+                failures += 1
+
+            digest = hashlib.sha256()
+            _, stream_seconds = timed(lambda: [digest.update(block) for block in backend.stream(location)])
+            if digest.hexdigest() != expected:
+                print(f"  FAIL stream hash {location}")
+                failures += 1
+
+            copy = os.path.join(folder, "copy.bin")
+            _, get_seconds = timed(backend.get, location, copy)
+            if storage_backends.FileSystemBackend().stat(copy).size != size_mb * 1024 * 1024:
+                print(f"  FAIL get size {location}")
+                failures += 1
+            os.remove(copy)
+
+            backend.delete(location)
+            if backend.stat(location) is not None:
+                print(f"  FAIL delete {location}")
+                failures += 1
+            print(f"{size_mb:5d} {rate(size_mb, put_seconds):>9} {rate(size_mb, stream_seconds):>12} "
+                  f"{rate(size_mb, get_seconds):>9} {stat_seconds * 1000:8.1f}")
+        os.remove(source)
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage backend round-trip benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 32], help="file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--s3-endpoint", help="S3-compatible server, e.g. http://127.0.0.1:9000")
+    parser.add_argument("--bucket", default="ziscrm-bench")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="ziscrm_storage_")
+    try:
+        if args.s3_endpoint:
+            # moto and MinIO accept test credentials; a real server uses the environment's
+            os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+            os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+            backend = storage_backends.S3Backend(bucket=args.bucket, prefix="",
+                                                 endpoint_url=args.s3_endpoint, region="us-east-1")
+            try:
+                backend.client.create_bucket(Bucket=args.bucket)
+            except Exception:
+                pass  # already exists
+            print(f"S3 backend: {args.s3_endpoint} bucket {args.bucket}")
+        else:
+            backend = storage_backends.FileSystemBackend(os.path.join(folder, "store"))
+            print(f"Filesystem backend: {backend.root}")
+        failures = run(backend, folder, args.sizes, args.repeat)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    print("OK" if not failures else f"{failures} checks failed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/synthetic_data.py
+"""
+Deterministic synthetic data (Greek customer names, services, notes) for benchmarks
+"""
+import csv
+import random
+import datetime
+from openpyxl import Workbook
+
+FIRST_NAMES = [
+    "Γιώργος", "Δημήτρης", "Κωνσταντίνος", "Νίκος", "Γιάννης", "Χρήστος", "Παναγιώτης",
+    "Βασίλης", "Αθανάσιος", "Ευάγγελος", "Σπύρος", "Μιχάλης", "Ιωάννα", "Μαρία",
+    "Ελένη", "Αικατερίνη", "Βασιλική", "Σοφία", "Αγγελική", "Δέσποινα", "Ευαγγελία",
+    "Θεοδώρα", "Χριστίνα", "Παρασκευή",
+]
+
+SURNAMES = [
+    "Παπαδόπουλος", "Βλάχος", "Αγγελόπουλος", "Νικολάου", "Γεωργίου", "Οικονόμου",
+    "Παπανικολάου", "Δημητρίου", "Καραγιάννης", "Μακρής", "Κωνσταντινίδης", "Ιωαννίδης",
+    "Παπαγεωργίου", "Αθανασίου", "Χατζηδάκης", "Σταυρόπουλος", "Ζαχαρίου", "Λαμπράκης",
+    "Μαυρίδης", "Τσακίρης",
+]
+
+SERVICES = [
+    "Δήλωση Φορολογίας Εισοδήματος", "Ε9 - Δήλωση Ακινήτων", "Μισθοδοσία",
+    "Περιοδική Δήλωση ΦΠΑ", "Έναρξη Επιτηδεύματος", "Διακοπή Εργασιών",
+    "Έκδοση Τεχνικού Φυλλαδίου", "Βεβαίωση Νομιμότητας", "Τοπογραφικό Διάγραμμα",
+    "Ενεργειακό Πιστοποιητικό", "Ηλεκτρονική Ταυτότητα Κτιρίου", "Αυθαίρετα - Τακτοποίηση",
+]
+
+NOTES = [
+    "", "", "", "Εξόφληση με κατάθεση", "Εκκρεμούν δικαιολογητικά",
+    "Τηλεφωνική επικοινωνία την επόμενη εβδομάδα", "Μετρητά",
+    "Πληρωμή σε δύο δόσεις, η δεύτερη μέχρι το τέλος του μήνα",
+]
+
+STATUSES = ["Εκκρεμεί", "Πληρώθηκε"]
+
+HEADERS = [
+    'Ονοματεπώνυμο Πελάτη', 'Υπηρεσία', 'Ημερομηνία (YYYY-MM-DD)',
+    'Τελικό Κόστος (με ΦΠΑ)', 'Κατάσταση', 'Σχόλια'
+]
+
+def customer_name(rng):
+    """Returns a random 'Surname Firstname' with the surname agreeing in gender"""
+    first = rng.choice(FIRST_NAMES)
+    surname = rng.choice(SURNAMES)
+    if first.endswith(("α", "η", "ή")) and surname.endswith("ς"):
+        # Βλάχος -> Βλάχου, Μακρής -> Μακρή (accent shifts are ignored)
+        if surname.endswith("ος"):
+            surname = surname[:-2] + "ου"
+        else:
+            surname = surname[:-1]
+    return f"{surname} {first}"
+
+def generate_rows(count, seed=42, customers=None):
+    """
+    Yields import template rows. About one customer per 8 rows is generated
+    unless a customer count is given, so customers repeat like in real data.
+    """
+    rng = random.Random(seed)
+    pool = [customer_name(rng) for _ in range(customers or max(10, count // 8))]
+    start = datetime.date(2020, 1, 1)
+    for _ in range(count):
+        date = start + datetime.timedelta(days=rng.randrange(6 * 365))
+        yield [
+            rng.choice(pool),
+            rng.choice(SERVICES),
+            date.strftime('%Y-%m-%d'),
+            round(rng.uniform(20, 1500), 2),
+            rng.choice(STATUSES),
+            rng.choice(NOTES),
+        ]
+
+def write_xlsx(path, count, seed=42):
+    """Writes a synthetic import workbook (streaming, write-only mode)"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Data")
+    ws.append(HEADERS)
+    for row in generate_rows(count, seed):
+        ws.append(row)
+    wb.save(path)
+
+def write_csv(path, count, seed=42):
+    """Writes a synthetic import CSV with ';' separator, as exported by Greek Excel"""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(HEADERS)
+        for row in generate_rows(count, seed):
+            writer.writerow(row)
@@ -53,6 +53,16 @@ def build_executable():
     cmd.extend([
         '--add-data=database.py;.',
         '--add-data=receipt_generator.py;.',
+        '--add-data=importer.py;.',
+        '--add-data=batch_receipts.py;.',
+        '--add-data=receipt_queue.py;.',
+        '--add-data=storage_backends.py;.',
+        '--add-data=replica_sync.py;.',
+        '--add-data=change_watcher.py;.',
+        '--add-data=attachment_store.py;.',
+        '--add-data=thumbnails.py;.',
+        '--add-data=storage_check.py;.',
+        '--add-data=document_export.py;.',
         '--hidden-import=customtkinter',
         '--hidden-import=PIL',
         '--hidden-import=PIL._tkinter_finder',
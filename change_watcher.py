@@ -0,0 +1,97 @@
+# change_watcher.py
+"""
+Notices changes that other PCs (or, in local-first mode, the synchronization) make
+to the database, so that open lists can be refreshed without a manual reload.
+A worker thread keeps one connection open and reads PRAGMA data_version, which
+only changes when another connection has committed to the database file; only
+then are the per-table change counters (table_versions) read to find which tables
+changed. The increments caused by this process's own commits (counted by the
+connections of connect_db) are subtracted, so saving here does not reload the
+lists a second time; only changes made elsewhere are reported. While the watcher
+can see the database the read cache of database.py is on, and every table that
+changed is dropped from it. The UI reads ("changed", tables) events from `events`,
+tables being a set of table names.
+"""
+import queue
+import threading
+import database as db
+
+# Seconds between checks; while the database cannot be read the interval doubles
+# up to the maximum
+POLL_INTERVAL = 2
+RETRY_INTERVAL_MAX = 60
+
+class ChangeWatcher:
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.events = queue.Queue()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="change-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _changed_elsewhere(self, versions, latest, own, carried):
+        """
+        Tables whose counter moved more than this process's own commits explain.
+        Own commits counted but not yet visible in latest are carried to the next check.
+        """
+        changed = set()
+        for table, version in latest.items():
+            delta = version - versions.get(table, version)
+            if delta < 0:
+                # Counters replaced (e.g. the replica was rebuilt from the share)
+                changed.add(table)
+                carried.pop(table, None)
+                continue
+            others = delta - carried.pop(table, 0) - own.get(table, 0)
+            if others > 0:
+                changed.add(table)
+            elif others < 0:
+                carried[table] = -others
+        return changed
+
+    def _run(self):
+        conn = None
+        data_version = None
+        versions = None
+        carried = {}
+        interval = self.interval
+        db.collect_own_changes(True)
+        while not self.stopped.wait(interval):
+            try:
+                if conn is None:
+                    # data_version is per connection: the first value read is only a baseline
+                    conn = db.connect_db()
+                    data_version = None
+                current = conn.execute("PRAGMA data_version").fetchone()[0]
+                if current != data_version:
+                    data_version = current
+                    latest = db.get_table_versions(conn)
+                    own = db.take_own_changes()
+                    if versions is not None:
+                        db.invalidate_cache([table for table, version in latest.items()
+                                             if versions.get(table) != version])
+                        changed = self._changed_elsewhere(versions, latest, own, carried)
+                        if changed:
+                            self.events.put(("changed", changed))
+                    versions = latest
+                db.set_cache_enabled(True)
+                interval = self.interval
+            except Exception:
+                # Nothing is cached while the database cannot be read; the counters read before
+                # are compared with those read after reconnecting, so no change is missed
+                db.set_cache_enabled(False)
+                interval = min(interval * 2, RETRY_INTERVAL_MAX)
+                if conn is not None:
+                    conn.close()
+                conn = None
+        db.collect_own_changes(False)
+        db.set_cache_enabled(False)
+        if conn is not None:
+            conn.close()
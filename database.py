@@ -1,6 +1,9 @@
 ﻿# database.py (Complete Final Version)
 import sqlite3
 import os
+import uuid
+import datetime
+import threading
 
 # --- Configuration ---
 # Change this to your network path when you are ready to deploy
@@ -10,12 +13,83 @@ SHARED_PATH = r"\\MYCLOUDEX2ULTRA\documentszis\Τα έγγραφά μου\CRM"
 DB_FILE = os.path.join(SHARED_PATH, "company_data.db")
 ATTACHMENTS_DIR = os.path.join(SHARED_PATH, "attachments")
 
-def connect_db():
-    """ Connects to the database and creates the full structure if it doesn't exist """
-    if not os.path.exists(ATTACHMENTS_DIR):
+# Local-first mode (replica_sync): the local replica of DB_FILE that serves reads and writes
+LOCAL_DB_FILE = None
+
+# Tables whose changes are counted in table_versions, so that change_watcher can tell
+# which views to refresh when another PC has written to the database
+VERSIONED_TABLES = ("customers", "services", "transactions", "audit_log", "company_settings")
+
+# table_versions increments of this process's own commits, collected while change_watcher runs
+# so that it reports only changes made elsewhere; None while not collected
+_own_changes = None
+_own_changes_lock = threading.Lock()
+
+# Statements before which sqlite3 opens a transaction implicitly
+_WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+class _Cursor(sqlite3.Cursor):
+    """ Cursor of _Connection: lets the connection open its write transactions """
+
+    def execute(self, sql, parameters=()):
+        self.connection._begin(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection._begin(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+class _Connection(sqlite3.Connection):
+    """ Connection of connect_db. While own changes are collected (counting) it opens each
+    write transaction itself with BEGIN IMMEDIATE and reads the table versions right after,
+    so that the increments it adds to _own_changes on commit are those of its own writes
+    only: no other PC can commit while the transaction holds the write lock """
+    counting = False
+    versions = None
+
+    def _begin(self, sql):
+        if (self.counting and not self.in_transaction and self.isolation_level is not None
+                and sql.lstrip()[:7].upper().startswith(_WRITE_STATEMENTS)):
+            super().execute("BEGIN IMMEDIATE")
+            self.versions = get_table_versions(self)
+
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if self.versions is None or not self.in_transaction:
+            self.versions = None
+            return super().commit()
+        latest = get_table_versions(self)
+        super().commit()
+        with _own_changes_lock:
+            if _own_changes is not None:
+                for table, version in latest.items():
+                    if version != self.versions.get(table, version):
+                        _own_changes[table] = _own_changes.get(table, 0) + version - self.versions[table]
+        self.versions = None
+
+    def rollback(self):
+        self.versions = None
+        return super().rollback()
+
+def connect_db(shared=False):
+    """ Connects to the database and creates the full structure if it doesn't exist.
+    In local-first mode this is the local replica; shared=True always opens DB_FILE """
+    shared = shared or not LOCAL_DB_FILE
+    # The local replica must work without the share (the storage writers create their folders)
+    if shared and not os.path.exists(ATTACHMENTS_DIR):
         os.makedirs(ATTACHMENTS_DIR)
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE if shared else LOCAL_DB_FILE, factory=_Connection)
     cursor = conn.cursor()
     cursor.execute("PRAGMA foreign_keys = ON;") # Important for deleting services correctly
 
@@ -111,6 +185,41 @@ def connect_db():
         updated_at TEXT DEFAULT CURRENT_TIMESTAMP
     )""")
 
+    # Table for Import Jobs (resumable batch imports)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        file_hash TEXT NOT NULL,
+        last_committed_row INTEGER DEFAULT 1,
+        success_count INTEGER DEFAULT 0,
+        fail_count INTEGER DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'incomplete',
+        started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+    # Table for Receipt Sequences (per type, per year numbering)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS receipt_sequences (
+        receipt_type TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        last_number INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (receipt_type, year)
+    )""")
+
+    # Table for Storage Migrations (resumable moves of files into the sharded layout)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS storage_migrations (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER DEFAULT 0,
+        moved_count INTEGER DEFAULT 0,
+        fail_count INTEGER DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'incomplete',
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""")
+
     # Add new columns to existing customers table if they don't exist
     try:
         cursor.execute("ALTER TABLE customers ADD COLUMN email TEXT")
@@ -162,9 +271,110 @@ def connect_db():
     except sqlite3.OperationalError:
         pass
 
+    # Content hash of the attachment's blob in the content-addressed store (empty for older files
+    # until they are verified once)
+    try:
+        cursor.execute("ALTER TABLE attachments ADD COLUMN content_hash TEXT")
+    except sqlite3.OperationalError:
+        pass
+
+    # Size and modification time of the stored file, for verification without reading it
+    try:
+        cursor.execute("ALTER TABLE attachments ADD COLUMN file_size INTEGER")
+    except sqlite3.OperationalError:
+        pass
+    try:
+        cursor.execute("ALTER TABLE attachments ADD COLUMN file_mtime REAL")
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attachments_content_hash ON attachments (content_hash)")
+
+    _create_table_versions(cursor)
+
     conn.commit()
+    # Only the database change_watcher watches: the replica in local-first mode
+    if _own_changes is not None and not (shared and LOCAL_DB_FILE):
+        conn.counting = True
     return conn
 
+def _create_table_versions(cursor):
+    """ One change counter per table of VERSIONED_TABLES, raised by triggers on every
+    insert, update and delete. Created once; later connections only check for the triggers """
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'table_versions_%'")
+    if cursor.fetchone()[0] == len(VERSIONED_TABLES) * 3:
+        return
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    for table in VERSIONED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS table_versions_{table}_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+            END
+            """)
+
+def get_table_versions(conn):
+    """ {table: change counter} on an open connection (used by change_watcher) """
+    return dict(conn.execute("SELECT table_name, version FROM table_versions").fetchall())
+
+def collect_own_changes(enabled):
+    """ Starts (or stops) counting the table_versions increments of this process's commits """
+    global _own_changes
+    with _own_changes_lock:
+        _own_changes = {} if enabled else None
+
+def take_own_changes():
+    """ {table: increments} of this process's commits since the last call """
+    global _own_changes
+    with _own_changes_lock:
+        changes = _own_changes or {}
+        if _own_changes is not None:
+            _own_changes = {}
+    return changes
+
+# --- Read Cache ---
+# The service list and the company settings are read again and again (dropdowns, every
+# receipt). While change_watcher runs they are kept in memory; it drops them when another
+# PC changes their table, and this process drops them on its own writes.
+CACHE_ENABLED = False
+_cache = {}
+_cache_generation = 0
+
+def _cached(table, load):
+    if not CACHE_ENABLED:
+        return load()
+    if table in _cache:
+        return _cache[table]
+    generation = _cache_generation
+    value = load()
+    # A change reported while loading may not be part of what was read
+    if generation == _cache_generation and CACHE_ENABLED:
+        _cache[table] = value
+    return value
+
+def invalidate_cache(tables=None):
+    """ Drops the cached results of these tables (default: all) """
+    global _cache_generation
+    _cache_generation += 1
+    if tables is None:
+        _cache.clear()
+    else:
+        for table in tables:
+            _cache.pop(table, None)
+
+def set_cache_enabled(enabled):
+    """ Turned on by change_watcher while it can see the database, off (and emptied) otherwise """
+    global CACHE_ENABLED
+    CACHE_ENABLED = enabled
+    if not enabled:
+        invalidate_cache()
+
 # --- Customer Functions ---
 def add_customer(name):
     conn = connect_db()
@@ -175,6 +385,70 @@ def add_customer(name):
     except sqlite3.IntegrityError: pass
     finally: conn.close()
 
+def upsert_customers(records):
+    """ Inserts or updates many customers by name in a single transaction.
+    records: (name, email, phone, tax_id, address, work_info) tuples; empty values keep what is stored.
+    Returns (created, updated, unchanged) counts """
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    # Last occurrence wins when a name appears more than once in the input
+    incoming = {}
+    for record in records:
+        incoming[record[0]] = tuple(v or "" for v in record)
+
+    # Load current values in chunks to stay under SQLite's parameter limit
+    existing = {}
+    names = list(incoming)
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        cursor.execute(f"""
+            SELECT name, email, phone, tax_id, address, work_info
+            FROM customers WHERE name IN ({",".join("?" * len(chunk))})
+        """, chunk)
+        for row in cursor.fetchall():
+            existing[row[0]] = tuple(v or "" for v in row)
+
+    created = updated = unchanged = 0
+    changes = []
+    for name, record in incoming.items():
+        current = existing.get(name)
+        if current is None:
+            created += 1
+            changes.append(record)
+            continue
+        merged = tuple(new or old for new, old in zip(record, current))
+        if merged == current:
+            unchanged += 1
+        else:
+            updated += 1
+            changes.append(record)
+
+    try:
+        cursor.executemany("""
+            INSERT INTO customers (name, email, phone, tax_id, address, work_info)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                email = COALESCE(NULLIF(excluded.email, ''), customers.email),
+                phone = COALESCE(NULLIF(excluded.phone, ''), customers.phone),
+                tax_id = COALESCE(NULLIF(excluded.tax_id, ''), customers.tax_id),
+                address = COALESCE(NULLIF(excluded.address, ''), customers.address),
+                work_info = COALESCE(NULLIF(excluded.work_info, ''), customers.work_info)
+        """, changes)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    # Log the import
+    add_audit_log("IMPORT", "customers", 0,
+                  f"Μαζική εισαγωγή πελατών: {created} νέοι, {updated} ενημερώσεις, {unchanged} χωρίς αλλαγές",
+                  "", "")
+
+    return created, updated, unchanged
+
 def get_customer_by_name(name):
     conn = connect_db()
     cursor = conn.cursor()
@@ -200,9 +474,14 @@ def add_service(name):
         cursor.execute("INSERT INTO services (name) VALUES (?)", (name,))
         conn.commit()
     except sqlite3.IntegrityError: pass
-    finally: conn.close()
+    finally:
+        conn.close()
+        invalidate_cache(["services"])
 
 def get_services():
+    return list(_cached("services", _load_services))
+
+def _load_services():
     conn = connect_db()
     cursor = conn.cursor()
     cursor.execute("SELECT id, name FROM services ORDER BY name")
@@ -217,6 +496,7 @@ def delete_service(service_id):
     cursor.execute("DELETE FROM services WHERE id = ?", (service_id,))
     conn.commit()
     conn.close()
+    invalidate_cache(["services"])
 
 # --- Transaction Functions ---
 def add_transaction(customer_id, service_id, notes, date, cost_pre, cost_final, status, attachment=""):
@@ -296,6 +576,47 @@ def get_transactions_by_customer(customer_name):
     conn.close()
     return records
 
+def iter_customer_transactions(customer_name, date_from=None, date_to=None, status=None, batch_size=200):
+    """
+    Yields a customer's transactions oldest first, fetching batch_size rows at a time
+    from an open cursor instead of loading them all into a list.
+    Rows: (id, service, notes, transaction_date, cost_final, status)
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    query = """
+    SELECT
+        t.id,
+        COALESCE(s.name, 'Διαγραμμένη Υπηρεσία'),
+        t.notes,
+        t.transaction_date,
+        t.cost_final,
+        t.status
+    FROM transactions t
+    JOIN customers c ON t.customer_id = c.id
+    LEFT JOIN services s ON t.service_id = s.id
+    WHERE c.name = ?
+    """
+    params = [customer_name]
+    if date_from:
+        query += " AND t.transaction_date >= ?"
+        params.append(date_from)
+    if date_to:
+        query += " AND t.transaction_date <= ?"
+        params.append(date_to)
+    if status and status != "Όλα":
+        query += " AND t.status = ?"
+        params.append(status)
+    try:
+        cursor.execute(query + " ORDER BY t.transaction_date ASC, t.id ASC", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
 def update_transaction(transaction_id, new_status, new_notes):
     """ Updates a transaction's status and notes """
     conn = connect_db()
@@ -343,16 +664,66 @@ def delete_transaction(transaction_id):
 
     conn.close()
 
+def iter_transaction_documents(customer_name=None, date_from=None, date_to=None, batch_size=200):
+    """
+    Yields the documents (attachments, issued receipts and the attachment of transactions
+    from older versions) of the transactions of a customer and/or period, by customer,
+    date and transaction.
+    Rows: (kind, transaction_id, customer, service, transaction_date, file_name, file_path, receipt_number)
+    kind: 'attachment' or 'receipt'
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    conditions = []
+    params = []
+    if customer_name:
+        conditions.append("c.name = ?")
+        params.append(customer_name)
+    if date_from:
+        conditions.append("t.transaction_date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("t.transaction_date <= ?")
+        params.append(date_to)
+    query = f"""
+    WITH selected AS (
+        SELECT t.id, c.name AS customer, COALESCE(s.name, 'Διαγραμμένη Υπηρεσία') AS service,
+               t.transaction_date, t.attachment_path
+        FROM transactions t
+        JOIN customers c ON t.customer_id = c.id
+        LEFT JOIN services s ON t.service_id = s.id
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+    )
+    SELECT 'attachment', x.id, x.customer, x.service, x.transaction_date, a.file_name, a.file_path, NULL
+    FROM selected x JOIN attachments a ON a.transaction_id = x.id
+    UNION ALL
+    SELECT 'receipt', x.id, x.customer, x.service, x.transaction_date, r.receipt_type, r.file_path, r.receipt_number
+    FROM selected x JOIN issued_receipts r ON r.transaction_id = x.id
+    UNION ALL
+    SELECT 'attachment', x.id, x.customer, x.service, x.transaction_date, NULL, x.attachment_path, NULL
+    FROM selected x WHERE x.attachment_path IS NOT NULL AND x.attachment_path != ''
+    ORDER BY 3, 5, 2, 1
+    """
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
 # --- Attachments Functions ---
-def add_attachment(transaction_id, file_path, file_name, file_type=""):
+def add_attachment(transaction_id, file_path, file_name, file_type="", content_hash=None, file_size=None, file_mtime=None):
     """ Adds an attachment to a transaction """
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute("""
-        INSERT INTO attachments (transaction_id, file_name, file_path, file_type)
-        VALUES (?, ?, ?, ?)
-    """, (transaction_id, file_name, file_path, file_type))
+        INSERT INTO attachments (transaction_id, file_name, file_path, file_type, content_hash, file_size, file_mtime)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (transaction_id, file_name, file_path, file_type, content_hash, file_size, file_mtime))
 
     conn.commit()
     attachment_id = cursor.lastrowid
@@ -366,13 +737,52 @@ def add_attachment(transaction_id, file_path, file_name, file_type=""):
     conn.close()
     return attachment_id
 
+def add_attachments_bulk(rows):
+    """ Adds many attachments in a single transaction; returns their ids in the order of rows.
+    rows: (transaction_id, file_path, file_name, file_type, content_hash, file_size, file_mtime) tuples """
+    conn = connect_db()
+    cursor = conn.cursor()
+    attachment_ids = []
+    try:
+        for row in rows:
+            cursor.execute("""
+                INSERT INTO attachments (transaction_id, file_path, file_name, file_type, content_hash, file_size, file_mtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, row)
+            attachment_ids.append(cursor.lastrowid)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    # Log the addition
+    add_audit_log("IMPORT", "attachments", 0,
+                  f"Μαζική προσθήκη αρχείων: {len(rows)} αρχεία σε {len({r[0] for r in rows})} συναλλαγές",
+                  "", "")
+    return attachment_ids
+
+def get_existing_transaction_ids(transaction_ids):
+    """ Returns the subset of the given ids that exist in transactions """
+    conn = connect_db()
+    cursor = conn.cursor()
+    ids = list(set(transaction_ids))
+    existing = set()
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        cursor.execute(f"SELECT id FROM transactions WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+    conn.close()
+    return existing
+
 def get_attachments(transaction_id):
     """ Gets all attachments for a transaction """
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute("""
-        SELECT id, file_name, file_path, file_type, uploaded_at
+        SELECT id, file_name, file_path, file_type, uploaded_at, content_hash
         FROM attachments
         WHERE transaction_id = ?
         ORDER BY uploaded_at DESC
@@ -382,14 +792,71 @@ def get_attachments(transaction_id):
     conn.close()
     return attachments
 
+def count_attachments():
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM attachments")
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def get_attachments_metadata_batch(after_id, limit):
+    """ Next attachments (id, file_path, file_size, file_mtime, content_hash) after an id """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, file_path, file_size, file_mtime, content_hash
+        FROM attachments
+        WHERE id > ?
+        ORDER BY id LIMIT ?
+    """, (after_id, limit))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def update_attachments_metadata(rows):
+    """ Records size, mtime and content hash of many attachments in a single commit.
+    rows: (file_size, file_mtime, content_hash, id) tuples """
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("UPDATE attachments SET file_size = ?, file_mtime = ?, content_hash = ? WHERE id = ?", rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def update_blob_metadata(file_path, file_size, file_mtime):
+    """ Records size and mtime of a blob that was stored again, on every attachment that refers to it """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE attachments SET file_size = ?, file_mtime = ? WHERE file_path = ?",
+                   (file_size, file_mtime, file_path))
+    conn.commit()
+    conn.close()
+
+def count_attachment_references(content_hash):
+    """ Number of attachments that refer to a blob of the attachment store. In local-first mode
+    rows not yet synchronized in either direction count too, so no blob in use is released """
+    count = 0
+    for shared in _reference_databases():
+        conn = connect_db(shared)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM attachments WHERE content_hash = ?", (content_hash,))
+        count += cursor.fetchone()[0]
+        conn.close()
+    return count
+
 def delete_attachment(attachment_id):
-    """ Deletes an attachment """
+    """ Deletes an attachment; returns (file_path, content_hash) of the deleted row or None """
     conn = connect_db()
     cursor = conn.cursor()
 
     # Get attachment details for audit log
     cursor.execute("""
-        SELECT transaction_id, file_name
+        SELECT transaction_id, file_name, file_path, content_hash
         FROM attachments
         WHERE id = ?
     """, (attachment_id,))
@@ -406,6 +873,7 @@ def delete_attachment(attachment_id):
                       "")
 
     conn.close()
+    return (details[2], details[3]) if details else None
 
 # --- Issued Receipts Functions ---
 def add_issued_receipt(transaction_id, receipt_type, file_path, receipt_number="", issued_by=""):
@@ -413,12 +881,17 @@ def add_issued_receipt(transaction_id, receipt_type, file_path, receipt_number="
     conn = connect_db()
     cursor = conn.cursor()
 
-    cursor.execute("""
-        INSERT INTO issued_receipts (transaction_id, receipt_type, file_path, receipt_number, issued_by)
-        VALUES (?, ?, ?, ?, ?)
-    """, (transaction_id, receipt_type, file_path, receipt_number, issued_by))
-
-    conn.commit()
+    try:
+        cursor.execute("""
+            INSERT INTO issued_receipts (transaction_id, receipt_type, file_path, receipt_number, issued_by)
+            VALUES (?, ?, ?, ?, ?)
+        """, (transaction_id, receipt_type, file_path, receipt_number, issued_by))
+        conn.commit()
+    except Exception:
+        # Release the write lock at once instead of when the connection is garbage collected
+        conn.rollback()
+        conn.close()
+        raise
     receipt_id = cursor.lastrowid
 
     # Log the issuance
@@ -430,6 +903,87 @@ def add_issued_receipt(transaction_id, receipt_type, file_path, receipt_number="
     conn.close()
     return receipt_id
 
+def find_issued_receipt(transaction_id, file_path):
+    """ Id of the issued receipt of a transaction stored at file_path, or None """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM issued_receipts WHERE transaction_id = ? AND file_path = ?",
+                   (transaction_id, file_path))
+    result = cursor.fetchone()
+    conn.close()
+    return result[0] if result else None
+
+# Series prefix per receipt type: ΑΠ-2026/00012
+RECEIPT_SERIES = {
+    "payment": "ΑΠ",
+    "collection": "ΑΕ",
+}
+
+def format_receipt_number(receipt_type, year, number):
+    return f"{RECEIPT_SERIES.get(receipt_type, receipt_type)}-{year}/{number:05d}"
+
+def allocate_receipt_numbers(receipt_type, year=None, count=1, conn=None):
+    """ Reserves the next `count` numbers of a receipt series with one atomic statement.
+    receipt_type: "payment" or "collection"; year defaults to the current year.
+    With conn, the allocation joins the caller's transaction and is committed by the caller;
+    without it, it is committed at once, so no write lock is held while receipts are rendered.
+    Numbers of receipts that fail afterwards are not reused. Returns formatted numbers in order.
+    Numbers are always allocated in the shared database, also in local-first mode """
+    if year is None:
+        year = datetime.date.today().year
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_db(shared=True)
+    cursor = conn.cursor()
+    try:
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            cursor.execute("""
+                INSERT INTO receipt_sequences (receipt_type, year, last_number) VALUES (?, ?, ?)
+                ON CONFLICT(receipt_type, year) DO UPDATE SET last_number = last_number + excluded.last_number
+                RETURNING last_number
+            """, (receipt_type, year, count))
+        else:
+            # No RETURNING before SQLite 3.35: the upsert takes the write lock, so the read is still ours
+            cursor.execute("""
+                INSERT INTO receipt_sequences (receipt_type, year, last_number) VALUES (?, ?, ?)
+                ON CONFLICT(receipt_type, year) DO UPDATE SET last_number = last_number + excluded.last_number
+            """, (receipt_type, year, count))
+            cursor.execute("SELECT last_number FROM receipt_sequences WHERE receipt_type = ? AND year = ?",
+                           (receipt_type, year))
+        last = cursor.fetchone()[0]
+        if own_conn:
+            conn.commit()
+    except Exception:
+        if own_conn:
+            conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+    return [format_receipt_number(receipt_type, year, n) for n in range(last - count + 1, last + 1)]
+
+def add_issued_receipts_bulk(rows):
+    """ Records many issued receipts in a single commit.
+    rows: (transaction_id, receipt_type, file_path, receipt_number, issued_by) tuples """
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("""
+            INSERT INTO issued_receipts (transaction_id, receipt_type, file_path, receipt_number, issued_by)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    # Log the issuance
+    add_audit_log("INSERT", "issued_receipts", 0,
+                  f"Μαζική έκδοση αποδείξεων: {len(rows)} αποδείξεις",
+                  "", "")
+
 def get_issued_receipts(transaction_id):
     """ Gets all issued receipts for a transaction """
     conn = connect_db()
@@ -581,9 +1135,215 @@ def get_audit_logs(limit=100, filter_action=None, filter_table=None):
     conn.close()
     return results
 
+# --- Import Job Functions ---
+def create_import_job(file_path, file_hash):
+    """ Creates a new import job and returns its id """
+    job_id = uuid.uuid4().hex
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO import_jobs (id, file_name, file_path, file_hash)
+        VALUES (?, ?, ?, ?)
+    """, (job_id, os.path.basename(file_path), file_path, file_hash))
+    conn.commit()
+    conn.close()
+    return job_id
+
+def get_import_job(job_id):
+    """ Gets an import job """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, file_name, file_path, file_hash, last_committed_row, success_count, fail_count, status, started_at, updated_at
+        FROM import_jobs WHERE id = ?
+    """, (job_id,))
+    result = cursor.fetchone()
+    conn.close()
+    return result
+
+def get_incomplete_import_jobs():
+    """ Gets all import jobs that have not finished """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, file_name, file_path, file_hash, last_committed_row, success_count, fail_count, status, started_at, updated_at
+        FROM import_jobs WHERE status = 'incomplete'
+        ORDER BY updated_at DESC
+    """)
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+def get_incomplete_import_job_by_hash(file_hash):
+    """ Finds the latest unfinished import job for the same file contents """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, file_name, file_path, file_hash, last_committed_row, success_count, fail_count, status, started_at, updated_at
+        FROM import_jobs WHERE status = 'incomplete' AND file_hash = ?
+        ORDER BY updated_at DESC LIMIT 1
+    """, (file_hash,))
+    result = cursor.fetchone()
+    conn.close()
+    return result
+
+def import_transactions_chunk(job_id, rows, last_row, success_count, fail_count):
+    """ Inserts a chunk of imported transactions and advances the job checkpoint in one commit.
+    rows: (customer_name, service_id, notes, date, cost_pre, cost_final, status) tuples """
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        customer_ids = {}
+        for customer_name in {row[0] for row in rows}:
+            cursor.execute("INSERT OR IGNORE INTO customers (name) VALUES (?)", (customer_name,))
+            cursor.execute("SELECT id FROM customers WHERE name = ?", (customer_name,))
+            customer_ids[customer_name] = cursor.fetchone()[0]
+
+        cursor.executemany("""
+            INSERT INTO transactions (customer_id, service_id, notes, transaction_date, cost_pre_vat, cost_final, status, attachment_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, '')
+        """, [(customer_ids[row[0]],) + tuple(row[1:]) for row in rows])
+
+        cursor.execute("""
+            UPDATE import_jobs
+            SET last_committed_row = ?, success_count = success_count + ?, fail_count = fail_count + ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (last_row, success_count, fail_count, job_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def set_import_job_status(job_id, status):
+    """ Marks an import job as 'completed' or 'abandoned' """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE import_jobs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?", (status, job_id))
+    conn.commit()
+    conn.close()
+
+# --- Storage Layout Functions ---
+# Tables whose rows point at files in ATTACHMENTS_DIR, with the column that dates each file
+FILE_TABLES = {
+    "attachments": "uploaded_at",
+    "issued_receipts": "issued_at",
+}
+
+def _flat_file_condition():
+    """ SQL condition and parameters matching file paths directly inside ATTACHMENTS_DIR """
+    prefix = os.path.join(ATTACHMENTS_DIR, "")
+    return ("substr(file_path, 1, ?) = ? AND instr(substr(file_path, ?), ?) = 0",
+            [len(prefix), prefix, len(prefix) + 1, os.sep])
+
+def count_flat_files(table):
+    """ Number of rows of a file table whose file is still in the flat ATTACHMENTS_DIR """
+    condition, params = _flat_file_condition()
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {condition}", params)
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def get_flat_files_batch(table, after_id, limit):
+    """ Next rows (id, file_path, date) of a file table with files in the flat ATTACHMENTS_DIR """
+    condition, params = _flat_file_condition()
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id, file_path, {FILE_TABLES[table]} FROM {table}
+        WHERE id > ? AND {condition}
+        ORDER BY id LIMIT ?
+    """, [after_id] + params + [limit])
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def update_file_paths(table, rows):
+    """ Rewrites file_path of many rows of a file table in a single commit.
+    rows: (new_file_path, id) tuples """
+    if table not in FILE_TABLES:
+        raise ValueError(table)
+    conn = connect_db()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(f"UPDATE {table} SET file_path = ? WHERE id = ?", rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def get_storage_migration(name):
+    """ Returns (last_id, moved_count, fail_count, status) of a storage migration or None """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_id, moved_count, fail_count, status FROM storage_migrations WHERE name = ?", (name,))
+    result = cursor.fetchone()
+    conn.close()
+    return result
+
+def save_storage_migration(name, last_id, moved_count, fail_count, status="incomplete"):
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO storage_migrations (name, last_id, moved_count, fail_count, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(name) DO UPDATE SET
+            last_id = excluded.last_id,
+            moved_count = excluded.moved_count,
+            fail_count = excluded.fail_count,
+            status = excluded.status,
+            updated_at = excluded.updated_at
+    """, (name, last_id, moved_count, fail_count, status))
+    conn.commit()
+    conn.close()
+
+def _reference_databases():
+    """ connect_db(shared) arguments of the databases whose file references all count:
+    in local-first mode the replica and the shared database, otherwise the database """
+    return [False, True] if LOCAL_DB_FILE else [False]
+
+def iter_file_references(batch_size=1000):
+    """ Yields (table, id, file_path) for every file the database refers to: attachments,
+    issued receipts and the single attachment of transactions from older versions.
+    In local-first mode files referred to by the replica and by the shared database
+    are yielded once each """
+    queries = [
+        ("attachments", "SELECT id, file_path FROM attachments"),
+        ("issued_receipts", "SELECT id, file_path FROM issued_receipts"),
+        ("transactions", "SELECT id, attachment_path FROM transactions WHERE attachment_path IS NOT NULL AND attachment_path != ''"),
+    ]
+    databases = _reference_databases()
+    seen = set()
+    for shared in databases:
+        conn = connect_db(shared)
+        cursor = conn.cursor()
+        try:
+            for table, query in queries:
+                cursor.execute(query)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row_id, file_path in rows:
+                        if len(databases) > 1:
+                            if (table, file_path) in seen:
+                                continue
+                            seen.add((table, file_path))
+                        yield table, row_id, file_path
+        finally:
+            conn.close()
+
 # --- Company Settings Functions ---
 def get_company_settings():
     """ Gets company settings """
+    return _cached("company_settings", _load_company_settings)
+
+def _load_company_settings():
     conn = connect_db()
     cursor = conn.cursor()
     cursor.execute("""
@@ -616,6 +1376,7 @@ def update_company_settings(company_name, logo_path, signature_path, address, ph
         """, (company_name, logo_path, signature_path, address, phone, email, tax_id))
 
     conn.commit()
+    invalidate_cache(["company_settings"])
 
     # Log the change
     add_audit_log("UPDATE", "company_settings", 1,
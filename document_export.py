@@ -0,0 +1,166 @@
+# document_export.py
+"""
+Export of the documents of a customer and/or period into one ZIP archive. Every
+attachment and issued receipt is read from the store and written straight into
+the archive in chunks (no temporary copies); manifest.csv in the archive links
+each file to its transaction.
+"""
+import io
+import os
+import re
+import csv
+import queue
+import zipfile
+import hashlib
+import datetime
+import threading
+import database as db
+import storage_backends
+from storage_backends import TransferCancelled
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_HEADERS = ["transaction_id", "transaction_date", "customer", "service", "document",
+                    "receipt_number", "file_name", "archive_path", "size", "sha256", "status"]
+
+# Bytes read from the store per step; progress is reported and cancel is checked between steps
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# Formats that are already compressed are stored as they are, which is much faster
+STORED_TYPES = {".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".rar", ".7z",
+                ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".mp3", ".mp4"}
+
+DOCUMENT_LABELS = {"attachment": "Συνημμένο", "receipt": "Απόδειξη"}
+
+_INVALID_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+def safe_name(name, default="_"):
+    """A file or folder name that is valid on Windows"""
+    name = _INVALID_CHARS.sub("_", str(name or "")).strip().rstrip(".")
+    return name or default
+
+def archive_path(kind, transaction_id, customer, transaction_date, file_name, file_path, receipt_number, used):
+    """
+    <customer>/<date>_#<transaction id>/<file name>; receipts are named by their
+    number. Names already used in the archive get a (2), (3)... suffix.
+    """
+    ext = os.path.splitext(file_path)[1]
+    if kind == "receipt":
+        name = f"{file_name} {receipt_number}{ext}" if receipt_number else os.path.basename(file_path)
+    else:
+        name = file_name or os.path.basename(file_path)
+    folder = f"{safe_name(customer)}/{safe_name(transaction_date, 'χωρίς ημερομηνία')}_#{transaction_id}"
+    stem, ext = os.path.splitext(safe_name(name))
+    path = f"{folder}/{stem}{ext}"
+    counter = 2
+    while path.lower() in used:
+        path = f"{folder}/{stem} ({counter}){ext}"
+        counter += 1
+    used.add(path.lower())
+    return path
+
+def _write_file(archive, source, name, on_bytes, cancelled):
+    """Streams one file into the archive; returns (size, sha256)"""
+    stat = storage_backends.stat(source)
+    if stat is None:
+        raise FileNotFoundError(source)
+    # ZIP cannot store dates before 1980
+    info = zipfile.ZipInfo(name, date_time=max(datetime.datetime.fromtimestamp(stat.mtime).timetuple()[:6],
+                                               (1980, 1, 1, 0, 0, 0)))
+    info.compress_type = zipfile.ZIP_STORED if os.path.splitext(source)[1].lower() in STORED_TYPES else zipfile.ZIP_DEFLATED
+    digest = hashlib.sha256()
+    size = 0
+    with archive.open(info, 'w', force_zip64=stat.size >= zipfile.ZIP64_LIMIT) as dst:
+        for block in storage_backends.stream(source, EXPORT_CHUNK_SIZE):
+            if cancelled is not None and cancelled.is_set():
+                raise TransferCancelled()
+            dst.write(block)
+            digest.update(block)
+            size += len(block)
+            if on_bytes:
+                on_bytes(len(block))
+    return size, digest.hexdigest()
+
+def export_documents(output_path, documents, on_file=None, on_bytes=None, cancelled=None):
+    """
+    Writes the documents (rows of db.iter_transaction_documents) into a ZIP archive at
+    output_path, with manifest.csv. The archive is built under a temporary name and
+    renamed when complete; missing files are listed in the manifest, not fatal.
+    on_file(index, archive_path) before each file, on_bytes(count) as data is written.
+    Returns (exported, missing, bytes).
+    """
+    temp_path = output_path + ".part"
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(MANIFEST_HEADERS)
+    used = {MANIFEST_NAME}
+    exported = missing = total_bytes = 0
+    try:
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            for index, (kind, transaction_id, customer, service, transaction_date,
+                        file_name, file_path, receipt_number) in enumerate(documents):
+                name = archive_path(kind, transaction_id, customer, transaction_date,
+                                    file_name, file_path, receipt_number, used)
+                if on_file:
+                    on_file(index, name)
+                row = [transaction_id, transaction_date, customer, service, DOCUMENT_LABELS[kind],
+                       receipt_number or "", file_name or os.path.basename(file_path)]
+                try:
+                    size, sha256 = _write_file(archive, file_path, name, on_bytes, cancelled)
+                except FileNotFoundError:
+                    missing += 1
+                    writer.writerow(row + ["", "", "", "missing"])
+                    continue
+                exported += 1
+                total_bytes += size
+                writer.writerow(row + [name, size, sha256, "ok"])
+
+            # utf-8-sig so that Excel shows the Greek text correctly
+            archive.writestr(MANIFEST_NAME, manifest.getvalue().encode('utf-8-sig'))
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return exported, missing, total_bytes
+
+class DocumentExporter:
+    """
+    Runs export_documents on a worker thread; `written` counts the bytes archived so far.
+    Events for the UI:
+      ("file", index, total, archive_path)
+      ("finished", (exported, missing, bytes) or None, error or None)
+    """
+
+    def __init__(self, output_path, customer_name=None, date_from=None, date_to=None):
+        self.output_path = output_path
+        self.filters = (customer_name, date_from, date_to)
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.written = 0
+        self.thread = threading.Thread(target=self._run, name="document-export", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Stops the export and removes the partial archive"""
+        self.cancelled.set()
+
+    def _bytes(self, count):
+        self.written += count
+
+    def _run(self):
+        try:
+            # Only the rows are kept in memory, to show the total; the files are streamed
+            documents = list(db.iter_transaction_documents(*self.filters))
+            result = export_documents(
+                self.output_path, documents,
+                on_file=lambda index, name: self.events.put(("file", index, len(documents), name)),
+                on_bytes=self._bytes, cancelled=self.cancelled)
+        except TransferCancelled:
+            self.events.put(("finished", None, "Ακυρώθηκε"))
+        except Exception as e:
+            self.events.put(("finished", None, str(e)))
+        else:
+            self.events.put(("finished", result, None))
@@ -0,0 +1,438 @@
+# importer.py
+"""
+Batch import of transactions and customers from Excel files with resumable checkpoints,
+and bulk ingestion of attachment files from a folder
+"""
+import os
+import re
+import csv
+import time
+import hashlib
+import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import get_column_letter
+import database as db
+import attachment_store
+
+# Rows committed per transaction; also the granularity of resume checkpoints
+IMPORT_CHUNK_SIZE = 500
+
+# Full per-row logs are kept on the local disk, only a bounded part stays in memory
+IMPORT_LOGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_logs")
+IMPORT_LOG_TAIL = 200
+IMPORT_LOG_MAX_ERRORS = 500
+IMPORT_LOG_FILTER_LIMIT = 1000
+
+VALID_STATUSES = ["Εκκρεμεί", "Πληρώθηκε"]
+
+# Parallel copies to the attachments folder (network bound, not CPU bound)
+ATTACHMENT_COPY_WORKERS = 8
+
+# Naming convention for folder ingestion: "<transaction id>_<anything>.<ext>",
+# also "<id>-...", "<id> ...", "<id>.pdf" and an optional "T"/"#" prefix
+ATTACHMENT_NAME_PATTERN = re.compile(r'^(?:T|#)?(\d+)(?:[ _\-.]|$)', re.IGNORECASE)
+
+TRANSACTION_TEMPLATE_HEADERS = [
+    'Ονοματεπώνυμο Πελάτη', 'Υπηρεσία', 'Ημερομηνία (YYYY-MM-DD)',
+    'Τελικό Κόστος (με ΦΠΑ)', 'Κατάσταση', 'Σχόλια'
+]
+
+CUSTOMER_TEMPLATE_HEADERS = [
+    'Ονοματεπώνυμο Πελάτη', 'Email', 'Τηλέφωνο', 'ΑΦΜ', 'Διεύθυνση', 'Εργασία'
+]
+
+def write_template(filepath, headers):
+    """Saves an empty import template with the given header row"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    ws.append(headers)
+
+    # Autofit columns
+    for col_idx, header in enumerate(headers, 1):
+        column_letter = get_column_letter(col_idx)
+        ws.column_dimensions[column_letter].width = len(header) + 5
+
+    wb.save(filepath)
+
+def hash_file(filepath, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def import_log_path(job_id):
+    """Returns the log file path of an import job"""
+    return os.path.join(IMPORT_LOGS_DIR, f"import_{job_id}.log")
+
+class ImportLog:
+    """
+    Streams per-row import messages to a log file on disk and keeps only
+    the last IMPORT_LOG_TAIL lines and the first IMPORT_LOG_MAX_ERRORS errors in memory.
+    The file is opened in append mode, so a resumed job continues the same log.
+    """
+
+    def __init__(self, log_path):
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        self.path = log_path
+        self.tail = deque(maxlen=IMPORT_LOG_TAIL)
+        self.errors = []
+        self.error_count = 0
+        self._file = open(log_path, 'a', encoding='utf-8')
+
+    def write(self, row_idx, ok, message):
+        """Writes one row result"""
+        self.write_item(f"ΓΡΑΜΜΗ {row_idx}", ok, message)
+
+    def write_item(self, label, ok, message):
+        """Writes one result for any item (row, file)"""
+        line = f"{'✅' if ok else '❌'} {label}: {message}"
+        self._file.write(line + "\n")
+        self.tail.append(line)
+        if not ok:
+            self.error_count += 1
+            if len(self.errors) < IMPORT_LOG_MAX_ERRORS:
+                self.errors.append(line)
+
+    def note(self, message):
+        """Writes a free-form line (run start, summary, fatal errors)"""
+        self._file.write(message + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def filter_log(log_path, text="", errors_only=False, limit=IMPORT_LOG_FILTER_LIMIT):
+    """
+    Reads a log file line by line and returns (matching_lines, total_matches).
+    Only the first `limit` matches are returned so huge logs stay cheap to display.
+    """
+    text = text.strip().lower()
+    lines = []
+    total = 0
+    with open(log_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if errors_only and not line.startswith("❌"):
+                continue
+            if text and text not in line.lower():
+                continue
+            total += 1
+            if len(lines) < limit:
+                lines.append(line)
+    return lines, total
+
+def iter_sheet_rows(filepath, start_row=2):
+    """
+    Yields (row_idx, values) from an .xlsx workbook or a .csv file, streaming,
+    starting at start_row (row 1 is the header). CSV files may use ',' or ';'.
+    """
+    if filepath.lower().endswith(".csv"):
+        with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+            sample = f.readline()
+            f.seek(0)
+            delimiter = ';' if sample.count(';') > sample.count(',') else ','
+            for row_idx, values in enumerate(csv.reader(f, delimiter=delimiter), start=1):
+                if row_idx >= start_row:
+                    yield row_idx, values
+        return
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        for row_idx, values in enumerate(ws.iter_rows(min_row=start_row, values_only=True), start=start_row):
+            yield row_idx, values
+    finally:
+        wb.close()
+
+def parse_transaction_row(values, available_services):
+    """
+    Validates one template row and returns
+    (customer_name, service_id, notes, date, cost_pre, cost_final, status).
+    Raises ValueError with a user-facing message for invalid rows.
+    """
+    values = tuple(values) + (None,) * (6 - len(values))
+    customer_name = str(values[0]).strip() if values[0] else None
+    service_name = str(values[1]).strip() if values[1] else None
+    date_val = values[2]
+    final_cost = values[3]
+    status = str(values[4]).strip() if values[4] else None
+    notes = str(values[5]).strip() if values[5] else ""
+
+    # Validation
+    if not all([customer_name, service_name, date_val, final_cost, status]):
+        raise ValueError("Λείπουν υποχρεωτικά δεδομένα")
+
+    # Validate service
+    service_id = available_services.get(service_name.lower())
+    if not service_id:
+        raise ValueError(f"Η υπηρεσία '{service_name}' δεν υπάρχει")
+
+    # Validate date
+    if isinstance(date_val, datetime.datetime):
+        transaction_date = date_val.strftime('%Y-%m-%d')
+    else:
+        transaction_date = str(date_val)
+        datetime.datetime.strptime(transaction_date, '%Y-%m-%d')
+
+    # Validate cost (text cells may use a decimal comma)
+    if isinstance(final_cost, str):
+        final_cost = final_cost.strip().replace(",", ".")
+    cost_final_float = float(final_cost)
+    cost_pre_vat_float = cost_final_float / 1.24
+
+    # Validate status
+    if status not in VALID_STATUSES:
+        raise ValueError(f"Κατάσταση '{status}' μη έγκυρη")
+
+    return (customer_name, service_id, notes, transaction_date,
+            cost_pre_vat_float, cost_final_float, status)
+
+def run_transaction_import(filepath, job_id, start_row=2, on_row=None, on_chunk=None):
+    """
+    Imports transactions from an Excel (or CSV) file starting at start_row.
+    Every IMPORT_CHUNK_SIZE rows are committed together with the job checkpoint,
+    so an interrupted import can resume from the last committed row without duplicates.
+
+    on_row(row_idx, ok, message) is called for every processed row, in row order, once
+    its chunk is committed: a resumed import reports each row of the file once.
+    on_chunk(last_row) is called after every committed chunk.
+    Returns (success_count, fail_count) for the rows processed in this run.
+    """
+    # Create service lookup dictionary
+    available_services = {name.lower(): sid for sid, name in db.get_services()}
+
+    success_count = 0
+    fail_count = 0
+    chunk = []
+    chunk_fails = 0
+    chunk_start = start_row
+    # Results of the rows of the current chunk, reported after its commit
+    chunk_results = []
+
+    def commit_chunk(last_row):
+        db.import_transactions_chunk(job_id, [row for _, row in chunk], last_row, len(chunk), chunk_fails)
+        if on_row:
+            for result in chunk_results:
+                on_row(*result)
+        if on_chunk:
+            on_chunk(last_row)
+
+    row_idx = start_row - 1
+    for row_idx, values in iter_sheet_rows(filepath, start_row):
+        if not any(v not in (None, "") for v in values):
+            continue
+
+        try:
+            row = parse_transaction_row(values, available_services)
+            chunk.append((row_idx, row))
+            chunk_results.append((row_idx, True, f"Επιτυχία - {row[0]}"))
+        except Exception as e:
+            chunk_fails += 1
+            chunk_results.append((row_idx, False, f"Σφάλμα - {str(e)}"))
+
+        if row_idx - chunk_start + 1 >= IMPORT_CHUNK_SIZE:
+            commit_chunk(row_idx)
+            success_count += len(chunk)
+            fail_count += chunk_fails
+            chunk = []
+            chunk_fails = 0
+            chunk_results = []
+            chunk_start = row_idx + 1
+
+    # Final (partial) chunk
+    commit_chunk(row_idx)
+    success_count += len(chunk)
+    fail_count += chunk_fails
+
+    db.set_import_job_status(job_id, "completed")
+    return success_count, fail_count
+
+def parse_customer_row(values):
+    """
+    Validates one customer template row and returns
+    (name, email, phone, tax_id, address, work_info).
+    Raises ValueError with a user-facing message for invalid rows.
+    """
+    values = tuple(values) + (None,) * (6 - len(values))
+    name, email, phone, tax_id, address, work_info = (
+        str(v).strip() if v is not None else "" for v in values[:6]
+    )
+
+    if not name:
+        raise ValueError("Λείπει το ονοματεπώνυμο")
+    if email and "@" not in email:
+        raise ValueError(f"Μη έγκυρο email '{email}'")
+
+    # Excel stores numeric cells as floats (e.g. ΑΦΜ 123456789.0)
+    if isinstance(values[2], float) and values[2].is_integer():
+        phone = str(int(values[2]))
+    if isinstance(values[3], float) and values[3].is_integer():
+        tax_id = str(int(values[3]))
+
+    return (name, email, phone, tax_id, address, work_info)
+
+def run_customer_import(filepath, on_row=None):
+    """
+    Imports customer master data from an Excel (or CSV) file and upserts all valid rows
+    in a single transaction. Returns (created, updated, unchanged, failed).
+    """
+    records = []
+    failed = 0
+
+    for row_idx, values in iter_sheet_rows(filepath):
+        if not any(v not in (None, "") for v in values):
+            continue
+        try:
+            records.append(parse_customer_row(values))
+            if on_row:
+                on_row(row_idx, True, f"Έγκυρη - {records[-1][0]}")
+        except Exception as e:
+            failed += 1
+            if on_row:
+                on_row(row_idx, False, f"Σφάλμα - {str(e)}")
+
+    created, updated, unchanged = db.upsert_customers(records)
+    return created, updated, unchanged, failed
+
+def map_folder_by_name(folder):
+    """
+    Walks a folder and maps files to transactions by ATTACHMENT_NAME_PATTERN.
+    Returns ([(transaction_id, file_path), ...], [unmatched_paths])
+    """
+    mapping = []
+    unmatched = []
+    for dirpath, _dirnames, filenames in os.walk(folder):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            match = ATTACHMENT_NAME_PATTERN.match(filename)
+            if match:
+                mapping.append((int(match.group(1)), path))
+            else:
+                unmatched.append(path)
+    return mapping, unmatched
+
+def map_folder_by_manifest(manifest_path):
+    """
+    Reads a manifest CSV with the columns transaction_id and file
+    (paths relative to the manifest's folder). Both ',' and ';' separators are accepted.
+    Returns ([(transaction_id, file_path), ...], [invalid_lines])
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    mapping = []
+    invalid = []
+    with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.readline()
+        f.seek(0)
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+        reader = csv.DictReader(f, delimiter=delimiter)
+        for line_no, row in enumerate(reader, start=2):
+            try:
+                transaction_id = int(str(row.get('transaction_id', '')).strip().lstrip('#'))
+                file_name = str(row.get('file') or '').strip()
+                if not file_name:
+                    raise ValueError
+            except ValueError:
+                invalid.append(f"Γραμμή {line_no}: {row}")
+                continue
+            mapping.append((transaction_id, os.path.join(base_dir, file_name)))
+    return mapping, invalid
+
+def ingest_attachments(mapping, on_file=None, workers=ATTACHMENT_COPY_WORKERS):
+    """
+    Puts the mapped files into the attachment store in parallel and records all
+    attachments rows in a single transaction. Files whose content is already in the
+    store are only hashed, not copied. on_file(path, ok, message) is called from the
+    calling thread as files finish; a file whose blob turns out to be missing after the
+    commit is reported a second time, as failed, once its row has been removed again.
+    Returns (attached, failed, copied_bytes, elapsed_seconds).
+    """
+    started = time.perf_counter()
+    existing_ids = db.get_existing_transaction_ids(tid for tid, _ in mapping)
+
+    failed = 0
+    jobs = []
+    for transaction_id, source in mapping:
+        if transaction_id not in existing_ids:
+            failed += 1
+            if on_file:
+                on_file(source, False, f"Η συναλλαγή #{transaction_id} δεν υπάρχει")
+            continue
+        if not os.path.isfile(source):
+            failed += 1
+            if on_file:
+                on_file(source, False, "Το αρχείο δεν βρέθηκε")
+            continue
+        jobs.append((transaction_id, source))
+
+    rows = []
+    sources = []
+    new_blobs = []
+    copied_bytes = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(attachment_store.store_file, source): (transaction_id, source)
+                   for transaction_id, source in jobs}
+        for future in as_completed(futures):
+            transaction_id, source = futures[future]
+            try:
+                content_hash, path, size, mtime, copied = future.result()
+            except Exception as e:
+                failed += 1
+                if on_file:
+                    on_file(source, False, f"Σφάλμα αντιγραφής - {str(e)}")
+                continue
+            if copied:
+                copied_bytes += size
+                new_blobs.append((path, content_hash))
+            rows.append((transaction_id, path, os.path.basename(source),
+                         os.path.splitext(source)[1].lower(), content_hash, size, mtime))
+            sources.append(source)
+            if on_file:
+                on_file(source, True, f"Συναλλαγή #{transaction_id}" + ("" if copied else " (υπάρχει ήδη)"))
+
+    attachment_ids = []
+    if rows:
+        try:
+            attachment_ids = db.add_attachments_bulk(rows)
+        except Exception:
+            # Don't leave unreferenced copies behind on the share
+            for path, content_hash in new_blobs:
+                try:
+                    attachment_store.release_blob(path, content_hash)
+                except OSError:
+                    pass
+            raise
+
+    # As in attachment_store.add_file: a blob found in the store may have been released
+    # by another PC before the rows were committed
+    missing = 0
+    for source, attachment_id, (_transaction_id, path, _name, _ext, content_hash, _size, _mtime) \
+            in zip(sources, attachment_ids, rows):
+        try:
+            attachment_store.ensure_stored(source, content_hash, path)
+        except Exception as e:
+            # The row would point at a missing file: it is removed and the file reported failed
+            try:
+                db.delete_attachment(attachment_id)
+            except Exception:
+                if on_file:
+                    on_file(source, False, f"Καταχωρήθηκε, αλλά το αρχείο λείπει από τον χώρο αποθήκευσης - {str(e)}")
+                continue
+            missing += 1
+            if on_file:
+                on_file(source, False, f"Η προσθήκη αναιρέθηκε, σφάλμα αντιγραφής - {str(e)}")
+
+    return len(rows) - missing, failed + missing, copied_bytes, time.perf_counter() - started
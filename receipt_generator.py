@@ -2,63 +2,255 @@
 """
 PDF Receipt Generator for payment and collection receipts with Greek support
 """
+import io
 import os
+import hashlib
+import sys
+import threading
+from collections import namedtuple
 from datetime import datetime
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import cm
+from reportlab.lib.units import cm, inch
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from PIL import Image
-import sys
 
-# Register Greek-compatible fonts
-try:
-    # Try to register DejaVu fonts (common on most systems)
-    pdfmetrics.registerFont(TTFont('DejaVuSans', 'DejaVuSans.ttf'))
-    pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', 'DejaVuSans-Bold.ttf'))
-    pdfmetrics.registerFont(TTFont('DejaVuSans-Oblique', 'DejaVuSans-Oblique.ttf'))
-    FONT_NAME = 'DejaVuSans'
-    FONT_BOLD = 'DejaVuSans-Bold'
-    FONT_OBLIQUE = 'DejaVuSans-Oblique'
-except:
-    # If DejaVu not found, try to find fonts in common locations
-    import platform
-    system = platform.system()
+# Font family chosen for the receipts: names of the registered regular/bold/oblique faces
+FontSet = namedtuple("FontSet", "family regular bold oblique")
+
+# Built-in PDF font (won't show Greek properly but won't crash)
+FALLBACK_FONTS = FontSet("Helvetica", "Helvetica", "Helvetica-Bold", "Helvetica-Oblique")
+
+_fonts = None
+_fonts_lock = threading.Lock()
+
+def _font_candidates():
+    """Greek-compatible font families in order of preference: (family, regular, bold, oblique) files"""
+    candidates = [
+        # DejaVu (found through reportlab's TTF search path, common on most systems)
+        ("DejaVuSans", "DejaVuSans.ttf", "DejaVuSans-Bold.ttf", "DejaVuSans-Oblique.ttf"),
+    ]
+    if sys.platform == "win32":
+        fonts_dir = os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts")
+        candidates.append(("Arial", os.path.join(fonts_dir, "arial.ttf"),
+                           os.path.join(fonts_dir, "arialbd.ttf"), os.path.join(fonts_dir, "ariali.ttf")))
+    elif sys.platform.startswith("linux"):
+        candidates.append(("LiberationSans",
+                           "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+                           "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+                           "/usr/share/fonts/truetype/liberation/LiberationSans-Italic.ttf"))
+        candidates.append(("DejaVuSans",
+                           "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+                           "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+                           "/usr/share/fonts/truetype/dejavu/DejaVuSans-Oblique.ttf"))
+    return candidates
+
+def _register_family(family, regular, bold, oblique):
+    """Registers the three faces of a family; returns its FontSet or None if any file is missing"""
+    names = (family, f"{family}-Bold", f"{family}-Oblique")
+    registered = set(pdfmetrics.getRegisteredFontNames())
+    if all(name in registered for name in names):
+        return FontSet(family, *names)
+
+    for path in (regular, bold, oblique):
+        if os.path.isabs(path) and not os.path.exists(path):
+            return None
+    try:
+        fonts = [TTFont(name, path) for name, path in zip(names, (regular, bold, oblique))]
+    except Exception:
+        # Not found on the search path or not a usable TrueType file
+        return None
+    for font in fonts:
+        pdfmetrics.registerFont(font)
+    return FontSet(family, *names)
+
+def get_fonts():
+    """
+    Returns the FontSet used for receipts. The first available Greek-compatible family
+    is resolved and registered once per process; the parsed TTF faces stay registered
+    in reportlab, so every later receipt reuses them instead of re-reading the files.
+    """
+    global _fonts
+    if _fonts is None:
+        with _fonts_lock:
+            if _fonts is None:
+                for candidate in _font_candidates():
+                    fonts = _register_family(*candidate)
+                    if fonts:
+                        _fonts = fonts
+                        break
+                else:
+                    _fonts = FALLBACK_FONTS
+    return _fonts
+
+def get_font_family():
+    """Name of the font family actually used for receipts (e.g. 'DejaVuSans', 'Arial', 'Helvetica')"""
+    return get_fonts().family
+
+# Logos and signatures larger than their printed box at this resolution are downscaled once
+IMAGE_DPI = 300
+IMAGE_CACHE_SIZE = 8
+
+_image_cache = {}
+_image_cache_lock = threading.Lock()
+
+def _prepare_image(path, max_width, max_height):
+    """Reads and decodes an image once, downscaling it to the printed size at IMAGE_DPI"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    img = Image.open(io.BytesIO(data))
+    max_px = (max(1, int(max_width / inch * IMAGE_DPI)), max(1, int(max_height / inch * IMAGE_DPI)))
+
+    if img.width <= max_px[0] and img.height <= max_px[1]:
+        # Small enough: embed the original bytes (JPEGs are passed through unchanged)
+        return ImageReader(io.BytesIO(data)), img.width, img.height
+
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    img.thumbnail(max_px, Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if has_alpha:
+        img.save(buffer, "PNG", optimize=True)
+    else:
+        img.save(buffer, "JPEG", quality=90)
+    buffer.seek(0)
+    return ImageReader(buffer), img.width, img.height
+
+def get_image(path, max_width, max_height):
+    """
+    Returns (ImageReader, width_px, height_px) for a logo or signature drawn in a
+    max_width x max_height box (points), or None if the file is missing or unreadable.
+    Prepared images are cached by path and modification time, so a file on the
+    network share is read and decoded once until it changes.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, round(max_width), round(max_height))
+    with _image_cache_lock:
+        cached = _image_cache.get(key)
+    if cached:
+        return cached
 
     try:
-        if system == 'Windows':
-            # Try Arial Unicode MS or other Windows fonts that support Greek
-            pdfmetrics.registerFont(TTFont('Arial', 'C:\\Windows\\Fonts\\arial.ttf'))
-            pdfmetrics.registerFont(TTFont('Arial-Bold', 'C:\\Windows\\Fonts\\arialbd.ttf'))
-            pdfmetrics.registerFont(TTFont('Arial-Oblique', 'C:\\Windows\\Fonts\\ariali.ttf'))
-            FONT_NAME = 'Arial'
-            FONT_BOLD = 'Arial-Bold'
-            FONT_OBLIQUE = 'Arial-Oblique'
-        elif system == 'Linux':
-            # Try Liberation Sans on Linux
-            pdfmetrics.registerFont(TTFont('LiberationSans', '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf'))
-            pdfmetrics.registerFont(TTFont('LiberationSans-Bold', '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf'))
-            pdfmetrics.registerFont(TTFont('LiberationSans-Oblique', '/usr/share/fonts/truetype/liberation/LiberationSans-Italic.ttf'))
-            FONT_NAME = 'LiberationSans'
-            FONT_BOLD = 'LiberationSans-Bold'
-            FONT_OBLIQUE = 'LiberationSans-Oblique'
-        else:
-            # MacOS or fallback
-            FONT_NAME = 'Helvetica'
-            FONT_BOLD = 'Helvetica-Bold'
-            FONT_OBLIQUE = 'Helvetica-Oblique'
-    except:
-        # Final fallback to Helvetica (won't show Greek properly but won't crash)
-        FONT_NAME = 'Helvetica'
-        FONT_BOLD = 'Helvetica-Bold'
-        FONT_OBLIQUE = 'Helvetica-Oblique'
+        prepared = _prepare_image(path, max_width, max_height)
+    except Exception:
+        return None
+
+    with _image_cache_lock:
+        if len(_image_cache) >= IMAGE_CACHE_SIZE:
+            _image_cache.pop(next(iter(_image_cache)))
+        _image_cache[key] = prepared
+    return prepared
+
+# Widths of words already measured, per (font name, size)
+WORD_WIDTH_CACHE_SIZE = 10000
+_word_widths = {}
+
+def word_width(word, font_name, font_size):
+    """Width of a word in points, measured once per font and size"""
+    widths = _word_widths.get((font_name, font_size))
+    if widths is None:
+        widths = _word_widths[(font_name, font_size)] = {}
+    width = widths.get(word)
+    if width is None:
+        if len(widths) >= WORD_WIDTH_CACHE_SIZE:
+            widths.clear()
+        width = widths[word] = pdfmetrics.stringWidth(word, font_name, font_size)
+    return width
+
+def _split_long_word(word, max_width, font_name, font_size):
+    """Breaks a word wider than max_width into pieces that fit"""
+    pieces = []
+    piece, piece_width = "", 0.0
+    for char in word:
+        char_width = word_width(char, font_name, font_size)
+        if piece and piece_width + char_width > max_width:
+            pieces.append(piece)
+            piece, piece_width = "", 0.0
+        piece += char
+        piece_width += char_width
+    pieces.append(piece)
+    return pieces
+
+def wrap_text(text, max_width, font_name, font_size):
+    """
+    Wraps text into lines no wider than max_width. Each word is measured once
+    (see word_width) and line widths are summed incrementally. Line breaks in
+    the text are kept; words wider than a line are broken.
+    """
+    space = word_width(" ", font_name, font_size)
+    lines = []
+    for paragraph in str(text).strip().splitlines() or [""]:
+        line, line_width = [], 0.0
+        for word in paragraph.split():
+            width = word_width(word, font_name, font_size)
+            if width > max_width:
+                if line:
+                    lines.append(" ".join(line))
+                pieces = _split_long_word(word, max_width, font_name, font_size)
+                lines.extend(pieces[:-1])
+                word = pieces[-1]
+                line, line_width = [word], word_width(word, font_name, font_size)
+            elif line and line_width + space + width > max_width:
+                lines.append(" ".join(line))
+                line, line_width = [word], width
+            elif line:
+                line.append(word)
+                line_width += space + width
+            else:
+                line, line_width = [word], width
+        lines.append(" ".join(line))
+    return lines
+
+# Lowest baseline for receipt text; the signature block is below it
+TEXT_BOTTOM_Y = 7.8*cm
+
+# Texts that differ between the two receipt types
+RECEIPT_LAYOUTS = {
+    "payment": {
+        "title": "PAYMENT RECEIPT",
+        "customer_label": "Customer Details:",
+        "service_label": "Service Description:",
+        "amount_label": "Payment Amount:",
+        "footer": "Thank you for your business!",
+    },
+    "collection": {
+        "title": "COLLECTION RECEIPT",
+        "customer_label": "Collected from:",
+        "service_label": "Description:",
+        "amount_label": "Collection Amount:",
+        "footer": "Thank you for your cooperation!",
+    },
+}
+
+# Statement table: (heading, x, alignment) per column, in points
+STATEMENT_COLUMNS = [
+    ("Date", 2*cm, "left"),
+    ("No", 4*cm, "left"),
+    ("Service", 5.6*cm, "left"),
+    ("Status", 12.4*cm, "left"),
+    ("Amount", 16*cm, "right"),
+    ("Running Total", A4[0] - 2*cm, "right"),
+]
+STATEMENT_HEADER_Y = 9.6*cm  # distance of the column headings from the top of the page
+STATEMENT_ROW_HEIGHT = 0.55*cm
+STATEMENT_BOTTOM_Y = 3*cm
+
+class _StaticForms:
+    """The static-layer forms defined in one document, and the settings version they are named after"""
+
+    def __init__(self, version):
+        self.version = version
+        self.defined = set()
 
 class ReceiptGenerator:
-    def __init__(self, company_name="", company_address="", company_phone="", company_email="", company_tax_id="", logo_path=None, signature_path=None):
+    def __init__(self, company_name="", company_address="", company_phone="", company_email="", company_tax_id="", logo_path=None, signature_path=None, use_template=True):
         self.company_name = company_name
         self.company_address = company_address
         self.company_phone = company_phone
@@ -66,25 +258,14 @@ class ReceiptGenerator:
         self.company_tax_id = company_tax_id
         self.logo_path = logo_path
         self.signature_path = signature_path
+        # Template mode: the static layer is a form XObject stamped on every page
+        self.use_template = use_template
 
-        # Try to register Greek-compatible fonts
-        self.greek_font = "Helvetica"
-        self.greek_font_bold = "Helvetica-Bold"
-
-        try:
-            # Try to find and register Arial font (supports Greek)
-            if sys.platform == "win32":
-                font_path = "C:\\Windows\\Fonts\\arial.ttf"
-                font_bold_path = "C:\\Windows\\Fonts\\arialbd.ttf"
-                if os.path.exists(font_path):
-                    pdfmetrics.registerFont(TTFont('ArialUnicode', font_path))
-                    self.greek_font = 'ArialUnicode'
-                if os.path.exists(font_bold_path):
-                    pdfmetrics.registerFont(TTFont('ArialUnicodeBold', font_bold_path))
-                    self.greek_font_bold = 'ArialUnicodeBold'
-        except:
-            # Fallback to Helvetica
-            pass
+        # Greek-compatible fonts, registered once per process
+        self.fonts = get_fonts()
+        self.font_family = self.fonts.family
+        self.greek_font = self.fonts.regular
+        self.greek_font_bold = self.fonts.bold
 
     def _format_date(self, date_str):
         """Convert date from YYYY-MM-DD to DD/MM/YY format"""
@@ -98,16 +279,24 @@ class ReceiptGenerator:
         except:
             return date_str
 
-    def generate_payment_receipt(self, output_path, receipt_number, customer_name, amount, service_description, payment_date=None, notes="", custom_notes=""):
+    def settings_version(self):
         """
-        Generates a payment receipt (Απόδειξη Πληρωμής)
+        Short hash of everything drawn in the static layer: company fields and the
+        logo/signature files (path, modification time, size). Changes whenever the
+        company settings or the images change.
         """
-        if payment_date is None:
-            payment_date = datetime.now().strftime("%d/%m/%y")
-        else:
-            payment_date = self._format_date(payment_date)
-
-        c = canvas.Canvas(output_path, pagesize=A4)
+        parts = [self.company_name, self.company_address, self.company_phone,
+                 self.company_email, self.company_tax_id, self.fonts.family]
+        for path in (self.logo_path, self.signature_path):
+            try:
+                stat = os.stat(path) if path else None
+            except OSError:
+                stat = None
+            parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}" if stat else str(path))
+        return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:12]
+
+    def _draw_company_header(self, c):
+        """Draws the logo and the company details at the top of the page"""
         width, height = A4
 
         # Header section with logo and company info side by side
@@ -117,25 +306,25 @@ class ReceiptGenerator:
         logo_x = 2*cm
         company_info_x = 7*cm  # Company info starts here
 
-        if self.logo_path and os.path.exists(self.logo_path):
+        logo = get_image(self.logo_path, 4*cm, 3*cm) if self.logo_path else None
+        if logo:
             try:
-                img = Image.open(self.logo_path)
-                img_width, img_height = img.size
+                logo_image, img_width, img_height = logo
                 aspect = img_height / float(img_width)
                 logo_width = 4*cm
                 logo_height = logo_width * aspect
                 if logo_height > 3*cm:
                     logo_height = 3*cm
                     logo_width = logo_height / aspect
-                c.drawImage(self.logo_path, logo_x, y_pos - logo_height, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
+                c.drawImage(logo_image, logo_x, y_pos - logo_height, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
             except:
                 pass
 
         # Company Header (to the right of logo)
-        c.setFont(FONT_BOLD, 16)
+        c.setFont(self.greek_font_bold, 16)
         c.drawString(company_info_x, height - 2.5*cm, self.company_name if self.company_name else "Επωνυμία Εταιρείας")
 
-        c.setFont(FONT_NAME, 10)
+        c.setFont(self.greek_font, 10)
         y = height - 3.2*cm
         if self.company_address:
             c.drawString(company_info_x, y, f"Διεύθυνση: {self.company_address}")
@@ -149,233 +338,308 @@ class ReceiptGenerator:
         if self.company_tax_id:
             c.drawString(company_info_x, y, f"ΑΦΜ: {self.company_tax_id}")
 
+    def _draw_static(self, c, receipt_type, continued=False):
+        """
+        Draws the parts of a receipt that are identical on every receipt of this type.
+        Continuation pages of a long receipt have no section labels.
+        """
+        if receipt_type == "statement":
+            self._draw_statement_static(c)
+            return
+
+        layout = RECEIPT_LAYOUTS[receipt_type]
+        width, height = A4
+
+        self._draw_company_header(c)
+
         # Receipt Title
         c.setFont(self.greek_font_bold, 20)
-        c.drawCentredString(width/2, height - 7*cm, "PAYMENT RECEIPT")
-
-        # Receipt Number and Date
-        c.setFont(self.greek_font, 11)
-        c.drawString(2*cm, height - 8.5*cm, f"Receipt No: {receipt_number}")
-        c.drawRightString(width - 2*cm, height - 8.5*cm, f"Date: {payment_date}")
+        c.drawCentredString(width/2, height - 7*cm, layout["title"])
 
         # Draw line
         c.line(2*cm, height - 9*cm, width - 2*cm, height - 9*cm)
 
-        # Customer Information
-        y = height - 10*cm
-        c.setFont(self.greek_font_bold, 12)
-        c.drawString(2*cm, y, "Customer Details:")
-        y -= 0.7*cm
-        c.setFont(self.greek_font, 11)
-        c.drawString(2*cm, y, f"Name: {customer_name}")
-
-        # Service and Amount
-        y -= 1.5*cm
-        c.setFont(self.greek_font_bold, 12)
-        c.drawString(2*cm, y, "Service Description:")
-        y -= 0.7*cm
-        c.setFont(self.greek_font, 11)
-
-        # Wrap service description if too long
-        max_width = width - 4*cm
-        lines = self._wrap_text(service_description, max_width, c, self.greek_font, 11)
-        for line in lines:
-            c.drawString(2*cm, y, line)
-            y -= 0.5*cm
-
-        # Amount Box
-        y -= 1*cm
-        c.setFont(self.greek_font_bold, 14)
-        c.drawString(2*cm, y, "Payment Amount:")
-        c.drawRightString(width - 2*cm, y, f"{amount:.2f} EUR")
-
-        # Transaction Notes (from database)
-        if notes:
-            y -= 1.5*cm
-            c.setFont(self.greek_font_bold, 11)
-            c.drawString(2*cm, y, "Transaction Notes:")
-            y -= 0.6*cm
-            c.setFont(self.greek_font, 10)
-            notes_lines = self._wrap_text(notes, max_width, c, self.greek_font, 10)
-            for line in notes_lines:
-                c.drawString(2*cm, y, line)
-                y -= 0.5*cm
+        # Section labels
+        if not continued:
+            c.setFont(self.greek_font_bold, 12)
+            c.drawString(2*cm, height - 10*cm, layout["customer_label"])
+            c.drawString(2*cm, height - 12.2*cm, layout["service_label"])
 
         # Dual Signature Section
         sig_y = 5*cm
 
         # Left signature (Engineer/Company)
-        if self.signature_path and os.path.exists(self.signature_path):
+        signature = get_image(self.signature_path, 4*cm, 2*cm) if self.signature_path else None
+        if signature:
             try:
-                c.drawImage(self.signature_path, 2*cm, sig_y, width=4*cm, height=2*cm, preserveAspectRatio=True, mask='auto')
+                c.drawImage(signature[0], 2*cm, sig_y, width=4*cm, height=2*cm, preserveAspectRatio=True, mask='auto')
             except:
                 pass
         else:
             # Signature line for company
             c.line(2*cm, sig_y, 6*cm, sig_y)
 
-        c.setFont(FONT_NAME, 9)
+        c.setFont(self.greek_font, 9)
         c.drawCentredString(4*cm, sig_y - 0.5*cm, "Υπογραφή / Σφραγίδα Μηχανικού")
 
         # Right signature (Client)
         c.line(width - 8*cm, sig_y, width - 4*cm, sig_y)
-        c.setFont(FONT_NAME, 9)
+        c.setFont(self.greek_font, 9)
         c.drawCentredString(width - 6*cm, sig_y - 0.5*cm, "Υπογραφή / Σφραγίδα Πελάτη")
 
         # Footer
         c.setFont(self.greek_font, 8)
-        c.drawCentredString(width/2, 1.5*cm, "Thank you for your business!")
+        c.drawCentredString(width/2, 1.5*cm, layout["footer"])
 
-        c.save()
-        return output_path
+    def _new_forms(self):
+        """Form bookkeeping for a new document; the settings version is computed once per document"""
+        return _StaticForms(self.settings_version() if self.use_template else None)
 
-    def generate_collection_receipt(self, output_path, receipt_number, customer_name, amount, service_description, collection_date=None, notes="", custom_notes=""):
+    def _stamp_static(self, c, forms, receipt_type, continued=False):
         """
-        Generates a collection receipt (Απόδειξη Είσπραξης)
+        Places the static layer on the current page. In template mode it is recorded
+        once per document (forms) as a form XObject named after the settings version
+        and every page references it; otherwise it is drawn directly.
         """
-        if collection_date is None:
-            collection_date = datetime.now().strftime("%d/%m/%y")
-        else:
-            collection_date = self._format_date(collection_date)
-
-        c = canvas.Canvas(output_path, pagesize=A4)
+        if not self.use_template:
+            self._draw_static(c, receipt_type, continued)
+            return
+
+        form_name = f"receipt_{receipt_type}{'_cont' if continued else ''}_{forms.version}"
+        if form_name not in forms.defined:
+            c.beginForm(form_name)
+            self._draw_static(c, receipt_type, continued)
+            c.endForm()
+            forms.defined.add(form_name)
+        c.doForm(form_name)
+
+    def _draw_receipt(self, c, forms, receipt_type, receipt_number, customer_name, amount, service_description, date, notes="", custom_notes=""):
+        """
+        Draws one receipt: the static layer plus the fields of this receipt. Text that
+        does not fit above the signature block continues on a new page.
+        """
+        layout = RECEIPT_LAYOUTS[receipt_type]
         width, height = A4
+        max_width = width - 4*cm
 
-        # Header section with logo and company info side by side
-        y_pos = height - 2*cm
-
-        # Logo on the left (if provided)
-        logo_x = 2*cm
-        company_info_x = 7*cm  # Company info starts here
-
-        if self.logo_path and os.path.exists(self.logo_path):
-            try:
-                img = Image.open(self.logo_path)
-                img_width, img_height = img.size
-                aspect = img_height / float(img_width)
-                logo_width = 4*cm
-                logo_height = logo_width * aspect
-                if logo_height > 3*cm:
-                    logo_height = 3*cm
-                    logo_width = logo_height / aspect
-                c.drawImage(self.logo_path, logo_x, y_pos - logo_height, width=logo_width, height=logo_height, preserveAspectRatio=True, mask='auto')
-            except:
-                pass
-
-        # Company Header (to the right of logo)
-        c.setFont(FONT_BOLD, 16)
-        c.drawString(company_info_x, height - 2.5*cm, self.company_name if self.company_name else "Επωνυμία Εταιρείας")
-
-        c.setFont(self.greek_font, 10)
-        y = height - 3.2*cm
-        if self.company_address:
-            c.drawString(company_info_x, y, f"Διεύθυνση: {self.company_address}")
-            y -= 0.5*cm
-        if self.company_phone:
-            c.drawString(company_info_x, y, f"Τηλ: {self.company_phone}")
-            y -= 0.5*cm
-        if self.company_email:
-            c.drawString(company_info_x, y, f"Email: {self.company_email}")
-            y -= 0.5*cm
-        if self.company_tax_id:
-            c.drawString(company_info_x, y, f"ΑΦΜ: {self.company_tax_id}")
-
-        # Receipt Title
-        c.setFont(self.greek_font_bold, 20)
-        c.drawCentredString(width/2, height - 7*cm, "COLLECTION RECEIPT")
+        self._stamp_static(c, forms, receipt_type)
 
         # Receipt Number and Date
         c.setFont(self.greek_font, 11)
         c.drawString(2*cm, height - 8.5*cm, f"Receipt No: {receipt_number}")
-        c.drawRightString(width - 2*cm, height - 8.5*cm, f"Date: {collection_date}")
-
-        # Draw line
-        c.line(2*cm, height - 9*cm, width - 2*cm, height - 9*cm)
+        c.drawRightString(width - 2*cm, height - 8.5*cm, f"Date: {date}")
 
         # Customer Information
-        y = height - 10*cm
-        c.setFont(self.greek_font_bold, 12)
-        c.drawString(2*cm, y, "Collected from:")
-        y -= 0.7*cm
         c.setFont(self.greek_font, 11)
-        c.drawString(2*cm, y, f"Name: {customer_name}")
+        c.drawString(2*cm, height - 10.7*cm, f"Name: {customer_name}")
+
+        def new_page():
+            c.showPage()
+            self._stamp_static(c, forms, receipt_type, continued=True)
+            c.setFont(self.greek_font, 11)
+            c.drawString(2*cm, height - 8.5*cm, f"Receipt No: {receipt_number} (συνέχεια)")
+            c.drawRightString(width - 2*cm, height - 8.5*cm, f"Date: {date}")
+            return height - 10*cm
+
+        def draw_lines(y, lines, font_name, font_size, leading):
+            for line in lines:
+                if y < TEXT_BOTTOM_Y:
+                    y = new_page()
+                c.setFont(font_name, font_size)
+                c.drawString(2*cm, y, line)
+                y -= leading
+            return y
 
-        # Service and Amount
-        y -= 1.5*cm
-        c.setFont(self.greek_font_bold, 12)
-        c.drawString(2*cm, y, "Description:")
-        y -= 0.7*cm
-        c.setFont(self.greek_font, 11)
+        def draw_section(y, title, text):
+            # Keep the title together with the first lines of its text
+            y -= 1.5*cm
+            if y - 1.1*cm < TEXT_BOTTOM_Y:
+                y = new_page()
+            c.setFont(self.greek_font_bold, 11)
+            c.drawString(2*cm, y, title)
+            return draw_lines(y - 0.6*cm, wrap_text(text, max_width, self.greek_font, 10), self.greek_font, 10, 0.5*cm)
 
-        # Wrap service description if too long
-        max_width = width - 4*cm
-        lines = self._wrap_text(service_description, max_width, c, self.greek_font, 11)
-        for line in lines:
-            c.drawString(2*cm, y, line)
-            y -= 0.5*cm
+        # Service description (wrapped)
+        y = draw_lines(height - 12.9*cm, wrap_text(service_description, max_width, self.greek_font, 11),
+                       self.greek_font, 11, 0.5*cm)
 
         # Amount Box
         y -= 1*cm
+        if y < TEXT_BOTTOM_Y:
+            y = new_page()
         c.setFont(self.greek_font_bold, 14)
-        c.drawString(2*cm, y, "Collection Amount:")
+        c.drawString(2*cm, y, layout["amount_label"])
         c.drawRightString(width - 2*cm, y, f"{amount:.2f} EUR")
 
         # Transaction Notes (from database)
         if notes:
-            y -= 1.5*cm
-            c.setFont(self.greek_font_bold, 11)
-            c.drawString(2*cm, y, "Transaction Notes:")
-            y -= 0.6*cm
-            c.setFont(self.greek_font, 10)
-            notes_lines = self._wrap_text(notes, max_width, c, self.greek_font, 10)
-            for line in notes_lines:
-                c.drawString(2*cm, y, line)
-                y -= 0.5*cm
+            y = draw_section(y, "Transaction Notes:", notes)
 
-        # Dual Signature Section
-        sig_y = 5*cm
+        # Comments entered when issuing the receipt
+        if custom_notes:
+            y = draw_section(y, "Receipt Comments:", custom_notes)
 
-        # Left signature (Engineer/Company)
-        if self.signature_path and os.path.exists(self.signature_path):
-            try:
-                c.drawImage(self.signature_path, 2*cm, sig_y, width=4*cm, height=2*cm, preserveAspectRatio=True, mask='auto')
-            except:
-                pass
-        else:
-            # Signature line for company
-            c.line(2*cm, sig_y, 6*cm, sig_y)
+    def _receipt_date(self, date):
+        if date is None:
+            return datetime.now().strftime("%d/%m/%y")
+        return self._format_date(date)
 
-        c.setFont(FONT_NAME, 9)
-        c.drawCentredString(4*cm, sig_y - 0.5*cm, "Υπογραφή / Σφραγίδα Μηχανικού")
+    def generate_payment_receipt(self, output_path, receipt_number, customer_name, amount, service_description, payment_date=None, notes="", custom_notes=""):
+        """
+        Generates a payment receipt (Απόδειξη Πληρωμής)
+        """
+        c = canvas.Canvas(output_path, pagesize=A4)
+        self._draw_receipt(c, self._new_forms(), "payment", receipt_number, customer_name, amount, service_description,
+                           self._receipt_date(payment_date), notes, custom_notes)
+        c.save()
+        return output_path
 
-        # Right signature (Client)
-        c.line(width - 8*cm, sig_y, width - 4*cm, sig_y)
-        c.setFont(FONT_NAME, 9)
-        c.drawCentredString(width - 6*cm, sig_y - 0.5*cm, "Υπογραφή / Σφραγίδα Πελάτη")
+    def generate_collection_receipt(self, output_path, receipt_number, customer_name, amount, service_description, collection_date=None, notes="", custom_notes=""):
+        """
+        Generates a collection receipt (Απόδειξη Είσπραξης)
+        """
+        c = canvas.Canvas(output_path, pagesize=A4)
+        self._draw_receipt(c, self._new_forms(), "collection", receipt_number, customer_name, amount, service_description,
+                           self._receipt_date(collection_date), notes, custom_notes)
+        c.save()
+        return output_path
 
-        # Footer
-        c.setFont(self.greek_font, 8)
-        c.drawCentredString(width/2, 1.5*cm, "Thank you for your cooperation!")
+    def generate_receipts(self, output_path, receipt_type, receipts):
+        """
+        Generates one multi-page PDF with a page per receipt. In template mode the
+        static layer (logo, company details, signature) is stored once in the file.
 
+        receipt_type: "payment" or "collection"
+        receipts: iterable of (receipt_number, customer_name, amount, service_description, date, notes)
+        Returns the number of pages written.
+        """
+        c = canvas.Canvas(output_path, pagesize=A4, pageCompression=1)
+        forms = self._new_forms()
+        pages = 0
+        for receipt_number, customer_name, amount, service_description, date, notes in receipts:
+            self._draw_receipt(c, forms, receipt_type, receipt_number, customer_name, amount, service_description,
+                               self._receipt_date(date), notes or "")
+            c.showPage()
+            pages += 1
         c.save()
-        return output_path
+        return pages
 
-    def _wrap_text(self, text, max_width, canvas_obj, font_name, font_size):
-        """Helper function to wrap text to fit within max_width"""
-        words = text.split()
-        lines = []
-        current_line = []
+    def _draw_statement_static(self, c):
+        """Draws the parts of a statement page that repeat on every page"""
+        width, height = A4
+
+        self._draw_company_header(c)
 
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            if canvas_obj.stringWidth(test_line, font_name, font_size) <= max_width:
-                current_line.append(word)
+        c.setFont(self.greek_font_bold, 20)
+        c.drawCentredString(width/2, height - 7*cm, "ACCOUNT STATEMENT")
+
+        # Column headings
+        c.setFont(self.greek_font_bold, 10)
+        y = height - STATEMENT_HEADER_Y
+        for title, x, align in STATEMENT_COLUMNS:
+            if align == "right":
+                c.drawRightString(x, y, title)
             else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                current_line = [word]
+                c.drawString(x, y, title)
+        c.line(2*cm, y - 0.25*cm, width - 2*cm, y - 0.25*cm)
+
+        c.setFont(self.greek_font, 8)
+        c.drawCentredString(width/2, 1.5*cm, "Thank you for your business!")
+
+    def _fit_text(self, c, text, max_width, font_name, font_size):
+        """Shortens text with an ellipsis so that it fits in max_width"""
+        if c.stringWidth(text, font_name, font_size) <= max_width:
+            return text
+        while text and c.stringWidth(text + "…", font_name, font_size) > max_width:
+            text = text[:-1]
+        return text + "…"
+
+    def _start_statement_page(self, c, forms, customer_name, period, page):
+        """Stamps the static layer and the page's customer/period line; returns the first row y"""
+        width, height = A4
+        self._stamp_static(c, forms, "statement")
+
+        c.setFont(self.greek_font, 11)
+        c.drawString(2*cm, height - 8.5*cm, f"Customer: {customer_name}")
+        if period:
+            c.drawRightString(width - 2*cm, height - 8.5*cm, f"Period: {period}")
+
+        c.setFont(self.greek_font, 8)
+        c.drawRightString(width - 2*cm, 1.5*cm, f"Page {page}")
+        return height - STATEMENT_HEADER_Y - 0.8*cm
+
+    def generate_statement(self, output_path, customer_name, transactions, mode="table", receipt_type="payment", period=""):
+        """
+        Generates one PDF for many transactions of a customer, streaming the rows.
+
+        transactions: iterable of (id, service, notes, date, amount, status), e.g. the
+                      generator returned by database.iter_customer_transactions
+        mode: "table" for a tabular statement with running totals,
+              "receipts" for one receipt per page (receipt_type "payment" or "collection")
+        period: optional text printed on every statement page
+        Returns (transaction_count, total_amount).
+        """
+        totals = {"count": 0, "amount": 0.0}
 
-        if current_line:
-            lines.append(' '.join(current_line))
+        if mode == "receipts":
+            def receipts():
+                for trans_id, service, notes, date, amount, _status in transactions:
+                    totals["count"] += 1
+                    totals["amount"] += amount or 0.0
+                    yield f"#{trans_id}", customer_name, amount or 0.0, service, date, notes
+            self.generate_receipts(output_path, receipt_type, receipts())
+            return totals["count"], totals["amount"]
 
-        return lines if lines else [text]
+        width, height = A4
+        c = canvas.Canvas(output_path, pagesize=A4, pageCompression=1)
+        forms = self._new_forms()
+        page = 1
+        y = self._start_statement_page(c, forms, customer_name, period, page)
+        paid = 0.0
+        date_x, id_x, service_x, status_x, amount_x, total_x = (x for _, x, _ in STATEMENT_COLUMNS)
+        service_width = status_x - service_x - 0.3*cm
+
+        for trans_id, service, _notes, date, amount, status in transactions:
+            if y < STATEMENT_BOTTOM_Y:
+                c.setFont(self.greek_font_bold, 10)
+                c.drawRightString(width - 2*cm, y, f"Carried forward: {totals['amount']:.2f} EUR")
+                c.showPage()
+                page += 1
+                y = self._start_statement_page(c, forms, customer_name, period, page)
+                c.setFont(self.greek_font_bold, 10)
+                c.drawRightString(width - 2*cm, y, f"Brought forward: {totals['amount']:.2f} EUR")
+                y -= STATEMENT_ROW_HEIGHT
+
+            amount = amount or 0.0
+            totals["count"] += 1
+            totals["amount"] += amount
+            if status == 'Πληρώθηκε':
+                paid += amount
+
+            c.setFont(self.greek_font, 9)
+            c.drawString(date_x, y, self._format_date(date or ""))
+            c.drawString(id_x, y, f"#{trans_id}")
+            c.drawString(service_x, y, self._fit_text(c, service or "", service_width, self.greek_font, 9))
+            c.drawString(status_x, y, status or "")
+            c.drawRightString(amount_x, y, f"{amount:.2f}")
+            c.drawRightString(total_x, y, f"{totals['amount']:.2f}")
+            y -= STATEMENT_ROW_HEIGHT
+
+        # Totals block
+        if y < STATEMENT_BOTTOM_Y + 2*cm:
+            c.showPage()
+            page += 1
+            y = self._start_statement_page(c, forms, customer_name, period, page)
+        c.line(2*cm, y + 0.3*cm, width - 2*cm, y + 0.3*cm)
+        y -= 0.3*cm
+        c.setFont(self.greek_font_bold, 11)
+        for label, value in (("Total:", totals["amount"]), ("Paid:", paid), ("Outstanding:", totals["amount"] - paid)):
+            c.drawString(11*cm, y, label)
+            c.drawRightString(width - 2*cm, y, f"{value:.2f} EUR")
+            y -= 0.6*cm
+        c.setFont(self.greek_font, 9)
+        c.drawString(2*cm, y + 0.6*cm, f"Transactions: {totals['count']}")
+
+        c.showPage()
+        c.save()
+        return totals["count"], totals["amount"]
@@ -0,0 +1,179 @@
+# receipt_queue.py
+"""
+Durable background queue for issued receipts. A rendered receipt is first spooled
+to the local disk; a worker thread then writes it into the attachment store and
+records it in the database, retrying while the share or storage is unreachable.
+Receipts still spooled when the app closes are sent on the next start.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import datetime
+import threading
+import database as db
+import attachment_store
+import storage_backends
+
+# Receipts waiting for the share are kept on the local disk, next to the application
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "receipt_spool")
+
+# Seconds between attempts while the share is unreachable (doubles up to the maximum)
+RETRY_INTERVAL = 5
+RETRY_INTERVAL_MAX = 300
+
+# Errors that mean the share or the database is not reachable right now
+SHARE_ERRORS = (OSError, sqlite3.OperationalError)
+
+_worker = None
+_lock = threading.Lock()
+_wake = threading.Event()
+
+# (file_name, error message) of receipts that could not be recorded, until taken by the UI
+_failures = []
+# Last error while the share was unreachable, None once a write succeeds
+_share_error = None
+
+def _write_file(path, data):
+    """Writes data next to its final name and renames it, so no reader sees half a file"""
+    temp_path = path + ".part"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def _spooled():
+    """Spool entries in the order they were queued"""
+    try:
+        names = os.listdir(SPOOL_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(name[:-5] for name in names if name.endswith(".json"))
+
+def _deliver(entry):
+    """Writes one spooled receipt to the store and records it"""
+    with open(os.path.join(SPOOL_DIR, entry + ".json"), encoding='utf-8') as f:
+        job = json.load(f)
+    with open(os.path.join(SPOOL_DIR, entry + ".pdf"), 'rb') as f:
+        data = f.read()
+
+    # Dated by the spool entry (not the attempt), so every retry writes the same file
+    queued = datetime.datetime.strptime(entry[:14], '%Y%m%d%H%M%S')
+    # A previous attempt may have recorded the receipt and failed after the commit
+    # (e.g. writing the audit log): it is delivered
+    if db.find_issued_receipt(job["transaction_id"], attachment_store.receipt_location(job["file_name"], queued)):
+        return
+    location = attachment_store.put_receipt(job["file_name"], data, queued)
+    try:
+        db.add_issued_receipt(job["transaction_id"], job["receipt_type"], location, job["receipt_number"], "")
+    except SHARE_ERRORS:
+        raise
+    except Exception:
+        # The entry is set aside: no row will ever refer to the stored copy
+        try:
+            storage_backends.delete(location)
+        except OSError:
+            pass  # left for the orphan check of storage_check
+        raise
+
+def _remove(entry, keep_as=None):
+    for ext in (".json", ".pdf"):
+        path = os.path.join(SPOOL_DIR, entry + ext)
+        if keep_as:
+            os.replace(path, path + keep_as)
+        elif os.path.exists(path):
+            os.remove(path)
+
+def _run():
+    global _share_error
+    interval = RETRY_INTERVAL
+    while True:
+        _wake.clear()
+        for entry in _spooled():
+            try:
+                _deliver(entry)
+            except SHARE_ERRORS as e:
+                # Share unreachable: keep this and all later entries for the next attempt
+                _share_error = str(e)
+                break
+            except Exception as e:
+                # Will not succeed on retry (e.g. the transaction was deleted): set aside
+                with _lock:
+                    _failures.append((entry, str(e)))
+                _remove(entry, keep_as=".failed")
+                continue
+            _share_error = None
+            _remove(entry)
+
+        if _share_error is None:
+            interval = RETRY_INTERVAL
+            _wake.wait()
+        else:
+            _wake.wait(interval)
+            interval = min(interval * 2, RETRY_INTERVAL_MAX)
+
+def start():
+    """Starts the worker (once); it also sends receipts left from a previous session"""
+    global _worker
+    with _lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="receipt-store", daemon=True)
+            _worker.start()
+
+def submit(trans_id, receipt_type, receipt_number, file_name, data):
+    """
+    Spools a rendered receipt (PDF bytes) to the local disk; the worker stores it as
+    receipts/<YYYY>/<MM>/file_name and records it in issued_receipts. Returns immediately.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    entry = f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}_{uuid.uuid4().hex[:8]}"
+    _write_file(os.path.join(SPOOL_DIR, entry + ".pdf"), data)
+    # The metadata file is written last: an entry exists only once both files are complete
+    job = {
+        "transaction_id": trans_id,
+        "receipt_type": receipt_type,
+        "receipt_number": receipt_number,
+        "file_name": file_name,
+    }
+    _write_file(os.path.join(SPOOL_DIR, entry + ".json"), json.dumps(job, ensure_ascii=False).encode('utf-8'))
+    start()
+    _wake.set()
+
+def retry_now():
+    """Wakes the worker to try the share again without waiting for the retry interval"""
+    _wake.set()
+
+def pending():
+    """Number of receipts spooled and not yet recorded"""
+    return len(_spooled())
+
+def share_error():
+    """Why the last attempt to reach the share failed, or None if it is reachable"""
+    return _share_error
+
+def take_failures():
+    """Returns and clears the list of (entry, error) for receipts that could not be recorded"""
+    with _lock:
+        failures = list(_failures)
+        _failures.clear()
+    return failures
+
+def wait(timeout=None):
+    """Waits until the spool is empty; returns False if timeout seconds passed first"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while pending():
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+def next_receipt_number(receipt_type, trans_id):
+    """
+    Allocates the next number of the receipt series. When the database on the share
+    cannot be reached, returns the provisional number '#<transaction id>' instead.
+    Returns (receipt_number, provisional).
+    """
+    try:
+        return db.allocate_receipt_numbers(receipt_type)[0], False
+    except SHARE_ERRORS:
+        return f"#{trans_id}", True
@@ -0,0 +1,727 @@
+# replica_sync.py
+"""
+Local-first mode. Every PC keeps a local replica of the shared database that serves
+all reads and writes, so lists, searches and profiles do not wait for the share.
+A worker thread keeps the replica in step with the shared database:
+  push  changes made here are recorded by triggers in sync_outbox, together with
+        the row as it was before (its base), and applied to the shared database in
+        order. A column changed here and, differently, on the share since the base
+        is a conflict: the shared value wins and the local row is kept in
+        sync_conflicts. The same holds for changes to rows deleted on the share and
+        for deletes of rows changed there.
+  pull  changes made on the share, recorded by triggers in its sync_changes table
+        (by every PC, also those not in local-first mode), are copied into the
+        replica. Rows with local changes not yet pushed are skipped; their push
+        settles them.
+Rows created here get ids from LOCAL_ID_BASE up, so they never collide with rows
+copied from the share. They keep their id in the replica; sync_id_map links them
+to the id they got in the shared database and references are translated both ways.
+Receipt numbers are always allocated in the shared database.
+"""
+import os
+import csv
+import json
+import math
+import time
+import uuid
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager
+import database as db
+
+# Work on a local replica of the database, synchronized with the share in the background
+LOCAL_FIRST = False
+
+# The replica is kept on the local disk, next to the application
+REPLICA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replica", "company_data.db")
+
+# Seconds between synchronizations; while the share is unreachable the interval
+# doubles up to the maximum
+SYNC_INTERVAL = 5
+RETRY_INTERVAL_MAX = 300
+
+# Local changes applied per transaction on the shared database
+PUSH_BATCH_SIZE = 200
+
+# Shared changes copied per transaction on the replica
+PULL_BATCH_SIZE = 500
+
+# Entries kept in the shared change log; a replica that fell further behind is copied again
+CHANGE_LOG_KEEP = 100000
+
+# Ids of rows created in the replica start here, far above the ids of the shared database
+LOCAL_ID_BASE = 10 ** 9
+
+# Synchronized tables and their columns that refer to rows of other synchronized tables
+SYNC_TABLES = {
+    "customers": {},
+    "services": {},
+    "transactions": {"customer_id": "customers", "service_id": "services"},
+    "attachments": {"transaction_id": "transactions"},
+    "issued_receipts": {"transaction_id": "transactions"},
+    "audit_log": {},
+    "company_settings": {},
+}
+
+# Tables whose single row has the same id everywhere
+FIXED_ID_TABLES = {"company_settings"}
+
+_SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_origins (
+    client_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    local_id INTEGER NOT NULL,
+    shared_id INTEGER NOT NULL,
+    PRIMARY KEY (client_id, table_name, local_id)
+);
+"""
+
+_REPLICA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    client_id TEXT NOT NULL,
+    applying INTEGER NOT NULL DEFAULT 0,
+    last_seq INTEGER NOT NULL DEFAULT 0,
+    last_sync TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    base TEXT,
+    queued_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_sync_outbox_row ON sync_outbox (table_name, row_id);
+CREATE TABLE IF NOT EXISTS sync_id_map (
+    table_name TEXT NOT NULL,
+    local_id INTEGER NOT NULL,
+    shared_id INTEGER NOT NULL,
+    PRIMARY KEY (table_name, local_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sync_id_map_shared ON sync_id_map (table_name, shared_id);
+CREATE TABLE IF NOT EXISTS sync_conflicts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    op TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    local_values TEXT,
+    shared_values TEXT,
+    detected_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    reported INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+CONFLICT_LABELS = {
+    "modified": "Άλλαξε και στη βάση του δικτύου",
+    "deleted": "Διαγράφηκε στη βάση του δικτύου",
+    "merged": "Υπήρχε ήδη με το ίδιο όνομα",
+    "rejected": "Δεν έγινε δεκτή από τη βάση του δικτύου",
+}
+
+_worker = None
+_lock = threading.Lock()
+_wake = threading.Event()
+_idle = threading.Event()
+
+# Last error of the worker, None once a synchronization succeeds
+_error = None
+
+def _shared_triggers(table):
+    return "".join(f"""
+    CREATE TRIGGER IF NOT EXISTS sync_changes_{table}_{event.lower()} AFTER {event} ON {table}
+    BEGIN
+        INSERT INTO sync_changes (table_name, row_id) VALUES ('{table}', {row}.id);
+    END;""" for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")))
+
+def _outbox_triggers(table, columns):
+    old = ", ".join(f"'{column}', OLD.{column}" for column in columns)
+    recording = "(SELECT applying FROM sync_state WHERE id = 1) = 0"
+    pending = f"SELECT 1 FROM sync_outbox WHERE table_name = '{table}' AND row_id = OLD.id"
+    return f"""
+    DROP TRIGGER IF EXISTS sync_outbox_{table}_insert;
+    DROP TRIGGER IF EXISTS sync_outbox_{table}_update;
+    DROP TRIGGER IF EXISTS sync_outbox_{table}_delete;
+    CREATE TRIGGER sync_outbox_{table}_insert AFTER INSERT ON {table} WHEN {recording}
+    BEGIN
+        INSERT INTO sync_outbox (table_name, row_id, op) VALUES ('{table}', NEW.id, 'insert');
+    END;
+    CREATE TRIGGER sync_outbox_{table}_update AFTER UPDATE ON {table} WHEN {recording}
+    BEGIN
+        INSERT INTO sync_outbox (table_name, row_id, op, base)
+        SELECT '{table}', OLD.id, 'update', json_object({old})
+        WHERE NOT EXISTS ({pending});
+    END;
+    CREATE TRIGGER sync_outbox_{table}_delete AFTER DELETE ON {table} WHEN {recording}
+    BEGIN
+        DELETE FROM sync_outbox WHERE table_name = '{table}' AND row_id = OLD.id AND op = 'insert';
+        UPDATE sync_outbox SET op = 'delete' WHERE table_name = '{table}' AND row_id = OLD.id;
+        INSERT INTO sync_outbox (table_name, row_id, op, base)
+        SELECT '{table}', OLD.id, 'delete', json_object({old})
+        WHERE NOT EXISTS ({pending})
+          AND (OLD.id < {LOCAL_ID_BASE}
+               OR EXISTS (SELECT 1 FROM sync_id_map WHERE table_name = '{table}' AND local_id = OLD.id));
+    END;
+    """
+
+def _columns(conn, table):
+    """Columns of a table other than id"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] != "id"]
+
+def _common_columns(local, shared):
+    """{table: columns present in both databases} for the synchronized tables"""
+    columns = {}
+    for table in SYNC_TABLES:
+        shared_columns = set(_columns(shared, table))
+        common = [column for column in _columns(local, table) if column in shared_columns]
+        if common:
+            columns[table] = common
+    return columns
+
+def _references(table, values):
+    """(column, table, required) of the values that are ids of synchronized rows"""
+    references = [(column, target, True) for column, target in SYNC_TABLES[table].items()]
+    # Audit entries name the row they are about; an entry may outlive its row
+    if table == "audit_log" and values.get("table_name") in SYNC_TABLES and isinstance(values.get("record_id"), int):
+        references.append(("record_id", values["table_name"], False))
+    return references
+
+def _same(a, b):
+    """Equal values; bases store reals with 15 significant digits (SQLite's JSON)"""
+    if isinstance(a, float) or isinstance(b, float):
+        return (isinstance(a, (int, float)) and isinstance(b, (int, float))
+                and math.isclose(a, b, rel_tol=1e-13, abs_tol=1e-9))
+    return a == b
+
+def _local_id(local, table, shared_id):
+    """Id in the replica of a row of the shared database"""
+    row = local.execute("SELECT local_id FROM sync_id_map WHERE table_name = ? AND shared_id = ?",
+                        (table, shared_id)).fetchone()
+    return row[0] if row else shared_id
+
+def _to_local(local, table, values):
+    values = dict(values)
+    for column, target, _required in _references(table, values):
+        if values.get(column) is not None:
+            values[column] = _local_id(local, target, values[column])
+    return values
+
+def _pending(local, table, local_id):
+    return local.execute("SELECT 1 FROM sync_outbox WHERE table_name = ? AND row_id = ?",
+                         (table, local_id)).fetchone() is not None
+
+def _read_row(conn, table, row_id, columns):
+    row = conn.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (row_id,)).fetchone()
+    return dict(zip(columns, row)) if row else None
+
+def _store_local(local, table, local_id, values):
+    """Writes a row of the shared database (shared ids) into the replica; None deletes it"""
+    if values is None:
+        local.execute(f"DELETE FROM {table} WHERE id = ?", (local_id,))
+        return
+    values = _to_local(local, table, values)
+    columns = list(values)
+    try:
+        # Rows that are already the same (e.g. pushed from here and read back) are not
+        # written again, so change_watcher does not see them as changes from elsewhere
+        local.execute(f"""
+            INSERT INTO {table} (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})
+            ON CONFLICT(id) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in columns)}
+            WHERE {' OR '.join(f'{column} IS NOT excluded.{column}' for column in columns)}
+        """, [local_id] + [values[column] for column in columns])
+    except sqlite3.IntegrityError:
+        # A name still held by a row created here and not yet pushed; that push settles it
+        pass
+
+@contextmanager
+def _applying(local):
+    """A write transaction on the replica whose changes are not recorded in the outbox"""
+    local.execute("BEGIN IMMEDIATE")
+    try:
+        local.execute("UPDATE sync_state SET applying = 1 WHERE id = 1")
+        yield
+        local.execute("UPDATE sync_state SET applying = 0 WHERE id = 1")
+        local.execute("COMMIT")
+    except BaseException:
+        local.execute("ROLLBACK")
+        raise
+
+def _connect_local():
+    return sqlite3.connect(REPLICA_FILE, timeout=30, isolation_level=None)
+
+def _connect_shared():
+    # connect_db creates tables and columns of a newer version on the share too
+    shared = db.connect_db(shared=True)
+    shared.isolation_level = None
+    shared.executescript(_SHARED_SCHEMA + "".join(_shared_triggers(table) for table in SYNC_TABLES))
+    return shared
+
+def _prepare(local, client_id=None, copied=False):
+    """Sync tables, state and outbox triggers of the replica; after a copy, also its position"""
+    local.execute("PRAGMA journal_mode=WAL")
+    last_seq = 0
+    if copied:
+        # The copy brought the shared change log along: it tells where the copy stands
+        last_seq = local.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_changes").fetchone()[0]
+    for table in SYNC_TABLES:
+        for event in ("insert", "update", "delete"):
+            local.execute(f"DROP TRIGGER IF EXISTS sync_changes_{table}_{event}")
+    local.executescript("DROP TABLE IF EXISTS sync_changes; DROP TABLE IF EXISTS sync_origins;" + _REPLICA_SCHEMA)
+
+    local.execute("""
+        INSERT INTO sync_state (id, client_id, last_seq) VALUES (1, ?, ?)
+        ON CONFLICT(id) DO NOTHING
+    """, (client_id or uuid.uuid4().hex, last_seq))
+    for table in SYNC_TABLES:
+        if table not in FIXED_ID_TABLES:
+            # New rows of the replica get ids from LOCAL_ID_BASE up
+            local.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?",
+                          (LOCAL_ID_BASE, table, LOCAL_ID_BASE))
+            local.execute("INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? "
+                          "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+                          (table, LOCAL_ID_BASE, table))
+        local.executescript(_outbox_triggers(table, _columns(local, table)))
+
+def _copy_from_shared(shared, local, client_id=None, conflicts=(), sequences=()):
+    """
+    Replaces the replica's content with a consistent copy of the shared database.
+    conflicts and sequences (name, seq) of the replica being replaced are kept, so
+    no id handed out here before is handed out again.
+    """
+    shared.backup(local)
+    _prepare(local, client_id, copied=True)
+    local.executemany("UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?",
+                      [(seq, name, seq) for name, seq in sequences])
+    local.executemany("""
+        INSERT INTO sync_conflicts (table_name, row_id, op, kind, local_values, shared_values, detected_at, reported)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, conflicts)
+
+def _create_replica():
+    """Copies the shared database into a new replica"""
+    os.makedirs(os.path.dirname(REPLICA_FILE), exist_ok=True)
+    temp_path = REPLICA_FILE + ".part"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    shared = _connect_shared()
+    try:
+        local = sqlite3.connect(temp_path, isolation_level=None)
+        try:
+            _copy_from_shared(shared, local)
+            local.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            local.close()
+    finally:
+        shared.close()
+    os.replace(temp_path, REPLICA_FILE)
+
+
+class _PushBatch:
+    """
+    A batch of outbox entries: applied to the shared database in one transaction,
+    then recorded in the replica (ids of new rows, conflicts, entries done).
+    """
+
+    def __init__(self, local, shared, client_id, columns):
+        self.local = local
+        self.shared = shared
+        self.client_id = client_id
+        self.columns = columns
+        self.mapped = {}        # (table, local id): shared id, for rows created in this batch
+        self.processed = []     # (seq, table, local id, local values pushed or None, shared state or None)
+        self.conflicts = []     # (table, local id, op, kind, local values, shared values)
+        self.refresh = {}       # (table, local id): shared values to store in the replica, None to delete
+
+    def shared_id(self, table, local_id):
+        """Id in the shared database of a row of the replica, None if it is not there yet"""
+        if local_id < LOCAL_ID_BASE:
+            return local_id
+        if (table, local_id) in self.mapped:
+            return self.mapped[(table, local_id)]
+        row = self.local.execute("SELECT shared_id FROM sync_id_map WHERE table_name = ? AND local_id = ?",
+                                 (table, local_id)).fetchone()
+        return row[0] if row else None
+
+    def to_shared(self, table, values, strict=True):
+        """Values with ids translated; strict raises LookupError for a row not in the shared database"""
+        values = dict(values)
+        for column, target, required in _references(table, values):
+            if values.get(column) is None:
+                continue
+            shared_id = self.shared_id(target, values[column])
+            if shared_id is None:
+                if strict and required:
+                    raise LookupError(f"{target} #{values[column]}")
+                continue
+            values[column] = shared_id
+        return values
+
+    def conflict(self, table, local_id, op, kind, local_values, shared_values):
+        self.conflicts.append((table, local_id, op, kind,
+                               json.dumps(local_values, ensure_ascii=False) if local_values is not None else None,
+                               json.dumps(shared_values, ensure_ascii=False) if shared_values is not None else None))
+
+    def apply(self, seq, table, local_id, op, base):
+        if table not in self.columns:
+            self.processed.append((seq, table, local_id, None, None))
+            return
+        values = _read_row(self.local, table, local_id, self.columns[table])
+        try:
+            if op == "insert":
+                self._insert(seq, table, local_id, values)
+            elif op == "update":
+                self._update(seq, table, local_id, values, json.loads(base or "{}"))
+            else:
+                self._delete(seq, table, local_id, json.loads(base or "{}"))
+        except (sqlite3.IntegrityError, LookupError):
+            # e.g. a name taken on the share in the meantime, or a reference to a rejected row
+            shared_id = self.shared_id(table, local_id)
+            current = _read_row(self.shared, table, shared_id, self.columns[table]) if shared_id is not None else None
+            self.conflict(table, local_id, op, "rejected", values, current)
+            self.refresh[(table, local_id)] = current
+            self.processed.append((seq, table, local_id, None, None))
+
+    def _set(self, table, shared_id, values):
+        self.shared.execute(f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in values)} WHERE id = ?",
+                            list(values.values()) + [shared_id])
+
+    def _insert(self, seq, table, local_id, values):
+        if values is None:
+            # Deleted again before it was pushed
+            self.processed.append((seq, table, local_id, None, None))
+            return
+        mine = self.to_shared(table, values)
+        columns = list(mine)
+        if table in FIXED_ID_TABLES:
+            self.shared.execute(f"""
+                INSERT INTO {table} (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})
+                ON CONFLICT(id) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in columns)}
+            """, [local_id] + [mine[column] for column in columns])
+            self.processed.append((seq, table, local_id, values, mine))
+            return
+
+        origin = self.shared.execute("SELECT shared_id FROM sync_origins WHERE client_id = ? AND table_name = ? AND local_id = ?",
+                                     (self.client_id, table, local_id)).fetchone()
+        if origin:
+            # Pushed before, but the replica did not record it (e.g. the app was closed in between)
+            shared_id = origin[0]
+            self._set(table, shared_id, mine)
+        else:
+            try:
+                cursor = self.shared.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [mine[column] for column in columns])
+            except sqlite3.IntegrityError:
+                if self._merge(seq, table, local_id, values):
+                    return
+                raise
+            shared_id = cursor.lastrowid
+            self.shared.execute("INSERT INTO sync_origins (client_id, table_name, local_id, shared_id) VALUES (?, ?, ?, ?)",
+                                (self.client_id, table, local_id, shared_id))
+        self.mapped[(table, local_id)] = shared_id
+        self.processed.append((seq, table, local_id, values, mine))
+
+    def _merge(self, seq, table, local_id, values):
+        """A row created here whose unique name exists on the share becomes that row"""
+        if "name" not in values:
+            return False
+        row = self.shared.execute(f"SELECT id FROM {table} WHERE name = ?", (values["name"],)).fetchone()
+        if not row:
+            return False
+        shared_id = row[0]
+        self.shared.execute("INSERT OR REPLACE INTO sync_origins (client_id, table_name, local_id, shared_id) VALUES (?, ?, ?, ?)",
+                            (self.client_id, table, local_id, shared_id))
+        self.mapped[(table, local_id)] = shared_id
+        current = _read_row(self.shared, table, shared_id, self.columns[table])
+        self.conflict(table, local_id, "insert", "merged", values, current)
+        self.refresh[(table, local_id)] = current
+        self.processed.append((seq, table, local_id, None, None))
+        return True
+
+    def _update(self, seq, table, local_id, values, base):
+        shared_id = self.shared_id(table, local_id)
+        if values is None or shared_id is None:
+            self.processed.append((seq, table, local_id, None, None))
+            return
+        current = _read_row(self.shared, table, shared_id, self.columns[table])
+        if current is None:
+            self.conflict(table, local_id, "update", "deleted", values, None)
+            self.refresh[(table, local_id)] = None
+            self.processed.append((seq, table, local_id, None, None))
+            return
+
+        mine = self.to_shared(table, values)
+        base = self.to_shared(table, base, strict=False)
+        # Columns missing from the base were added after the change was recorded, so it did not touch them
+        changed = {column: value for column, value in mine.items()
+                   if column in base and not _same(value, base[column])}
+        clashes = {column for column in changed
+                   if not _same(current[column], base[column]) and not _same(current[column], changed[column])}
+        update = {column: value for column, value in changed.items()
+                  if column not in clashes and not _same(current[column], value)}
+        if update:
+            self._set(table, shared_id, update)
+        state = dict(current, **update)
+        if clashes:
+            self.conflict(table, local_id, "update", "modified", values, current)
+            self.refresh[(table, local_id)] = state
+        self.processed.append((seq, table, local_id, values, state))
+
+    def _delete(self, seq, table, local_id, base):
+        shared_id = self.shared_id(table, local_id)
+        current = _read_row(self.shared, table, shared_id, self.columns[table]) if shared_id is not None else None
+        if current is not None:
+            base = self.to_shared(table, base, strict=False)
+            if any(not _same(current[column], value) for column, value in base.items() if column in current):
+                # Changed on the share since: the row is restored here
+                self.conflict(table, local_id, "delete", "modified", base, current)
+                self.refresh[(table, local_id)] = current
+            else:
+                self.shared.execute(f"DELETE FROM {table} WHERE id = ?", (shared_id,))
+        self.processed.append((seq, table, local_id, None, None))
+
+    def record(self):
+        """Records the batch in the replica; runs inside _applying"""
+        local = self.local
+        for (table, local_id), shared_id in self.mapped.items():
+            local.execute("INSERT OR REPLACE INTO sync_id_map (table_name, local_id, shared_id) VALUES (?, ?, ?)",
+                          (table, local_id, shared_id))
+            if local.execute(f"SELECT 1 FROM {table} WHERE id = ?", (shared_id,)).fetchone():
+                # The shared row was pulled before the replica recorded its id: keep one copy
+                local.execute(f"DELETE FROM {table} WHERE id = ?", (shared_id,))
+                for child, references in SYNC_TABLES.items():
+                    for column, target in references.items():
+                        if target == table:
+                            local.execute(f"UPDATE {child} SET {column} = ? WHERE {column} = ?", (local_id, shared_id))
+
+        for seq, table, local_id, values, state in self.processed:
+            entry = local.execute("SELECT op FROM sync_outbox WHERE seq = ?", (seq,)).fetchone()
+            if values is not None:
+                now = _read_row(local, table, local_id, list(values))
+                if now != values:
+                    # Changed here again while it was being pushed: push the difference next time
+                    base = json.dumps(_to_local(local, table, state), ensure_ascii=False)
+                    if entry:
+                        local.execute("UPDATE sync_outbox SET op = CASE op WHEN 'delete' THEN 'delete' ELSE 'update' END, "
+                                      "base = ? WHERE seq = ?", (base, seq))
+                    else:
+                        # Deleted here after its insert was pushed
+                        local.execute("INSERT INTO sync_outbox (table_name, row_id, op, base) VALUES (?, ?, 'delete', ?)",
+                                      (table, local_id, base))
+                    continue
+            local.execute("DELETE FROM sync_outbox WHERE seq = ?", (seq,))
+            if (table, local_id) in self.refresh:
+                _store_local(local, table, local_id, self.refresh[(table, local_id)])
+
+        local.executemany("""
+            INSERT INTO sync_conflicts (table_name, row_id, op, kind, local_values, shared_values)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, self.conflicts)
+
+
+def _client_id(local):
+    return local.execute("SELECT client_id FROM sync_state WHERE id = 1").fetchone()[0]
+
+def _push(local, shared, columns):
+    """Applies the outbox to the shared database; returns (changes pushed, conflicts)"""
+    client_id = _client_id(local)
+    pushed = conflicts = 0
+    last_seq = 0
+    while True:
+        entries = local.execute("SELECT seq, table_name, row_id, op, base FROM sync_outbox WHERE seq > ? "
+                                "ORDER BY seq LIMIT ?", (last_seq, PUSH_BATCH_SIZE)).fetchall()
+        if not entries:
+            return pushed, conflicts
+        batch = _PushBatch(local, shared, client_id, columns)
+        shared.execute("BEGIN IMMEDIATE")
+        try:
+            for entry in entries:
+                batch.apply(*entry)
+            shared.execute("COMMIT")
+        except BaseException:
+            shared.execute("ROLLBACK")
+            raise
+        with _applying(local):
+            batch.record()
+        pushed += len(entries)
+        conflicts += len(batch.conflicts)
+        # Entries changed again while they were pushed wait for the next synchronization
+        last_seq = entries[-1][0]
+
+def _pull(local, shared, columns):
+    """Copies the changes made on the share into the replica; returns the number of rows"""
+    last_seq = local.execute("SELECT last_seq FROM sync_state WHERE id = 1").fetchone()[0]
+    first, newest = shared.execute("SELECT MIN(seq), MAX(seq) FROM sync_changes").fetchone()
+    if first is not None and (last_seq < first - 1 or last_seq > newest):
+        # Changes were pruned before this replica read them, or the shared database was restored
+        if local.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]:
+            return 0
+        conflicts = local.execute("SELECT table_name, row_id, op, kind, local_values, shared_values, detected_at, reported "
+                                  "FROM sync_conflicts").fetchall()
+        sequences = local.execute("SELECT name, seq FROM sqlite_sequence WHERE seq > ?", (LOCAL_ID_BASE,)).fetchall()
+        _copy_from_shared(shared, local, _client_id(local), conflicts, sequences)
+        return 0
+
+    pulled = 0
+    while True:
+        changes = shared.execute("SELECT seq, table_name, row_id FROM sync_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+                                 (last_seq, PULL_BATCH_SIZE)).fetchall()
+        if not changes:
+            break
+        rows = {}
+        for _seq, table, shared_id in changes:
+            if table in columns:
+                rows.setdefault(table, set()).add(shared_id)
+        values = {}
+        for table, ids in rows.items():
+            ids = list(ids)
+            for shared_id in ids:
+                values[(table, shared_id)] = None
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                cursor = shared.execute(f"SELECT id, {', '.join(columns[table])} FROM {table} "
+                                        f"WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                for row in cursor:
+                    values[(table, row[0])] = dict(zip(columns[table], row[1:]))
+
+        with _applying(local):
+            for (table, shared_id), row in values.items():
+                local_id = _local_id(local, table, shared_id)
+                if not _pending(local, table, local_id):
+                    _store_local(local, table, local_id, row)
+            local.execute("UPDATE sync_state SET last_seq = ? WHERE id = 1", (changes[-1][0],))
+        last_seq = changes[-1][0]
+        pulled += len(values)
+
+    if pulled and last_seq > CHANGE_LOG_KEEP:
+        shared.execute("DELETE FROM sync_changes WHERE seq <= ?", (last_seq - CHANGE_LOG_KEEP,))
+    return pulled
+
+def synchronize(local, shared):
+    """One push and pull; returns (pushed, pulled, conflicts)"""
+    columns = _common_columns(local, shared)
+    pushed, conflicts = _push(local, shared, columns)
+    pulled = _pull(local, shared, columns)
+    local.execute("UPDATE sync_state SET last_sync = ? WHERE id = 1",
+                  (datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+    return pushed, pulled, conflicts
+
+def _run():
+    global _error
+    local = shared = None
+    interval = SYNC_INTERVAL
+    while True:
+        _idle.clear()
+        try:
+            if local is None:
+                local = _connect_local()
+            if shared is None:
+                shared = _connect_shared()
+            synchronize(local, shared)
+        except Exception as e:
+            _error = str(e)
+            interval = min(interval * 2, RETRY_INTERVAL_MAX)
+            # Connect again next time: the share may have gone away under the connection
+            for conn in (local, shared):
+                if conn is not None:
+                    conn.close()
+            local = shared = None
+        else:
+            _error = None
+            interval = SYNC_INTERVAL
+        _idle.set()
+        _wake.wait(interval)
+        _wake.clear()
+
+def start():
+    """
+    Opens the replica, copying the shared database the first time, and starts the
+    worker; from then on connect_db works on the replica. Raises the error of the
+    share if there is no replica yet and the share cannot be reached.
+    """
+    global _worker
+    with _lock:
+        if _worker is not None:
+            return
+        if not os.path.exists(REPLICA_FILE):
+            _create_replica()
+        db.LOCAL_DB_FILE = REPLICA_FILE
+        # Tables and columns of a newer version are created in the replica before its triggers
+        db.connect_db().close()
+        local = _connect_local()
+        try:
+            _prepare(local)
+        finally:
+            local.close()
+        _worker = threading.Thread(target=_run, name="replica-sync", daemon=True)
+        _worker.start()
+
+def running():
+    return _worker is not None
+
+def sync_now():
+    """Synchronizes at once instead of waiting for the interval"""
+    _wake.set()
+
+def error():
+    """Last synchronization error, None if the last one succeeded"""
+    return _error
+
+def _query(sql):
+    conn = _connect_local()
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+def pending():
+    """Number of local changes not yet pushed to the shared database"""
+    return _query("SELECT COUNT(*) FROM sync_outbox") if running() else 0
+
+def unreported_conflicts():
+    return _query("SELECT COUNT(*) FROM sync_conflicts WHERE reported = 0") if running() else 0
+
+def last_sync():
+    return _query("SELECT last_sync FROM sync_state WHERE id = 1") if running() else None
+
+def wait(timeout=None):
+    """Synchronizes and waits until no local change is pending; returns False on timeout"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while pending():
+        _idle.clear()
+        sync_now()
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return False
+        # One full synchronization, or the timeout
+        _idle.wait(remaining)
+        if _error is not None:
+            return False
+    return True
+
+def write_conflicts_report(path):
+    """Writes all recorded conflicts to a CSV file and marks them as reported; returns their number"""
+    conn = _connect_local()
+    try:
+        rows = conn.execute("""
+            SELECT detected_at, table_name, row_id, op, kind, local_values, shared_values
+            FROM sync_conflicts ORDER BY id
+        """).fetchall()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(["detected_at", "table", "id", "change", "conflict", "local_values", "shared_values"])
+            for detected_at, table, row_id, op, kind, local_values, shared_values in rows:
+                writer.writerow([detected_at, table, row_id, op, CONFLICT_LABELS.get(kind, kind),
+                                 local_values or "", shared_values or ""])
+        conn.execute("UPDATE sync_conflicts SET reported = 1 WHERE reported = 0")
+    finally:
+        conn.close()
+    return len(rows)
@@ -0,0 +1,406 @@
+# storage_backends.py
+"""
+Storage backends for attachments and receipts. Files are addressed by a key such
+as "blobs/ab/<sha256>.pdf" or "receipts/2026/03/receipt_12.pdf"; the backend turns
+a key into the location recorded in the database (file_path columns):
+  FileSystemBackend  <ATTACHMENTS_DIR>/<key>   (the shared folder, the default)
+  S3Backend          s3://<bucket>/<prefix><key>  on any S3-compatible server
+Every backend offers put, put_bytes, get, stat, stream, move, delete and iter_files.
+Errors reaching the storage are raised as OSError (FileNotFoundError for a missing
+file), so callers handle an unreachable share and an unreachable server alike.
+S3 needs boto3 (pip install boto3); credentials come from the usual AWS
+environment variables or ~/.aws/credentials.
+"""
+import io
+import os
+import sys
+import uuid
+import hashlib
+from collections import namedtuple
+import database as db
+
+# Where new attachments and receipts are stored: "filesystem" or "s3"
+STORAGE_BACKEND = "filesystem"
+
+# S3-compatible server; None for AWS itself, or e.g. "http://127.0.0.1:9000" for MinIO
+# or a local stand-in (python -m moto.server -p 9000)
+S3_ENDPOINT_URL = None
+S3_BUCKET = "ziscrm-attachments"
+S3_PREFIX = ""
+S3_REGION = None
+
+# Files downloaded from object storage to be opened by other programs
+DOWNLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage_downloads")
+
+# Bytes copied per step; progress is reported and cancel is checked between steps
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+
+StoredStat = namedtuple("StoredStat", "size mtime")
+
+class TransferCancelled(Exception):
+    pass
+
+def _kernel_copy(src, dst, count):
+    """Copies up to count bytes between file positions inside the OS; returns None if unsupported"""
+    try:
+        if hasattr(os, "copy_file_range"):
+            return os.copy_file_range(src.fileno(), dst.fileno(), count)
+        if sys.platform.startswith("linux"):
+            return os.sendfile(dst.fileno(), src.fileno(), None, count)
+    except OSError:
+        # e.g. across file systems or on an SMB mount that does not support it
+        pass
+    return None
+
+def copy_chunked(source, destination, expected_hash=None, on_progress=None, cancelled=None, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Copies a file in chunks under a unique temporary name and renames it into place
+    once the copy is verified: the written size must match the source and, when the
+    data passes through Python, its hash must match expected_hash.
+    on_progress(done_bytes, total_bytes) is called after every chunk; setting the
+    cancelled event stops the copy with TransferCancelled and removes the partial file.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temp_path = f"{destination}.{uuid.uuid4().hex[:8]}.part"
+    total = os.path.getsize(source)
+    done = 0
+    digest = hashlib.sha256()
+    hashed_all = True
+    use_kernel = True
+    buffer = bytearray(chunk_size)
+    try:
+        with open(source, 'rb') as src, open(temp_path, 'wb') as dst:
+            while True:
+                if cancelled is not None and cancelled.is_set():
+                    raise TransferCancelled()
+                copied = _kernel_copy(src, dst, chunk_size) if use_kernel else None
+                if copied is None:
+                    use_kernel = False
+                    copied = src.readinto(buffer)
+                    if copied:
+                        chunk = memoryview(buffer)[:copied]
+                        digest.update(chunk)
+                        dst.write(chunk)
+                else:
+                    hashed_all = False
+                if not copied:
+                    break
+                done += copied
+                if on_progress:
+                    on_progress(done, total)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        if os.path.getsize(temp_path) != total:
+            raise OSError(f"Το αντίγραφο έχει {os.path.getsize(temp_path)} αντί για {total} bytes")
+        if expected_hash and hashed_all and digest.hexdigest() != expected_hash:
+            raise OSError("Το αρχείο άλλαξε κατά την αντιγραφή")
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class FileSystemBackend:
+    """Files in a folder, by default ATTACHMENTS_DIR on the share; locations are paths"""
+
+    name = "filesystem"
+
+    def __init__(self, root=None):
+        self._root = root
+
+    @property
+    def root(self):
+        return self._root or db.ATTACHMENTS_DIR
+
+    def location(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def normalize(self, location):
+        """Comparable form of a location (separators, case on Windows, '..' parts)"""
+        return os.path.normcase(os.path.normpath(location))
+
+    def put(self, key, source, expected_hash=None, on_progress=None, cancelled=None):
+        """Copies a local file to key; returns its location"""
+        location = self.location(key)
+        copy_chunked(source, location, expected_hash, on_progress, cancelled)
+        return location
+
+    def put_bytes(self, key, data):
+        """Writes data to key under a temporary name and renames it; returns its location"""
+        location = self.location(key)
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        temp_path = f"{location}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, location)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return location
+
+    def get(self, location, destination):
+        """Copies a stored file to a local path"""
+        copy_chunked(location, destination)
+
+    def stat(self, location):
+        """StoredStat(size, mtime), or None if there is no such file"""
+        try:
+            stat = os.stat(location)
+        except FileNotFoundError:
+            return None
+        return StoredStat(stat.st_size, stat.st_mtime)
+
+    def stream(self, location, chunk_size=COPY_CHUNK_SIZE):
+        """Yields the content of a stored file in chunks"""
+        with open(location, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+
+    def move(self, location, target):
+        """Renames a stored file (FileNotFoundError if it does not exist)"""
+        os.replace(location, target)
+
+    def delete(self, location):
+        try:
+            os.remove(location)
+        except FileNotFoundError:
+            pass
+
+    def iter_files(self, stopped=None):
+        """
+        Yields (location, size, mtime) for every file under the root, one folder at a
+        time. Stops early when the stopped event is set.
+        """
+        folders = [self.root]
+        while folders:
+            if stopped is not None and stopped.is_set():
+                return
+            folder = folders.pop()
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        yield entry.path, stat.st_size, stat.st_mtime
+                except OSError:
+                    continue
+
+    def local_path(self, location):
+        """A local path other programs can open"""
+        return location
+
+    def readable(self, location):
+        """A path or in-memory file to read a (small) stored file from"""
+        return location
+
+class _ReadTracker:
+    """File wrapper for uploads: hashes what is read, reports progress, honours cancel"""
+
+    def __init__(self, f, total, on_progress, cancelled):
+        self.f = f
+        self.total = total
+        self.done = 0
+        self.digest = hashlib.sha256()
+        self.on_progress = on_progress
+        self.cancelled = cancelled
+
+    def read(self, size=-1):
+        if self.cancelled is not None and self.cancelled.is_set():
+            raise TransferCancelled()
+        data = self.f.read(size)
+        self.digest.update(data)
+        self.done += len(data)
+        if data and self.on_progress:
+            self.on_progress(self.done, self.total)
+        return data
+
+class S3Backend:
+    """Objects in a bucket of an S3-compatible server; locations are s3://bucket/key URLs"""
+
+    name = "s3"
+
+    def __init__(self, bucket=None, prefix=None, endpoint_url=None, region=None):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.exceptions import BotoCoreError, ClientError
+        except ImportError:
+            raise RuntimeError("Η αποθήκευση S3 απαιτεί το boto3 (pip install boto3)")
+        self.bucket = bucket or S3_BUCKET
+        self.prefix = S3_PREFIX if prefix is None else prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or S3_ENDPOINT_URL,
+                                   region_name=region or S3_REGION)
+        # Single-threaded transfers, so that cancel and progress are raised in our thread
+        self.transfer_config = TransferConfig(use_threads=False, multipart_chunksize=COPY_CHUNK_SIZE)
+        self._errors = (BotoCoreError, ClientError)
+        self._client_error = ClientError
+
+    def location(self, key):
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    def normalize(self, location):
+        return location
+
+    def _object_key(self, location):
+        bucket, _, key = location[len("s3://"):].partition("/")
+        if bucket != self.bucket:
+            raise ValueError(f"Άλλος κάδος αποθήκευσης: {location}")
+        return key
+
+    def _oserror(self, error, location):
+        """The OSError to raise for a boto error"""
+        if isinstance(error, self._client_error):
+            code = str(error.response.get("Error", {}).get("Code", ""))
+            if code in ("404", "NoSuchKey", "NotFound"):
+                return FileNotFoundError(f"Το αρχείο δεν βρέθηκε: {location}")
+        return OSError(f"{location}: {error}")
+
+    def put(self, key, source, expected_hash=None, on_progress=None, cancelled=None):
+        """Uploads a local file to key, verifying its hash; returns its location"""
+        location = self.location(key)
+        object_key = self._object_key(location)
+        with open(source, 'rb') as f:
+            tracker = _ReadTracker(f, os.path.getsize(source), on_progress, cancelled)
+            try:
+                self.client.upload_fileobj(tracker, self.bucket, object_key, Config=self.transfer_config)
+            except self._errors as e:
+                raise self._oserror(e, location) from e
+        if expected_hash and tracker.digest.hexdigest() != expected_hash:
+            self.delete(location)
+            raise OSError("Το αρχείο άλλαξε κατά την αποστολή")
+        return location
+
+    def put_bytes(self, key, data):
+        location = self.location(key)
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=self._object_key(location), Body=data)
+        except self._errors as e:
+            raise self._oserror(e, location) from e
+        return location
+
+    def get(self, location, destination):
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        temp_path = f"{destination}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            self.client.download_file(self.bucket, self._object_key(location), temp_path, Config=self.transfer_config)
+            os.replace(temp_path, destination)
+        except self._errors as e:
+            raise self._oserror(e, location) from e
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def stat(self, location):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(location))
+        except self._errors as e:
+            error = self._oserror(e, location)
+            if isinstance(error, FileNotFoundError):
+                return None
+            raise error from e
+        return StoredStat(head["ContentLength"], head["LastModified"].timestamp())
+
+    def stream(self, location, chunk_size=COPY_CHUNK_SIZE):
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._object_key(location))["Body"]
+            try:
+                yield from body.iter_chunks(chunk_size)
+            finally:
+                body.close()
+        except self._errors as e:
+            raise self._oserror(e, location) from e
+
+    def move(self, location, target):
+        """Copies an object to target inside the bucket and deletes it (FileNotFoundError if missing)"""
+        try:
+            self.client.copy({"Bucket": self.bucket, "Key": self._object_key(location)},
+                             self.bucket, self._object_key(target), Config=self.transfer_config)
+        except self._errors as e:
+            raise self._oserror(e, location) from e
+        self.delete(location)
+
+    def delete(self, location):
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._object_key(location))
+        except self._errors as e:
+            raise self._oserror(e, location) from e
+
+    def iter_files(self, stopped=None):
+        """Yields (location, size, mtime) for every object under the prefix, one page at a time"""
+        try:
+            pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix)
+            for page in pages:
+                if stopped is not None and stopped.is_set():
+                    return
+                for item in page.get("Contents", []):
+                    yield f"s3://{self.bucket}/{item['Key']}", item["Size"], item["LastModified"].timestamp()
+        except self._errors as e:
+            raise self._oserror(e, self.location("")) from e
+
+    def readable(self, location):
+        return io.BytesIO(b"".join(self.stream(location)))
+
+    def local_path(self, location):
+        """Downloads the object (once per content) and returns the local path"""
+        stat = self.stat(location)
+        if stat is None:
+            raise FileNotFoundError(f"Το αρχείο δεν βρέθηκε: {location}")
+        name = location.rsplit("/", 1)[-1]
+        tag = hashlib.sha1(f"{location}|{stat.size}|{stat.mtime}".encode('utf-8')).hexdigest()[:12]
+        path = os.path.join(DOWNLOADS_DIR, tag, name)
+        if not os.path.exists(path):
+            self.get(location, path)
+        return path
+
+_backends = {}
+
+def get_backend(name=None):
+    """The backend new files are stored in (STORAGE_BACKEND), or the one with this name"""
+    name = name or STORAGE_BACKEND
+    if name not in _backends:
+        if name == "filesystem":
+            _backends[name] = FileSystemBackend()
+        elif name == "s3":
+            _backends[name] = S3Backend()
+        else:
+            raise ValueError(f"Άγνωστο σύστημα αποθήκευσης: {name}")
+    return _backends[name]
+
+def for_location(location):
+    """The backend that holds a recorded location"""
+    return get_backend("s3" if str(location).startswith("s3://") else "filesystem")
+
+def stat(location):
+    return for_location(location).stat(location)
+
+def stream(location, chunk_size=COPY_CHUNK_SIZE):
+    return for_location(location).stream(location, chunk_size)
+
+def move(location, target):
+    for_location(location).move(location, target)
+
+def delete(location):
+    for_location(location).delete(location)
+
+def local_path(location):
+    return for_location(location).local_path(location)
+
+def normalize(location):
+    return for_location(location).normalize(location)
+
+def readable(location):
+    return for_location(location).readable(location)
+
+def hash_location(location, chunk_size=COPY_CHUNK_SIZE):
+    """SHA-256 hex digest of a stored file"""
+    digest = hashlib.sha256()
+    for block in stream(location, chunk_size):
+        digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,384 @@
+# storage_check.py
+"""
+Reconciliation of the attachment store with the database. The files referenced by
+attachments, issued_receipts and transactions.attachment_path are compared with
+the files in the store (ATTACHMENTS_DIR, and the bucket when new files go to object
+storage): rows whose file is missing and files no row refers
+to (orphans, e.g. left behind when a transaction and its rows were deleted) are
+reported in a CSV file, and orphans can be removed in batches.
+Files and references are matched by their key inside the store (store_key), so
+rows recorded while the share was mapped under another path still find their files.
+Verifier checks attachments against the size, mtime and content hash recorded
+when they were stored.
+"""
+import os
+import re
+import csv
+import time
+import queue
+import datetime
+import threading
+import database as db
+import storage_backends
+import attachment_store
+
+# Reports are written on the local disk, next to the application
+REPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage_reports")
+
+# Files younger than this are never collected: another PC may have copied the file
+# and not yet committed the row that refers to it (seconds)
+ORPHAN_MIN_AGE = 24 * 60 * 60
+
+# Orphans removed per step; references are read again before every step
+GC_BATCH_SIZE = 200
+
+# Orphans are not collected at all when the scan looks implausible, which usually
+# means SHARED_PATH or the storage settings point at the wrong place: more than this
+# share of the references without a file, or of the files without a reference
+GC_MAX_MISSING_RATIO = 0.1
+GC_MAX_ORPHAN_RATIO = 0.5
+
+# Files scanned between progress events
+SCAN_PROGRESS_EVERY = 500
+
+# Attachments verified per database read and metadata commit
+VERIFY_BATCH_SIZE = 500
+
+# Modification times closer than this count as equal; some NAS file systems keep
+# only whole or even seconds (seconds)
+MTIME_TOLERANCE = 2.0
+
+def normalize(path):
+    """Comparable form of a location (for paths: separators, case on Windows, '..' parts)"""
+    return storage_backends.normalize(path)
+
+# Top-level folders of the store, used to find the key of a location recorded under another prefix
+STORE_FOLDERS = (attachment_store.BLOBS_FOLDER, attachment_store.RECEIPTS_FOLDER, attachment_store.FILES_FOLDER)
+
+def _parts(location):
+    return [part for part in re.split(r"[\\/]", location) if part]
+
+def store_key(location):
+    """
+    The '/'-separated, normalized name of a file inside the store: its location relative
+    to the root of its backend, or for a location under another prefix (the share mapped
+    under another drive letter or UNC name, rows of older versions) the part after the
+    attachments folder, else from the first of STORE_FOLDERS on, else the file name.
+    """
+    backend = storage_backends.for_location(location)
+    root = _parts(backend.normalize(backend.location("")))
+    parts = _parts(backend.normalize(location))
+    if parts[:len(root)] == root:
+        return "/".join(parts[len(root):])
+    if root and root[-1] in parts[:-1]:
+        last = len(parts) - 1 - parts[::-1].index(root[-1])
+        return "/".join(parts[last + 1:])
+    folders = {backend.normalize(folder) for folder in STORE_FOLDERS}
+    for index, part in enumerate(parts[:-1]):
+        if part in folders:
+            return "/".join(parts[index:])
+    return parts[-1] if parts else ""
+
+def _file_name(key):
+    return key.rsplit("/", 1)[-1]
+
+def referenced_keys():
+    """Store keys, and file names, of all files the database refers to"""
+    keys = {store_key(path) for _table, _id, path in db.iter_file_references()}
+    return keys, {_file_name(key) for key in keys}
+
+def scan_files(root, stopped=None):
+    """
+    Yields (path, size, mtime) for every file under root, one folder at a time.
+    Stops early when the stopped event is set.
+    """
+    return storage_backends.FileSystemBackend(root).iter_files(stopped)
+
+def _scanned_backends():
+    """The shared folder, and object storage when new files go there"""
+    backends = [storage_backends.FileSystemBackend()]
+    if storage_backends.STORAGE_BACKEND != "filesystem":
+        backends.append(storage_backends.get_backend())
+    return backends
+
+def report_path(kind="storage"):
+    return os.path.join(REPORTS_DIR, f"{kind}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+
+class Reconciler:
+    """
+    Compares database references with the files in the store on a worker thread.
+    The store is scanned one folder at a time and only the references and the
+    orphans are kept in memory. With dry_run only the report is written; otherwise
+    orphans older than ORPHAN_MIN_AGE are deleted in batches of GC_BATCH_SIZE, each
+    moved aside and checked against a fresh read of the references first. Nothing
+    is deleted when the scan looks implausible (GC_MAX_MISSING_RATIO,
+    GC_MAX_ORPHAN_RATIO); the reason is sent as an error event and kept in summary.
+    Events for the UI:
+      ("phase", text)
+      ("scanned", files)
+      ("missing", table, row_id, path)
+      ("deleted", files, bytes)
+      ("error", path, message)
+      ("finished", summary, stopped)
+    summary: dict with files, references, missing, orphans, orphan_bytes, recent, deleted,
+    deleted_bytes, report, refused
+    """
+
+    def __init__(self, dry_run=True, min_age=ORPHAN_MIN_AGE):
+        self.dry_run = dry_run
+        self.min_age = min_age
+        self.events = queue.Queue()
+        self.stopped = threading.Event()
+        self.summary = {"files": 0, "references": 0, "missing": 0, "orphans": 0, "orphan_bytes": 0,
+                        "recent": 0, "deleted": 0, "deleted_bytes": 0, "report": None, "refused": None}
+        self.thread = threading.Thread(target=self._run, name="storage-reconcile", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops the scan, or the collection after the current batch"""
+        self.stopped.set()
+
+    def _run(self):
+        try:
+            self._reconcile()
+        except Exception as e:
+            self.events.put(("error", None, str(e)))
+        self.events.put(("finished", self.summary, self.stopped.is_set()))
+
+    def _reconcile(self):
+        summary = self.summary
+        self.events.put(("phase", "Ανάγνωση αναφορών από τη βάση..."))
+        references = {}
+        for table, row_id, path in db.iter_file_references():
+            references.setdefault(store_key(path), []).append((table, row_id, path))
+            summary["references"] += 1
+        names = {_file_name(key) for key in references}
+
+        now = time.time()
+        summary["report"] = report_path()
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        orphans = []
+        found = set()
+        roots = []
+        with open(summary["report"], 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "table", "id", "file_path", "size", "modified"])
+
+            self.events.put(("phase", "Σάρωση αρχείων..."))
+            for backend in _scanned_backends():
+                roots.append(backend.normalize(backend.location("")))
+                for path, size, mtime in backend.iter_files(self.stopped):
+                    summary["files"] += 1
+                    if summary["files"] % SCAN_PROGRESS_EVERY == 0:
+                        self.events.put(("scanned", summary["files"]))
+                    key = store_key(path)
+                    if key in references:
+                        found.add(key)
+                        continue
+                    name = _file_name(key)
+                    if name.endswith(attachment_store.RELEASING_SUFFIX):
+                        name = name[:-len(attachment_store.RELEASING_SUFFIX)]
+                    if name in names:
+                        # Same name as a referenced file in another folder, or a referenced
+                        # blob being released right now: never an orphan
+                        continue
+                    modified = datetime.datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
+                    if now - mtime < self.min_age:
+                        summary["recent"] += 1
+                        writer.writerow(["recent", "", "", path, size, modified])
+                        continue
+                    summary["orphans"] += 1
+                    summary["orphan_bytes"] += size
+                    writer.writerow(["orphan", "", "", path, size, modified])
+                    orphans.append((path, size))
+            if self.stopped.is_set():
+                return
+            self.events.put(("scanned", summary["files"]))
+
+            for key, rows in references.items():
+                if key in found:
+                    continue
+                for table, row_id, path in rows:
+                    # Files outside the scanned store (very old versions, or a backend
+                    # no longer used for new files) are looked up one by one
+                    if not normalize(path).startswith(tuple(roots)) and storage_backends.stat(path) is not None:
+                        continue
+                    summary["missing"] += 1
+                    writer.writerow(["missing", table, row_id, path, "", ""])
+                    self.events.put(("missing", table, row_id, path))
+
+        if not self.dry_run and orphans:
+            summary["refused"] = self._implausible()
+            if summary["refused"]:
+                self.events.put(("error", None, summary["refused"]))
+                return
+            self._collect(orphans)
+
+    def _implausible(self):
+        """Why collecting the orphans of this scan is not safe, or None"""
+        summary = self.summary
+        if summary["missing"] > GC_MAX_MISSING_RATIO * summary["references"]:
+            return (f"Δεν διαγράφηκε κανένα αρχείο: {summary['missing']} από {summary['references']} "
+                    "εγγραφές δεν βρίσκουν το αρχείο τους. Ελέγξτε ότι ο κοινόχρηστος φάκελος "
+                    "(SHARED_PATH) και οι ρυθμίσεις αποθήκευσης είναι σωστά.")
+        if summary["orphans"] > GC_MAX_ORPHAN_RATIO * summary["files"]:
+            return (f"Δεν διαγράφηκε κανένα αρχείο: {summary['orphans']} από {summary['files']} αρχεία "
+                    "φαίνονται ορφανά. Ελέγξτε ότι ο κοινόχρηστος φάκελος (SHARED_PATH) είναι σωστός "
+                    "και δείτε την αναφορά πριν από τη διαγραφή.")
+        return None
+
+    def _collect(self, orphans):
+        summary = self.summary
+        for start in range(0, len(orphans), GC_BATCH_SIZE):
+            if self.stopped.is_set():
+                break
+            self.events.put(("phase", f"Διαγραφή ορφανών αρχείων {start + 1}-{min(start + GC_BATCH_SIZE, len(orphans))} "
+                                      f"από {len(orphans)}..."))
+            # Moved aside first, as in attachment_store.release_blob: a row added on another
+            # PC after the references are read finds its blob missing and stores it again
+            moved = []
+            for path, size in orphans[start:start + GC_BATCH_SIZE]:
+                try:
+                    storage_backends.move(path, path + attachment_store.RELEASING_SUFFIX)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    self.events.put(("error", path, str(e)))
+                    continue
+                moved.append((path, size))
+
+            # Rows may have been added or moved since the scan
+            keys, names = referenced_keys()
+            for path, size in moved:
+                releasing = path + attachment_store.RELEASING_SUFFIX
+                key = store_key(path)
+                try:
+                    if key in keys or _file_name(key) in names:
+                        storage_backends.move(releasing, path)
+                        continue
+                    storage_backends.delete(releasing)
+                except OSError as e:
+                    self.events.put(("error", path, str(e)))
+                    continue
+                summary["deleted"] += 1
+                summary["deleted_bytes"] += size
+            self.events.put(("deleted", summary["deleted"], summary["deleted_bytes"]))
+
+        if summary["deleted"]:
+            db.add_audit_log("DELETE", "attachments", 0,
+                             f"Καθαρισμός ορφανών αρχείων: {summary['deleted']} αρχεία, "
+                             f"{summary['deleted_bytes'] / (1024 * 1024):.1f} MB",
+                             "", os.path.basename(summary["report"]))
+
+
+class Verifier:
+    """
+    Checks every attachment against its recorded metadata on a worker thread. A file
+    whose size and mtime match is taken as intact after one stat; only when the mtime
+    differs (or with deep=True) is it read and hashed. A different size is reported
+    without reading the file. Attachments stored before the metadata existed are hashed
+    once and their size, mtime and hash recorded. A file shared by several rows (one
+    blob) is checked once.
+    Events for the UI:
+      ("checked", rows, total)
+      ("problem", row_id, path, kind, detail)   kind: missing, size, changed, error
+      ("finished", summary, stopped)
+    summary: dict with checked, ok, missing, size, changed, errors, hashed, hashed_bytes,
+    recorded, report
+    """
+
+    def __init__(self, deep=False):
+        self.deep = deep
+        self.events = queue.Queue()
+        self.stopped = threading.Event()
+        self.summary = {"checked": 0, "ok": 0, "missing": 0, "size": 0, "changed": 0, "errors": 0,
+                        "hashed": 0, "hashed_bytes": 0, "recorded": 0, "report": None}
+        self.thread = threading.Thread(target=self._run, name="storage-verify", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops after the current batch"""
+        self.stopped.set()
+
+    def _run(self):
+        try:
+            self._verify()
+        except Exception as e:
+            self.events.put(("problem", None, None, "error", str(e)))
+        self.events.put(("finished", self.summary, self.stopped.is_set()))
+
+    def _hash(self, path, size):
+        self.summary["hashed"] += 1
+        self.summary["hashed_bytes"] += size
+        return storage_backends.hash_location(path)
+
+    def _check(self, file_path, file_size, file_mtime, content_hash):
+        """Returns (kind, detail, metadata); kind None if intact, metadata to record or None"""
+        stat = storage_backends.stat(file_path)
+        if stat is None:
+            return "missing", "", None
+
+        if file_size is None:
+            # Stored before the metadata existed: read once and record it
+            actual = self._hash(file_path, stat.size)
+            if content_hash and actual != content_hash:
+                return "changed", f"hash {actual[:12]} αντί για {content_hash[:12]}", None
+            return None, "", (stat.size, stat.mtime, actual)
+
+        if stat.size != file_size:
+            return "size", f"{stat.size} αντί για {file_size} bytes", None
+
+        touched = file_mtime is None or abs(stat.mtime - file_mtime) > MTIME_TOLERANCE
+        if not (touched or self.deep):
+            return None, "", None
+        actual = self._hash(file_path, stat.size)
+        if content_hash and actual != content_hash:
+            return "changed", f"hash {actual[:12]} αντί για {content_hash[:12]}", None
+        if touched or not content_hash:
+            # Same content (e.g. copied back with a new date): remember the new mtime
+            return None, "", (stat.size, stat.mtime, actual)
+        return None, "", None
+
+    def _verify(self):
+        summary = self.summary
+        total = db.count_attachments()
+        summary["report"] = report_path("verify")
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        results = {}
+        last_id = 0
+        with open(summary["report"], 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "id", "file_path", "detail"])
+            while not self.stopped.is_set():
+                batch = db.get_attachments_metadata_batch(last_id, VERIFY_BATCH_SIZE)
+                if not batch:
+                    break
+                updates = []
+                for row_id, file_path, file_size, file_mtime, content_hash in batch:
+                    key = (normalize(file_path), file_size, file_mtime, content_hash)
+                    if key not in results:
+                        try:
+                            results[key] = self._check(file_path, file_size, file_mtime, content_hash)
+                        except OSError as e:
+                            results[key] = ("error", str(e), None)
+                    kind, detail, metadata = results[key]
+                    summary["checked"] += 1
+                    if kind:
+                        summary["errors" if kind == "error" else kind] += 1
+                        writer.writerow([kind, row_id, file_path, detail])
+                        self.events.put(("problem", row_id, file_path, kind, detail))
+                        continue
+                    summary["ok"] += 1
+                    if metadata:
+                        updates.append(metadata + (row_id,))
+                if updates:
+                    db.update_attachments_metadata(updates)
+                    summary["recorded"] += len(updates)
+                last_id = batch[-1][0]
+                self.events.put(("checked", summary["checked"], total))
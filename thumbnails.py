@@ -0,0 +1,192 @@
+# thumbnails.py
+"""
+Local cache of attachment previews. Previews (downscaled images, first page of
+PDFs) are rendered on a background thread the first time a file is shown and
+kept as PNG files on the local disk, keyed by the file's content hash, so a
+document already seen is previewed without reading it from the share again.
+Rendering PDFs needs PyMuPDF (pip install pymupdf); without it PDFs show no
+preview and can still be opened externally.
+"""
+import os
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+import storage_backends
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF before 1.24.3
+    except ImportError:
+        pymupdf = None
+
+# Previews are kept on the local disk, next to the application
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thumbnail_cache")
+
+# Largest preview (pixels); the preview pane scales it down further
+PREVIEW_SIZE = (480, 640)
+
+# The oldest previews are removed when the cache grows past this size; it is checked
+# at start and again whenever this much has been written since the last check
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+PRUNE_AFTER_BYTES = CACHE_MAX_BYTES // 10
+
+# Decoded previews kept in memory for repeated display in the same session
+MEMORY_CACHE_SIZE = 64
+
+IMAGE_TYPES = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+PDF_TYPES = {".pdf"}
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+_requests = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+_written_since_prune = 0
+
+def can_preview(file_path):
+    """True if a preview can be rendered for this kind of file"""
+    ext = os.path.splitext(file_path)[1].lower()
+    return ext in IMAGE_TYPES or (ext in PDF_TYPES and pymupdf is not None)
+
+def cache_key(file_path, content_hash=None):
+    """
+    Cache key of a file: its content hash, or for files recorded before hashes were
+    stored, a key from its location, size and modification time (one stat on the share).
+    """
+    if content_hash:
+        return content_hash
+    stat = storage_backends.stat(file_path)
+    if stat is None:
+        raise FileNotFoundError(f"Το αρχείο δεν βρέθηκε: {file_path}")
+    return hashlib.sha1(f"{file_path}|{stat.size}|{stat.mtime}".encode('utf-8')).hexdigest()
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], key + ".png")
+
+def _remember(key, image):
+    with _memory_lock:
+        _memory[key] = image
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+def cached(key):
+    """The preview for a key if it is in memory or in the local cache, else None"""
+    with _memory_lock:
+        image = _memory.get(key)
+        if image is not None:
+            _memory.move_to_end(key)
+            return image
+    path = _cache_path(key)
+    try:
+        with Image.open(path) as stored:
+            image = stored.copy()
+    except (OSError, ValueError):
+        return None
+    try:
+        # Recently used previews are the last to be pruned
+        os.utime(path)
+    except OSError:
+        pass
+    _remember(key, image)
+    return image
+
+def _render_image(file_path):
+    with Image.open(storage_backends.readable(file_path)) as source:
+        # JPEG can be decoded at a reduced scale, which is much faster for photos and scans
+        source.draft("RGB", PREVIEW_SIZE)
+        source.seek(0)
+        image = source.convert("RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB")
+    image.thumbnail(PREVIEW_SIZE)
+    return image
+
+def _render_pdf(file_path):
+    source = storage_backends.readable(file_path)
+    document = pymupdf.open(source) if isinstance(source, str) else pymupdf.open(stream=source.getvalue(), filetype="pdf")
+    with document:
+        page = document.load_page(0)
+        zoom = min(PREVIEW_SIZE[0] / page.rect.width, PREVIEW_SIZE[1] / page.rect.height)
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+def render(file_path, key):
+    """Renders the preview of a file into the cache; returns the image or None if unsupported"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in IMAGE_TYPES:
+        image = _render_image(file_path)
+    elif ext in PDF_TYPES and pymupdf is not None:
+        image = _render_pdf(file_path)
+    else:
+        return None
+
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".part"
+    image.save(temp_path, "PNG", optimize=True)
+    os.replace(temp_path, path)
+    _remember(key, image)
+    _count_written(os.path.getsize(path))
+    return image
+
+def _count_written(size):
+    global _written_since_prune
+    _written_since_prune += size
+    if _written_since_prune >= PRUNE_AFTER_BYTES:
+        _written_since_prune = 0
+        prune()
+
+def prune(max_bytes=None):
+    """Removes the least recently used previews until the cache is below max_bytes (default CACHE_MAX_BYTES)"""
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    entries = []
+    total = 0
+    for folder, _dirs, files in os.walk(CACHE_DIR):
+        for name in files:
+            path = os.path.join(folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    entries.sort()
+    for _mtime, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def _run():
+    prune()
+    while True:
+        file_path, content_hash, reply = _requests.get()
+        try:
+            key = cache_key(file_path, content_hash)
+            # A preview requested twice (e.g. the list was reloaded) is rendered once
+            image = cached(key)
+            if image is None:
+                image = render(file_path, key)
+        except Exception as e:
+            reply.put((file_path, None, str(e)))
+            continue
+        reply.put((file_path, image, None))
+
+def request(file_path, content_hash, reply):
+    """
+    Asks the worker for the preview of a file. The result arrives in the reply queue
+    as (file_path, image, error); image is None if the file cannot be previewed.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="thumbnails", daemon=True)
+            _worker.start()
+    _requests.put((file_path, content_hash, reply))